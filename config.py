@@ -6,6 +6,9 @@ PROJECT_ROOT = Path(__file__).parent
 RESULTS_ROOT = PROJECT_ROOT / "results"
 TEMPLATE_PATH = PROJECT_ROOT / "prompt_template.j2"
 DB_PATH = PROJECT_ROOT / "experiments.db"
+PARQUET_ROOT = PROJECT_ROOT / "results_parquet"
+RESPONSE_CACHE_PATH = PROJECT_ROOT / "response_cache.sqlite"
+JOBS_DB_PATH = PROJECT_ROOT / "jobs.db"
 
 # Defaults
 DEFAULT_K = 3
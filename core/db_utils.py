@@ -1,9 +1,12 @@
 from pathlib import Path
-import sqlite3
+import hashlib, sqlite3, time, zlib
 from functools import lru_cache
 
 DB_PATH = Path("experiments.db")
 
+# prompt / response / expected text lives in `blobs`, addressed by the sha1
+# of the text and zlib-compressed; `trials` only carries the hashes so the
+# metric rows stay a few dozen bytes wide.
 SCHEMA = """
 CREATE TABLE IF NOT EXISTS trials (
     id            TEXT,
@@ -15,18 +18,257 @@ CREATE TABLE IF NOT EXISTS trials (
     seq_acc       REAL,
     tok_acc       REAL,
     flaw          INTEGER,
-    latency_ms    REAL,      
-    prompt_tokens INTEGER,  
-    prompt        TEXT,
-    response      TEXT,
-    expected      TEXT,
+    latency_ms    REAL,
+    prompt_tokens INTEGER,
+    prompt_hash   TEXT,
+    response_hash TEXT,
+    expected_hash TEXT,
+    prompt_id     TEXT DEFAULT 'default_prompt',
+    -- provider-reported usage (NULL for results from before it was recorded)
+    usage_prompt_tokens INTEGER,
+    completion_tokens   INTEGER,
+    cached_tokens       INTEGER,          -- prompt tokens from the provider's cache
+    cost_usd            REAL,             -- 0 for answers replayed from the response cache
+    replayed            INTEGER DEFAULT 0,
+    usage_estimated     INTEGER DEFAULT 0,  -- counted locally (cancelled stream)
     PRIMARY KEY (id, trial_idx)
 );
 CREATE INDEX IF NOT EXISTS idx_provider_k ON trials (provider, k);
+-- covering index: per-cell aggregates never touch the table itself
+CREATE INDEX IF NOT EXISTS idx_cell ON trials
+    (provider, model, num_facts, k, seq_acc, tok_acc, flaw, latency_ms);
+
+CREATE TABLE IF NOT EXISTS blobs (
+    hash  TEXT PRIMARY KEY,   -- sha1 of the utf-8 text
+    size  INTEGER,            -- uncompressed bytes
+    data  BLOB                -- zlib
+);
+
+-- running per-cell totals, kept current by the triggers below so the
+-- dashboards read one row per (provider, model, prompt_id, N, K) instead
+-- of every trial.  flaw is 0/1, so its sum of squares is flaw_sum.
+CREATE TABLE IF NOT EXISTS cell_summary (
+    provider   TEXT,
+    model      TEXT,
+    prompt_id  TEXT,
+    num_facts  INTEGER,
+    k          INTEGER,
+    n          INTEGER,
+    seq_sum    REAL, seq_sq REAL,
+    tok_sum    REAL, tok_sq REAL,
+    flaw_sum   INTEGER,
+    lat_n      INTEGER,               -- trials with a recorded latency
+    lat_sum    REAL, lat_sq REAL,
+    PRIMARY KEY (provider, model, prompt_id, num_facts, k)
+);
+
+CREATE TRIGGER IF NOT EXISTS trg_summary_ins AFTER INSERT ON trials BEGIN
+    INSERT INTO cell_summary VALUES (
+        NEW.provider, NEW.model, NEW.prompt_id, NEW.num_facts, NEW.k, 1,
+        IFNULL(NEW.seq_acc, 0), IFNULL(NEW.seq_acc * NEW.seq_acc, 0),
+        IFNULL(NEW.tok_acc, 0), IFNULL(NEW.tok_acc * NEW.tok_acc, 0),
+        IFNULL(NEW.flaw, 0), NEW.latency_ms IS NOT NULL,
+        IFNULL(NEW.latency_ms, 0), IFNULL(NEW.latency_ms * NEW.latency_ms, 0))
+    ON CONFLICT DO UPDATE SET
+        n = n + 1,
+        seq_sum = seq_sum + excluded.seq_sum, seq_sq = seq_sq + excluded.seq_sq,
+        tok_sum = tok_sum + excluded.tok_sum, tok_sq = tok_sq + excluded.tok_sq,
+        flaw_sum = flaw_sum + excluded.flaw_sum, lat_n = lat_n + excluded.lat_n,
+        lat_sum = lat_sum + excluded.lat_sum, lat_sq = lat_sq + excluded.lat_sq;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_summary_del AFTER DELETE ON trials BEGIN
+    UPDATE cell_summary SET
+        n = n - 1,
+        seq_sum = seq_sum - IFNULL(OLD.seq_acc, 0),
+        seq_sq  = seq_sq  - IFNULL(OLD.seq_acc * OLD.seq_acc, 0),
+        tok_sum = tok_sum - IFNULL(OLD.tok_acc, 0),
+        tok_sq  = tok_sq  - IFNULL(OLD.tok_acc * OLD.tok_acc, 0),
+        flaw_sum = flaw_sum - IFNULL(OLD.flaw, 0),
+        lat_n   = lat_n   - (OLD.latency_ms IS NOT NULL),
+        lat_sum = lat_sum - IFNULL(OLD.latency_ms, 0),
+        lat_sq  = lat_sq  - IFNULL(OLD.latency_ms * OLD.latency_ms, 0)
+    WHERE provider = OLD.provider AND model = OLD.model
+      AND prompt_id = OLD.prompt_id AND num_facts = OLD.num_facts AND k = OLD.k;
+    DELETE FROM cell_summary
+    WHERE n <= 0 AND provider = OLD.provider AND model = OLD.model
+      AND prompt_id = OLD.prompt_id AND num_facts = OLD.num_facts AND k = OLD.k;
+END;
+
+-- regrade (scripts/regrade.py) only rewrites these columns
+CREATE TRIGGER IF NOT EXISTS trg_summary_upd
+AFTER UPDATE OF seq_acc, tok_acc, flaw, latency_ms ON trials BEGIN
+    UPDATE cell_summary SET
+        seq_sum = seq_sum + IFNULL(NEW.seq_acc, 0) - IFNULL(OLD.seq_acc, 0),
+        seq_sq  = seq_sq  + IFNULL(NEW.seq_acc * NEW.seq_acc, 0)
+                          - IFNULL(OLD.seq_acc * OLD.seq_acc, 0),
+        tok_sum = tok_sum + IFNULL(NEW.tok_acc, 0) - IFNULL(OLD.tok_acc, 0),
+        tok_sq  = tok_sq  + IFNULL(NEW.tok_acc * NEW.tok_acc, 0)
+                          - IFNULL(OLD.tok_acc * OLD.tok_acc, 0),
+        flaw_sum = flaw_sum + IFNULL(NEW.flaw, 0) - IFNULL(OLD.flaw, 0),
+        lat_n   = lat_n + (NEW.latency_ms IS NOT NULL) - (OLD.latency_ms IS NOT NULL),
+        lat_sum = lat_sum + IFNULL(NEW.latency_ms, 0) - IFNULL(OLD.latency_ms, 0),
+        lat_sq  = lat_sq  + IFNULL(NEW.latency_ms * NEW.latency_ms, 0)
+                          - IFNULL(OLD.latency_ms * OLD.latency_ms, 0)
+    WHERE provider = OLD.provider AND model = OLD.model
+      AND prompt_id = OLD.prompt_id AND num_facts = OLD.num_facts AND k = OLD.k;
+END;
+
+-- one row per result JSON already imported (see core/json_import.py)
+CREATE TABLE IF NOT EXISTS imported_files (
+    path      TEXT PRIMARY KEY,
+    size      INTEGER,
+    mtime_ns  INTEGER,
+    sha1      TEXT,
+    file_id   TEXT
+);
 """
 
+TEXT_COLUMNS = ("prompt", "response", "expected")
+
+TRIAL_COLUMNS = ("id", "provider", "model", "num_facts", "k", "trial_idx",
+                 "seq_acc", "tok_acc", "flaw", "latency_ms", "prompt_tokens",
+                 "prompt_hash", "response_hash", "expected_hash", "prompt_id",
+                 "usage_prompt_tokens", "completion_tokens", "cached_tokens",
+                 "cost_usd", "replayed", "usage_estimated")
+
+# added after the first release; _upgrade appends them to older tables
+USAGE_COLUMNS = {"usage_prompt_tokens": "INTEGER", "completion_tokens": "INTEGER",
+                 "cached_tokens": "INTEGER", "cost_usd": "REAL",
+                 "replayed": "INTEGER DEFAULT 0", "usage_estimated": "INTEGER DEFAULT 0"}
+
+
+def pack_text(text: str) -> tuple[str, int, bytes]:
+    """(hash, size, compressed) – one `blobs` row."""
+    raw = text.encode("utf-8")
+    return hashlib.sha1(raw).hexdigest(), len(raw), zlib.compress(raw, 6)
+
+
+def put_blobs(conn: sqlite3.Connection, blobs) -> None:
+    """Insert (hash, size, data) rows; text already stored is skipped."""
+    conn.executemany("INSERT OR IGNORE INTO blobs VALUES (?,?,?)", blobs)
+
+
+def get_texts(conn: sqlite3.Connection, hashes) -> dict[str, str]:
+    hashes = [h for h in set(hashes) if h]
+    out = {}
+    for i in range(0, len(hashes), 500):
+        chunk = hashes[i:i + 500]
+        for h, data in conn.execute(
+                f"SELECT hash, data FROM blobs WHERE hash IN ({','.join('?' * len(chunk))})",
+                chunk):
+            out[h] = zlib.decompress(data).decode("utf-8")
+    return out
+
+
+def trial_texts(conn: sqlite3.Connection, id: str, trial_idx: int) -> dict[str, str]:
+    """{'prompt', 'response', 'expected'} for one trial – the drill-down read."""
+    row = conn.execute(
+        "SELECT prompt_hash, response_hash, expected_hash FROM trials "
+        "WHERE id = ? AND trial_idx = ?", (id, trial_idx)).fetchone()
+    if row is None:
+        return {}
+    texts = get_texts(conn, row)
+    return {col: texts.get(h, "") for col, h in zip(TEXT_COLUMNS, row)}
+
+
+def _migrate_inline_text(conn: sqlite3.Connection) -> None:
+    """
+    Move a pre-blob `trials` table (text stored inline) to the new layout.
+    The old table is renamed first, so an interrupted migration simply
+    resumes on the next connect.
+    """
+    cols = {r[1] for r in conn.execute("PRAGMA table_info(trials)")}
+    if "prompt" in cols:
+        conn.execute("DROP INDEX IF EXISTS idx_provider_k")
+        conn.execute("ALTER TABLE trials RENAME TO trials_inline")
+        conn.commit()
+    if not conn.execute("SELECT 1 FROM sqlite_master "
+                        "WHERE type = 'table' AND name = 'trials_inline'").fetchone():
+        return
+
+    print("[db] moving trial text into the blobs table (one-off)…")
+    conn.executescript(SCHEMA)
+    with conn:
+        cur = conn.execute("SELECT * FROM trials_inline")
+        while batch := cur.fetchmany(2_000):
+            rows, blobs = [], {}
+            for r in batch:
+                packed = [pack_text(t or "") for t in r[11:14]]
+                blobs.update((p[0], p) for p in packed)
+                rows.append(tuple(r[:11]) + tuple(p[0] for p in packed))
+            put_blobs(conn, blobs.values())
+            conn.executemany(f"INSERT OR IGNORE INTO trials ({','.join(TRIAL_COLUMNS[:14])}) "
+                             f"VALUES ({','.join('?' * 14)})", rows)
+        conn.execute("DROP TABLE trials_inline")
+    conn.execute("VACUUM")                      # give the freed pages back
+
+
+def rebuild_summary(conn: sqlite3.Connection) -> None:
+    """Recompute `cell_summary` from scratch (backfill / repair)."""
+    with conn:
+        conn.execute("DELETE FROM cell_summary")
+        conn.execute("""
+            INSERT INTO cell_summary
+            SELECT provider, model, prompt_id, num_facts, k, COUNT(*),
+                   TOTAL(seq_acc), TOTAL(seq_acc * seq_acc),
+                   TOTAL(tok_acc), TOTAL(tok_acc * tok_acc),
+                   TOTAL(flaw),    COUNT(latency_ms),
+                   TOTAL(latency_ms), TOTAL(latency_ms * latency_ms)
+            FROM trials GROUP BY provider, model, prompt_id, num_facts, k""")
+
+
+def _upgrade(conn: sqlite3.Connection) -> None:
+    """Bring an older database up to SCHEMA."""
+    _migrate_inline_text(conn)
+    cols = {r[1] for r in conn.execute("PRAGMA table_info(trials)")}
+    if cols and "prompt_id" not in cols:
+        conn.execute("ALTER TABLE trials ADD COLUMN prompt_id TEXT DEFAULT 'default_prompt'")
+    for col, decl in USAGE_COLUMNS.items():
+        if cols and col not in cols:
+            conn.execute(f"ALTER TABLE trials ADD COLUMN {col} {decl}")
+    had_summary = conn.execute("SELECT 1 FROM sqlite_master "
+                               "WHERE type = 'table' AND name = 'cell_summary'").fetchone()
+    conn.executescript(SCHEMA)
+    if not had_summary:
+        rebuild_summary(conn)
+
+
+def query_readonly(sql: str, params=(), *, tables=("trials",),
+                   timeout_s: float = 5.0) -> tuple[list[str], list[tuple]]:
+    """
+    Run user-supplied SQL (e.g. the dashboard's custom WHERE) safely: a
+    fresh read-only connection, an authorizer that only allows SELECTs over
+    `tables`, and a progress handler that aborts after `timeout_s`.
+    Returns (column names, rows); raises sqlite3.Error when refused.
+    """
+    conn = sqlite3.connect(f"file:{DB_PATH}?mode=ro", uri=True)
+    allowed = set(tables)
+
+    def _auth(action, arg1, arg2, db, trigger):
+        if action in (sqlite3.SQLITE_SELECT, sqlite3.SQLITE_FUNCTION):
+            return sqlite3.SQLITE_OK
+        if action == sqlite3.SQLITE_READ and arg1 in allowed:
+            return sqlite3.SQLITE_OK
+        return sqlite3.SQLITE_DENY
+
+    deadline = time.monotonic() + timeout_s
+    conn.set_authorizer(_auth)
+    conn.set_progress_handler(lambda: time.monotonic() > deadline, 10_000)
+    try:
+        cur = conn.execute(sql, tuple(params))
+        return [d[0] for d in cur.description], cur.fetchall()
+    finally:
+        conn.close()
+
+
 @lru_cache(maxsize=1)
 def get_conn() -> sqlite3.Connection:
     conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-    conn.executescript(SCHEMA)
+    # WAL: readers (Streamlit pages) don't block the importer and vice versa
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    # so INSERT OR REPLACE fires the summary delete trigger for the old row
+    conn.execute("PRAGMA recursive_triggers=ON")
+    _upgrade(conn)
     return conn
@@ -2,19 +2,28 @@ import streamlit as st, importlib, pkgutil, inspect
 from dotenv import load_dotenv
 from pathlib import Path
 
+from llm_providers import PROVIDERS
+
 load_dotenv()
 
 LLM_ROOT = Path("llm_providers")
 
 @st.cache_data(show_spinner=False)
 def discover_providers():
-    providers = {}
+    """
+    {label: dotted class path} straight from the registry – no backend
+    module is imported.  Only a `*_llm` module missing from the registry
+    falls back to the old import-and-inspect scan.
+    """
+    providers = {label: meta["path"] for label, meta in PROVIDERS.items()}
+    known     = {meta["path"].rsplit(".", 2)[1] for meta in PROVIDERS.values()}
+
     for module_info in pkgutil.iter_modules([LLM_ROOT]):
-        if not module_info.name.endswith("_llm"):
+        if not module_info.name.endswith("_llm") or module_info.name in known:
             continue
         module = importlib.import_module(f"llm_providers.{module_info.name}")
         for name, obj in inspect.getmembers(module, inspect.isclass):
-            if name.lower().endswith("provider"):
+            if name.lower().endswith("provider") and obj.__module__ == module.__name__:
                 dotted = f"llm_providers.{module_info.name}.{name}"
                 providers[name.replace("Provider","")] = dotted
     return providers
@@ -1,43 +1,152 @@
-import json, sqlite3
+import json, hashlib, os
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from tqdm import tqdm   # nice progress when run standalone
-from .db_utils import get_conn
+from .db_utils import get_conn, pack_text, put_blobs, TRIAL_COLUMNS
+from . import parquet_store
 from config import RESULTS_ROOT
 # RESULTS_ROOT = Path("results")
 
-def import_json_dir(root: Path = RESULTS_ROOT) -> int:
-    conn, cur = get_conn(), get_conn().cursor()
-    new_rows  = 0
+# below this many changed files a process pool costs more than it saves
+PARALLEL_MIN_FILES = 64
 
+INSERT_SQL = (f"INTO trials ({', '.join(TRIAL_COLUMNS)}) "
+              f"VALUES ({','.join('?' * len(TRIAL_COLUMNS))})")
+
+
+def _parse_file(path: str):
+    """
+    Read + hash + parse one result file.
+    Returns (path, size, mtime_ns, sha1, file_id, rows, prompt_id, blobs)
+    or None if unreadable.  `rows` carry the text hashes; `blobs` are the
+    compressed (hash, size, data) rows to store.
+    """
+    try:
+        st  = os.stat(path)
+        raw = Path(path).read_bytes()
+        data = json.loads(raw)
+    except (OSError, ValueError) as e:
+        print(f"[SKIP] {path}: {e}")
+        return None
+
+    base = (data["id"], data["provider"], data["model"],
+            data["num_facts"], data["k"])
+    prompt_id = data.get("prompt_id") or "default_prompt"
+    rows, blobs = [], {}
+    for t in data["trials"]:
+        text   = (t["prompt_text"], t["response_text"], t["expected_response_text"])
+        usage  = t.get("usage") or {}
+        packed = [pack_text(x or "") for x in text]
+        blobs.update((p[0], p) for p in packed)         # dedup inside the file
+        rows.append(base + (
+            t["trial"],
+            t["sequence_accuracy"], t["token_accuracy"],
+            int(t["major_format_flaw"]),
+            t.get("response_time_ms"),
+            t.get("prompt_tokens"),
+        ) + tuple(p[0] for p in packed) + (
+            prompt_id,
+            usage.get("prompt_tokens"), usage.get("completion_tokens"),
+            usage.get("cached_tokens"), t.get("cost_usd"), int(bool(t.get("cached"))),
+            int(bool(usage.get("estimated"))),
+        ))
+    return (path, st.st_size, st.st_mtime_ns,
+            hashlib.sha1(raw).hexdigest(), data["id"], rows, prompt_id,
+            list(blobs.values()))
+
+
+def _changed_files(root: Path, manifest: dict) -> list[str]:
+    """Paths that are new or whose size/mtime differ from the manifest."""
+    out = []
     for fp in root.rglob("*.json"):
-        data = json.loads(fp.read_text())
-        base = {
-            "id":        data["id"],
-            "provider":  data["provider"],
-            "model":     data["model"],
-            "num_facts": data["num_facts"],
-            "k":         data["k"],
-        }
-        for t in data["trials"]:
-            row = (
-                base["id"], base["provider"], base["model"],
-                base["num_facts"], base["k"],
-                t["trial"],
-                t["sequence_accuracy"], t["token_accuracy"],
-                int(t["major_format_flaw"]),
-                t.get("response_time_ms"),            
-                t.get("prompt_tokens"),               
-                t["prompt_text"], t["response_text"], t["expected_response_text"]
-            )
-            try:
-                cur.execute("""INSERT INTO trials
-                               VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?)""", row)
-                new_rows += 1
-            except sqlite3.IntegrityError:
-                pass       # duplicate
-
-    conn.commit()
+        p  = str(fp)
+        st = fp.stat()
+        if manifest.get(p, (None, None))[:2] != (st.st_size, st.st_mtime_ns):
+            out.append(p)
+    return out
+
+
+def _known_ids(conn, ids: list[str]) -> set[str]:
+    known = set()
+    for i in range(0, len(ids), 500):
+        chunk = ids[i:i + 500]
+        known.update(r[0] for r in conn.execute(
+            f"SELECT DISTINCT id FROM trials WHERE id IN ({','.join('?' * len(chunk))})",
+            chunk))
+    return known
+
+
+def _sync_parquet(fresh_files, replaced) -> None:
+    """Mirror this import into the columnar store (core/parquet_store.py)."""
+    try:
+        if replaced:
+            parquet_store.delete_ids((old_id for old_id, *_ in replaced),
+                                     {(r[1], r[2], pid)
+                                      for _, rows, pid in replaced for r in rows})
+        rows, pids = [], []
+        for _, file_rows, pid in fresh_files + replaced:
+            rows.extend(file_rows)
+            pids.extend([pid] * len(file_rows))
+        parquet_store.append_rows(rows, pids)
+    except Exception as e:                      # the DB stays the source of truth
+        print(f"[WARN] parquet store not updated: {e}")
+
+
+def import_json_dir(root: Path = RESULTS_ROOT, *, workers: int | None = None,
+                    sync_parquet: bool = True) -> int:
+    """
+    Import result files that are new or changed since the last call.
+
+    A manifest (`imported_files`: path, size, mtime, sha1) means untouched
+    files are only stat()ed; changed files are parsed in parallel and all
+    rows land in a single transaction.  `cell_summary` follows along via
+    the triggers in db_utils.SCHEMA.  Returns the number of new rows.
+    Manifest paths are resolved, so a file imported through a relative
+    root is recognised by an import through the absolute one.
+    """
+    conn = get_conn()
+    manifest = {p: (size, mtime, sha1, fid) for p, size, mtime, sha1, fid in
+                conn.execute("SELECT path, size, mtime_ns, sha1, file_id FROM imported_files")}
+
+    todo = _changed_files(Path(root).resolve(), manifest)
+    if not todo:
+        return 0
+
+    if len(todo) >= PARALLEL_MIN_FILES and workers != 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parsed = list(tqdm(pool.map(_parse_file, todo, chunksize=32),
+                               total=len(todo), disable=len(todo) < 500))
+    else:
+        parsed = [_parse_file(p) for p in todo]
+
+    fresh, replaced, seen = [], [], []          # (file_id, rows, prompt_id)
+    blobs = []
+    for res in filter(None, parsed):
+        path, size, mtime, sha1, fid, rows, pid, file_blobs = res
+        seen.append((path, size, mtime, sha1, fid))
+        blobs.extend(file_blobs)
+        old = manifest.get(path)
+        if old is None:
+            fresh.append((fid, rows, pid))
+        elif old[2] != sha1:
+            replaced.append((old[3], rows, pid))  # content changed (e.g. regraded)
+
+    # a copy of an already-imported file is ignored by the DB; skip it in parquet too
+    dupes = _known_ids(conn, [f[0] for f in fresh]) if sync_parquet else set()
+
+    with conn:                                  # one transaction
+        put_blobs(conn, blobs)                  # text seen before is skipped
+        for old_id, rows, *_ in replaced:
+            conn.execute("DELETE FROM trials WHERE id = ?", (old_id,))
+            conn.executemany("INSERT OR REPLACE " + INSERT_SQL, rows)
+        # rowcount, not total_changes: the latter also counts trigger writes
+        new_rows = conn.executemany("INSERT OR IGNORE " + INSERT_SQL,  # duplicates skip
+                                    [r for _, rows, *_ in fresh for r in rows]).rowcount
+        conn.executemany("INSERT OR REPLACE INTO imported_files VALUES (?,?,?,?,?)", seen)
+
+    if sync_parquet:
+        _sync_parquet([f for f in fresh if f[0] not in dupes], replaced)
     return new_rows
 
 if __name__ == "__main__":
-    print(f"Imported {import_json_dir()} new rows")
\ No newline at end of file
+    print(f"Imported {import_json_dir()} new rows")
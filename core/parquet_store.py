@@ -0,0 +1,197 @@
+"""
+core/parquet_store.py
+─────────────────────
+Columnar copy of the trial metrics, hive-partitioned by provider / model /
+prompt_id:
+
+  PARQUET_ROOT/metrics/provider=…/model=…/prompt_id=…/part-*.parquet
+
+Only the narrow numeric columns are kept – the Dashboard's per-cell
+drill-down reads them; prompt / response / expected text lives in the
+SQLite `blobs` table alone.  Rows are sorted by (num_facts, k) before
+writing, so row-group statistics let N/K filters skip most of the data.
+
+`core.json_import.import_json_dir` appends here as it imports; run
+`python -m core.parquet_store --rebuild` once to backfill older results.
+"""
+
+from __future__ import annotations
+import argparse, shutil, uuid
+from pathlib import Path
+from typing import Iterable, Sequence
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from config import PARQUET_ROOT, RESULTS_ROOT
+
+PARTITIONS = ["provider", "model", "prompt_id"]
+
+METRIC_SCHEMA = pa.schema([
+    ("provider",      pa.string()),
+    ("model",         pa.string()),
+    ("prompt_id",     pa.string()),
+    ("id",            pa.string()),
+    ("trial_idx",     pa.int32()),
+    ("num_facts",     pa.int32()),
+    ("k",             pa.int32()),
+    ("seq_acc",       pa.float64()),
+    ("tok_acc",       pa.float64()),
+    ("flaw",          pa.int8()),
+    ("latency_ms",    pa.float64()),
+    ("prompt_tokens", pa.int64()),
+])
+
+_PARTITIONING = ds.partitioning(
+    pa.schema([(c, pa.string()) for c in PARTITIONS]), flavor="hive")
+
+
+def _path(root: Path | None = None) -> Path:
+    return Path(root or PARQUET_ROOT) / "metrics"
+
+
+def exists(root: Path | None = None) -> bool:
+    p = _path(root)
+    return p.exists() and any(p.rglob("*.parquet"))
+
+
+# ───────────────────────────────────────────────────
+#  writing
+# ───────────────────────────────────────────────────
+def _write(table: pa.Table, target: Path, basename: str | None = None) -> None:
+    table = table.sort_by([("num_facts", "ascending"), ("k", "ascending")])
+    ds.write_dataset(
+        table, target, format="parquet",
+        partitioning=_PARTITIONING,
+        basename_template=basename or f"part-{uuid.uuid4().hex}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+        file_options=ds.ParquetFileFormat().make_write_options(compression="zstd"),
+    )
+
+
+def append_rows(rows: Sequence[tuple], prompt_ids: Sequence[str],
+                root: Path | None = None) -> int:
+    """
+    rows       : `trials`-table tuples (id, provider, model, num_facts, k,
+                 trial_idx, seq_acc, tok_acc, flaw, latency_ms,
+                 prompt_tokens, …) – later columns are ignored
+    prompt_ids : one per row
+    """
+    if not rows:
+        return 0
+    cols = list(zip(*rows))
+    metrics = pa.Table.from_pydict({
+        "provider":  cols[1], "model": cols[2], "prompt_id": list(prompt_ids),
+        "id":        cols[0], "trial_idx": cols[5],
+        "num_facts": cols[3], "k": cols[4],
+        "seq_acc": cols[6], "tok_acc": cols[7], "flaw": cols[8],
+        "latency_ms": cols[9], "prompt_tokens": cols[10],
+    }, schema=METRIC_SCHEMA)
+    _write(metrics, _path(root))
+    return len(rows)
+
+
+def delete_ids(ids: Iterable[str], partitions: Iterable[tuple[str, str, str]] | None = None,
+               root: Path | None = None) -> None:
+    """
+    Drop every row whose result-file id is in `ids` (before re-appending).
+    partitions : (provider, model, prompt_id) the ids live in – only those
+                 partitions' files are opened (None → every file).
+    """
+    ids = pa.array(sorted(set(ids)), pa.string())
+    if not len(ids) or not _path(root).exists():
+        return
+    expr = None
+    for provider, model, prompt_id in set(partitions or ()):
+        part = ((ds.field("provider") == provider) & (ds.field("model") == model)
+                & (ds.field("prompt_id") == prompt_id))
+        expr = part if expr is None else expr | part
+    for frag in _dataset(root).get_fragments(filter=expr):
+        f   = Path(frag.path)
+        hit = pc.is_in(pq.read_table(f, columns=["id"])["id"], value_set=ids)
+        if not pc.any(hit).as_py():
+            continue
+        kept = pq.read_table(f).filter(pc.invert(hit))
+        if kept.num_rows:
+            pq.write_table(kept, f, compression="zstd")
+        else:
+            f.unlink()
+
+
+def compact(root: Path | None = None) -> None:
+    """Rewrite each partition as one sorted file (imports append many small ones)."""
+    base = _path(root)
+    if not base.exists():
+        return
+    table = _dataset(root).to_table()
+    tmp = base.with_name(base.name + ".compact")
+    shutil.rmtree(tmp, ignore_errors=True)
+    _write(table, tmp, basename="part-{i}.parquet")
+    shutil.rmtree(base)
+    tmp.rename(base)
+
+
+# ───────────────────────────────────────────────────
+#  reading
+# ───────────────────────────────────────────────────
+def _dataset(root: Path | None = None) -> ds.Dataset:
+    return ds.dataset(_path(root), format="parquet", partitioning=_PARTITIONING)
+
+
+def nk_filter(*, n_min=None, n_max=None, k_min=None, k_max=None,
+              providers=None, models=None, prompt_ids=None):
+    """Build a pushdown expression; None means no constraint."""
+    expr = None
+    def _and(e):
+        nonlocal expr
+        expr = e if expr is None else expr & e
+    if n_min is not None: _and(ds.field("num_facts") >= n_min)
+    if n_max is not None: _and(ds.field("num_facts") <= n_max)
+    if k_min is not None: _and(ds.field("k") >= k_min)
+    if k_max is not None: _and(ds.field("k") <= k_max)
+    if providers:  _and(ds.field("provider").isin(list(providers)))
+    if models:     _and(ds.field("model").isin(list(models)))
+    if prompt_ids: _and(ds.field("prompt_id").isin(list(prompt_ids)))
+    return expr
+
+
+def load_metrics(columns: Sequence[str] | None = None, filter=None,
+                 root: Path | None = None):
+    """Only `columns` are read; `filter` is pushed down to partitions/row groups."""
+    return _dataset(root).to_table(columns=columns, filter=filter).to_pandas()
+
+
+# ───────────────────────────────────────────────────
+#  backfill
+# ───────────────────────────────────────────────────
+def rebuild_from_json(results_root: Path = RESULTS_ROOT, root: Path | None = None) -> int:
+    """Throw the store away and rebuild it from every result JSON."""
+    from core.json_import import _parse_file
+    shutil.rmtree(_path(root), ignore_errors=True)
+
+    rows, pids = [], []
+    for fp in Path(results_root).rglob("*.json"):
+        res = _parse_file(str(fp))
+        if res is None:
+            continue
+        rows.extend(res[5])
+        pids.extend([res[6]] * len(res[5]))
+    append_rows(rows, pids, root)
+    compact(root)
+    return len(rows)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Parquet results store maintenance.")
+    ap.add_argument("--rebuild", action="store_true", help="rebuild from results/*.json")
+    ap.add_argument("--compact", action="store_true", help="merge small part files")
+    a = ap.parse_args()
+    if a.rebuild:
+        print(f"Wrote {rebuild_from_json()} rows → {PARQUET_ROOT}")
+    elif a.compact:
+        compact()
+        print(f"Compacted {PARQUET_ROOT}")
+    else:
+        ap.print_help()
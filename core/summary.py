@@ -0,0 +1,52 @@
+"""
+core/summary.py
+───────────────
+Read side of the `cell_summary` table (see core/db_utils.SCHEMA).
+
+Each row holds counts, sums and sums of squares per (provider, model,
+prompt_id, N, K), so any coarser grouping is just another SUM and the
+mean / std fall out at the end:
+
+    mean = sum / n          std = sqrt(sq / n - mean²)
+"""
+
+from __future__ import annotations
+import numpy as np
+import pandas as pd
+
+from .db_utils import get_conn
+
+#: flaw rate at which a cell counts as past the failure frontier
+FLAW_THRESHOLD = 0.5
+
+KEYS    = ("provider", "model", "prompt_id", "num_facts", "k")
+SUMS    = ("n", "seq_sum", "seq_sq", "tok_sum", "tok_sq", "flaw_sum",
+           "lat_n", "lat_sum", "lat_sq")
+
+
+def add_stats(df: pd.DataFrame) -> pd.DataFrame:
+    """Derive mean/std columns from the summed columns (works after any groupby-sum)."""
+    n, lat_n = df["n"].replace(0, np.nan), df["lat_n"].replace(0, np.nan)
+    out = df.assign(
+        seq_acc    = df.seq_sum / n,
+        tok_acc    = df.tok_sum / n,
+        flaw_rate  = df.flaw_sum / n,
+        latency_ms = df.lat_sum / lat_n,
+    )
+    return out.assign(
+        seq_std = np.sqrt((out.seq_sq / n - out.seq_acc ** 2).clip(lower=0)),
+        tok_std = np.sqrt((out.tok_sq / n - out.tok_acc ** 2).clip(lower=0)),
+        lat_std = np.sqrt((out.lat_sq / lat_n - out.latency_ms ** 2).clip(lower=0)),
+    )
+
+
+def load_cells(group_by=KEYS, where: str = "", params=(), conn=None) -> pd.DataFrame:
+    """
+    Per-group totals + stats.  `group_by` ⊆ KEYS; `where` is an SQL
+    fragment over KEYS with `?` placeholders bound from `params`.
+    """
+    cols = ", ".join(group_by)
+    sums = ", ".join(f"SUM({c}) AS {c}" for c in SUMS)
+    sql  = (f"SELECT {cols}, {sums} FROM cell_summary "
+            f"{'WHERE ' + where if where else ''} GROUP BY {cols} ORDER BY {cols}")
+    return add_stats(pd.read_sql(sql, conn or get_conn(), params=list(params)))
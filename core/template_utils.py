@@ -1,7 +1,8 @@
 import hashlib
 from pathlib import Path
+from config import TEMPLATE_PATH
 
-def generate_prompt_id_from_template(template_path="prompt_template.j2"):
+def generate_prompt_id_from_template(template_path=TEMPLATE_PATH):
     """
     Returns a deterministic short ID based on the prompt template file.
     """
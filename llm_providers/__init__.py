@@ -0,0 +1,51 @@
+"""
+llm_providers – provider registry.
+
+Listing providers must stay cheap: nothing in this file imports a backend
+module (and with it `openai`, `transformers` or a tokenizer).  The class is
+only imported by `load_provider` once a run actually needs it.
+"""
+import importlib, os
+
+#: label → metadata.  `path` is the dotted path of the provider class.
+PROVIDERS: dict[str, dict] = {
+    "OpenAI": {
+        "path":          "llm_providers.openai_llm.OpenAIProvider",
+        "provider_id":   "openai",
+        "model_env":     "OPENAI_MODEL",
+        "default_model": "gpt-4o-mini",
+        "models":        ["gpt-4o-mini", "gpt-4o", "gpt-3.5-turbo"],
+    },
+    "DeepSeek": {
+        "path":          "llm_providers.deepseek_llm.DeepSeekProvider",
+        "provider_id":   "deepseek",
+        "model_env":     "DEEPSEEK_MODEL",
+        "default_model": "deepseek-chat",
+        "models":        ["deepseek-chat", "deepseek-llama3"],
+    },
+    "Ollama": {
+        "path":          "llm_providers.ollama_llm.OllamaProvider",
+        "provider_id":   "ollama",
+        "model_env":     "OLLAMA_MODEL",
+        "default_model": "llama3.2",
+        "models":        ["llama3.2"],
+    },
+}
+
+
+def default_model(label: str) -> str:
+    meta = PROVIDERS[label]
+    return os.getenv(meta["model_env"], meta["default_model"])
+
+
+def load_provider(path_or_label: str):
+    """Import and return the provider class for a label or dotted path."""
+    path = PROVIDERS.get(path_or_label, {}).get("path", path_or_label)
+    mod_path, cls_name = path.rsplit(".", 1)
+    return getattr(importlib.import_module(mod_path), cls_name)
+
+
+def make_provider(path_or_label: str, model: str | None = None):
+    """An instance for `model` (None → the class default); no env vars involved."""
+    cls = load_provider(path_or_label)
+    return cls(model_name=model) if model else cls()
@@ -1,5 +1,60 @@
 from abc import ABC, abstractmethod
-from typing import Callable
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import wraps
+from time import perf_counter
+from typing import Callable, Iterable, Iterator
+import threading
+
+from .scheduler import RequestScheduler
+from .usage import normalize_usage, cost_usd
+
+_SCHED_LOCK = threading.Lock()
+_IN_QUERY   = threading.local()        # a super().query() call must not re-check the cache
+_USAGE      = threading.local()        # usage of this thread's latest request
+
+
+def _cached_query(query: Callable) -> Callable:
+    """Wrap a backend's `query` so it answers from `self.response_cache` first."""
+    @wraps(query)
+    def wrapper(self, prompt, *, temperature=0.0, max_tokens=None, timeout=None):
+        cache = self.response_cache
+        if getattr(_IN_QUERY, "active", False):
+            return query(self, prompt, temperature=temperature,
+                         max_tokens=max_tokens, timeout=timeout)
+        _USAGE.last = None
+        if cache is None:
+            return query(self, prompt, temperature=temperature,
+                         max_tokens=max_tokens, timeout=timeout)
+        key = cache.key_for(self, prompt, temperature, max_tokens)
+        hit = cache.get(key)
+        if hit is not None:
+            return hit
+        _IN_QUERY.active = True
+        try:
+            t0   = perf_counter()
+            text = query(self, prompt, temperature=temperature,
+                         max_tokens=max_tokens, timeout=timeout)
+        finally:
+            _IN_QUERY.active = False
+        cache.put(key, text, {"latency_ms": (perf_counter() - t0) * 1_000,
+                              "usage": getattr(_USAGE, "last", None)})
+        return text
+    return wrapper
+
+
+@dataclass
+class StreamResult:
+    """What `query_stream` hands back besides the text."""
+    text: str
+    ttft_ms: float | None              # time to first content token
+    total_ms: float
+    completion_tokens: int | None      # provider-reported, else counted locally
+    decode_tok_per_s: float | None     # completion tokens / (total - ttft)
+    cancelled: bool = False            # stopped early by `should_stop`
+    cached: bool = False               # replayed from the response cache
+    usage: dict | None = None          # provider-reported (see llm_providers/usage.py)
+
 
 class LLMProvider(ABC):
     """
@@ -8,8 +63,31 @@ class LLMProvider(ABC):
 
     #: Human-readable name shown in result-file paths
     provider_id: str
-    #: Model identifier you want the backend to use (e.g. 'gpt-3.5-turbo')
+    #: Model identifier you want the backend to use (e.g. 'gpt-3.5-turbo');
+    #: the class value is the default, `__init__(model_name=...)` overrides it
     model_name: str
+    #: How many trials the runner may keep in flight against this backend
+    max_concurrency: int = 1
+    #: Account quota (None = unlimited); live rate-limit headers refine these
+    rpm_limit: int | None = None
+    tpm_limit: int | None = None
+    #: Entries kept by the `count_tokens_batch` memo (LRU)
+    token_cache_size: int = 65_536
+    #: Longer strings (whole prompts) are counted but never memoised
+    token_cache_max_chars: int = 512
+    #: `ResponseCache` consulted by `query` / `query_stream` (None = always call the API)
+    response_cache = None
+    #: model → (input, cached input, output) USD per million tokens
+    prices: dict[str, tuple[float, float, float]] = {}
+    #: price factor for Batch-API requests
+    batch_discount: float = 1.0
+    #: `RunBudget` every request must fit in before it is sent (None = no cap)
+    budget = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if "query" in cls.__dict__:
+            cls.query = _cached_query(cls.__dict__["query"])
 
     # -------- runtime behaviour --------
     @abstractmethod
@@ -22,10 +100,213 @@ class LLMProvider(ABC):
     ) -> str:
         ...
 
+    # -------- rate limiting --------
+    @property
+    def scheduler(self) -> RequestScheduler:
+        """One shared scheduler per provider instance, built on first use."""
+        sched = self.__dict__.get("_scheduler")
+        if sched is None:
+            with _SCHED_LOCK:
+                sched = self.__dict__.get("_scheduler")
+                if sched is None:
+                    sched = RequestScheduler(rpm=self.rpm_limit,
+                                             tpm=self.tpm_limit,
+                                             max_concurrency=self.max_concurrency)
+                    self._scheduler = sched
+        return sched
+
+    @scheduler.setter
+    def scheduler(self, sched: RequestScheduler) -> None:
+        """Share one budget between several instances (e.g. models of one account)."""
+        self._scheduler = sched
+
+    def _scheduled(self, send: Callable, *, prompt: str, max_tokens: int | None = None):
+        """
+        Run `send()` (one HTTP request) under the rate limiter with retries.
+        TPM is charged for the prompt plus the completion cap, as OpenAI does;
+        the run budget reserves the same worst case before anything is sent
+        and is settled to the usage `send` reported.
+        """
+        n_prompt = self.count_tokens(prompt)
+        est      = n_prompt + (max_tokens or 0)
+        if self.budget is None:
+            return self.scheduler.call(send, est_tokens=est)
+        held = self.budget.reserve(est, self.cost({"prompt_tokens": n_prompt,
+                                                   "completion_tokens": max_tokens or 0}))
+        _USAGE.last = None
+        try:
+            result = self.scheduler.call(send, est_tokens=est)
+        except BaseException:
+            self.budget.release(held)
+            raise
+        usage = getattr(_USAGE, "last", None)
+        if usage is None:                   # nothing reported – keep the worst case
+            self.budget.settle(held)
+        else:
+            self.budget.settle(held, usage["prompt_tokens"] + usage["completion_tokens"],
+                               self.cost(usage))
+        return result
+
+    # -------- usage & cost --------
+    def _note_usage(self, usage) -> None:
+        """Backends pass their response's `usage` block here (any thread)."""
+        _USAGE.last = normalize_usage(usage)
+
+    def last_usage(self) -> dict | None:
+        """Provider-reported usage of this thread's latest request (None on a cache hit)."""
+        return getattr(_USAGE, "last", None)
+
+    @property
+    def price(self) -> tuple[float, float, float] | None:
+        return self.prices.get(self.model_name)
+
+    def cost(self, usage: dict | None, *, batch: bool = False) -> float | None:
+        """USD for `usage` at this model's price (None if it has none)."""
+        return cost_usd(self.price, usage, discount=self.batch_discount if batch else 1.0)
+
+    # -------- streaming --------
+    def _stream_chunks(self, prompt: str, *, temperature: float,
+                       max_tokens: int | None, timeout: int | None
+                       ) -> Iterator[tuple[str, int | None]]:
+        """
+        Yield `(text_delta, completion_tokens_or_None)` while the model
+        decodes.  Closing the generator must abort the HTTP stream.
+        """
+        raise NotImplementedError
+
+    @property
+    def supports_streaming(self) -> bool:
+        return type(self)._stream_chunks is not LLMProvider._stream_chunks
+
+    def query_stream(
+        self,
+        prompt: str,
+        *,
+        temperature: float = 0.0,
+        max_tokens: int | None = None,
+        timeout:    int | None = None,
+        should_stop: Callable[[str], bool] | None = None,
+    ) -> StreamResult:
+        """
+        Streamed `query` with time-to-first-token and decode-rate metrics.
+        `should_stop(partial_text)` is checked at every line break; returning
+        True cancels the generation and keeps what has arrived so far.
+        Answers in `response_cache` come back with their original timing.
+        """
+        cache = self.response_cache
+        key   = cache.key_for(self, prompt, temperature, max_tokens) if cache else None
+        _USAGE.last = None
+        if cache is not None:
+            hit = cache.get(key)
+            if hit is not None:
+                meta = cache.last_hit() or {}
+                return StreamResult(
+                    text              = hit,
+                    ttft_ms           = meta.get("ttft_ms"),
+                    total_ms          = meta.get("latency_ms", 0.0),
+                    completion_tokens = meta.get("completion_tokens"),
+                    decode_tok_per_s  = meta.get("decode_tok_per_s"),
+                    cached            = True,
+                    usage             = meta.get("usage"),
+                )
+
+        def _consume() -> StreamResult:
+            parts, ttft, usage, cancelled = [], None, None, False
+            t0 = perf_counter()
+            chunks = self._stream_chunks(prompt, temperature=temperature,
+                                         max_tokens=max_tokens, timeout=timeout)
+            try:
+                for delta, n_tok in chunks:
+                    if n_tok is not None:
+                        usage = n_tok
+                    if not delta:
+                        continue
+                    if ttft is None:
+                        ttft = (perf_counter() - t0) * 1_000
+                    parts.append(delta)
+                    if should_stop and "\n" in delta and should_stop("".join(parts)):
+                        cancelled = True
+                        break
+            finally:
+                chunks.close()
+            total = (perf_counter() - t0) * 1_000
+
+            text = "".join(parts).strip()
+            n_out = usage if usage is not None else (self.count_tokens(text) if text else 0)
+            decode_s = (total - (ttft or total)) / 1_000
+            if cancelled and getattr(_USAGE, "last", None) is None:
+                # the final usage chunk never comes on a cancelled stream, but the
+                # request is billed: count locally (a lower bound) and flag it
+                _USAGE.last = {"prompt_tokens": self.count_tokens(prompt),
+                               "completion_tokens": n_out, "cached_tokens": 0,
+                               "estimated": True}
+            return StreamResult(
+                text              = text,
+                ttft_ms           = ttft,
+                total_ms          = total,
+                completion_tokens = n_out,
+                decode_tok_per_s  = n_out / decode_s if decode_s > 0 else None,
+                cancelled         = cancelled,
+                usage             = getattr(_USAGE, "last", None),
+            )
+
+        res = self._scheduled(_consume, prompt=prompt, max_tokens=max_tokens)
+        if cache is not None and not res.cancelled:      # a cut-off answer is not the answer
+            cache.put(key, res.text, {"latency_ms": res.total_ms, "ttft_ms": res.ttft_ms,
+                                      "completion_tokens": res.completion_tokens,
+                                      "decode_tok_per_s": res.decode_tok_per_s,
+                                      "usage": res.usage})
+        return res
+
     # -------- tokenisation helpers --------
     @abstractmethod
     def count_tokens(self, text: str) -> int:
         ...
 
+    @property
+    def tokenizer_id(self) -> str:
+        """
+        Names the tokenizer (and version) behind `count_tokens`; keys the
+        verified-vocabulary cache, so it must change whenever token
+        boundaries could.  Must not load the tokenizer itself.
+        """
+        return f"{type(self).__module__}.{type(self).__qualname__}:{self.model_name}"
+
+    def _encode_lengths(self, texts: list[str]) -> list[int]:
+        """
+        Uncached token counts for many strings.  Backends override this with
+        their tokenizer's native batch call.
+        """
+        return [self.count_tokens(t) for t in texts]
+
+    def count_tokens_batch(self, texts: Iterable[str]) -> list[int]:
+        """`count_tokens` for many strings, memoised for short repeats."""
+        texts = list(texts)
+        memo  = self.__dict__.setdefault("_token_memo", OrderedDict())
+        lock  = self.__dict__.setdefault("_token_memo_lock", threading.Lock())
+
+        counts: list[int | None] = [None] * len(texts)
+        todo: dict[str, list[int]] = {}
+        with lock:
+            for i, t in enumerate(texts):
+                hit = memo.get(t)
+                if hit is None:
+                    todo.setdefault(t, []).append(i)
+                else:
+                    memo.move_to_end(t)
+                    counts[i] = hit
+
+        if todo:
+            fresh = self._encode_lengths(list(todo))
+            with lock:
+                for t, n in zip(todo, fresh):
+                    for i in todo[t]:
+                        counts[i] = n
+                    if len(t) <= self.token_cache_max_chars:
+                        memo[t] = n
+                while len(memo) > self.token_cache_size:
+                    memo.popitem(last=False)
+        return counts
+
     #: Path of the single-token JSON file that *matches the tokenizer above*
     token_set_path: str
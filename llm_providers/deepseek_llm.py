@@ -1,32 +1,47 @@
 # llm_providers/deepseek_llm.py
-import os, streamlit as st
+import os
 from openai import OpenAI          # DeepSeek’s API is OpenAI-compatible
 from .base import LLMProvider
 from dotenv import load_dotenv
-from functools import partial      
-from transformers import AutoTokenizer
+from functools import lru_cache
 
+TOKENIZER_REPO = "deepseek-ai/DeepSeek-V3"
 
-_encoder = AutoTokenizer.from_pretrained("deepseek-ai/DeepSeek-V3",
-                                         trust_remote_code=True)
+@lru_cache(maxsize=1)
+def get_encoder():
+    """Load the HF tokenizer (and transformers) on first use only."""
+    from transformers import AutoTokenizer
+    return AutoTokenizer.from_pretrained(TOKENIZER_REPO, trust_remote_code=True)
 
-ENCODE = partial(_encoder.encode, add_special_tokens=False)   
+def ENCODE(text: str) -> list[int]:
+    return get_encoder().encode(text, add_special_tokens=False)
 # ----------------------------------------------------------------------
 
 class DeepSeekProvider(LLMProvider):
     provider_id      = "deepseek"
     model_name       = os.getenv("DEEPSEEK_MODEL", "deepseek-chat")
     token_set_path   = "tokens/deepseek_tokens2_clean.json"
+    max_concurrency  = 16          # no hard RPM cap, latency is the bottleneck
+    # USD per 1M tokens (input cache miss, input cache hit, output)
+    prices = {
+        "deepseek-chat":     (0.27, 0.07, 1.10),
+        "deepseek-reasoner": (0.55, 0.14, 2.19),
+    }
 
-    def __init__(self):
+    def __init__(self, model_name: str | None = None):
+        if model_name:
+            self.model_name = model_name
         load_dotenv()
         api_key = os.getenv("DEEPSEEK_API_KEY")
         if not api_key:
+            import streamlit as st
             st.warning("DEEPSEEK_API_KEY not found in environment – provider disabled.")
             raise RuntimeError("Missing API key")
 
+        # retries are handled by self.scheduler, not the SDK
         self._client   = OpenAI(api_key=api_key,
-                                base_url="https://api.deepseek.com")
+                                base_url="https://api.deepseek.com",
+                                max_retries=0)
         self._encode   = ENCODE      
         self.max_tokens = 16384 ##OAI          
 
@@ -51,12 +66,56 @@ class DeepSeekProvider(LLMProvider):
         if timeout is not None:
             params["timeout"] = timeout            #  failed responses take forever
 
-        resp = self._client.chat.completions.create(**params)
+        def _send():
+            raw = self._client.chat.completions.with_raw_response.create(**params)
+            self.scheduler.observe_headers(raw.headers)
+            resp = raw.parse()
+            self._note_usage(resp.usage)
+            return resp
+
+        resp = self._scheduled(_send, prompt=prompt, max_tokens=max_tokens)
         return resp.choices[0].message.content.strip()
 
+    def _stream_chunks(self, prompt, *, temperature, max_tokens, timeout):
+        params = dict(
+            model          = self.model_name,
+            messages       = [{"role": "user", "content": prompt}],
+            temperature    = temperature,
+            stream         = True,
+            stream_options = {"include_usage": True},
+        )
+        if max_tokens is not None:
+            params["max_tokens"] = max_tokens
+        if timeout is not None:
+            params["timeout"] = timeout
+
+        raw = self._client.chat.completions.with_raw_response.create(**params)
+        self.scheduler.observe_headers(raw.headers)
+        stream = raw.parse()
+        try:
+            for chunk in stream:
+                if chunk.usage is not None:
+                    self._note_usage(chunk.usage)
+                    yield "", chunk.usage.completion_tokens
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content, None
+        finally:
+            stream.close()                 # drops the connection on early cancel
+
     def count_tokens(self, text: str) -> int:   
         return len(self._encode(text))
 
+    @property
+    def tokenizer_id(self) -> str:
+        from importlib.metadata import version
+        return f"transformers-{version('transformers')}:{TOKENIZER_REPO}"
+
+    def _encode_lengths(self, texts: list[str]) -> list[int]:
+        # fast (Rust) tokenizer batch path
+        ids = get_encoder()(texts, add_special_tokens=False,
+                            return_attention_mask=False)["input_ids"]
+        return [len(x) for x in ids]
+
     # def queue_batch_request(self, *args, **kwargs):
     #     """DeepSeek does not support native batch API; use single-call mode."""
     #     raise NotImplementedError("DeepSeek API has no /batches endpoint")
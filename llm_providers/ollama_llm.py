@@ -1,38 +1,108 @@
 # llm_providers/ollama_llm.py
-import json, os, requests, tiktoken
+import json, os, requests
+from functools import lru_cache
 from .base import LLMProvider
 
+LLAMA3_REPO = "NousResearch/Meta-Llama-3-8B-Instruct"
+
+@lru_cache(maxsize=1)
+def get_encoding():
+    """Llama-3 tokenizer, loaded on first use."""
+    import tiktoken
+    try:
+        # tiktoken already ships 'llama3' as of v0.6.0; fallback if absent
+        return tiktoken.get_encoding("llama3")
+    except (KeyError, ValueError):
+        from transformers import AutoTokenizer
+        return AutoTokenizer.from_pretrained(LLAMA3_REPO, use_fast=True)
+
 class OllamaProvider(LLMProvider):
     
     provider_id = "ollama"
     model_name  = os.getenv("OLLAMA_MODEL", "llama3.2")
     token_set_path = "tokens/llama3_tokens.json"
+    max_concurrency = 1            # single local GPU
 
-    def __init__(self, host: str = "http://localhost:11434"):
+    def __init__(self, model_name: str | None = None, host: str = "http://localhost:11434"):
+        if model_name:
+            self.model_name = model_name
         self._url = f"{host}/api/generate"
-        try:
-            # tiktoken already ships 'llama3' as of v0.6.0; fallback if absent
-            self._encoding = tiktoken.get_encoding("llama3")
-        except KeyError:
-            from transformers import AutoTokenizer
-            self._encoding = AutoTokenizer.from_pretrained(
-                "NousResearch/Meta-Llama-3-8B-Instruct", use_fast=True
-            )
+        self.max_tokens = 8192
+
+    @property
+    def _encoding(self):
+        return get_encoding()
+
+    @property
+    def tokenizer_id(self) -> str:
+        from importlib.metadata import version
+        import tiktoken
+        if "llama3" in tiktoken.list_encoding_names():   # same test as get_encoding
+            return f"tiktoken-{version('tiktoken')}:llama3"
+        return f"transformers-{version('transformers')}:{LLAMA3_REPO}"
 
     # --- interface ---
-    def query(self, prompt: str, *, temperature: float = 0.0) -> str:
+    def query(
+        self,
+        prompt: str,
+        *,
+        temperature: float = 0.0,
+        max_tokens: int | None = None,
+        timeout:    int | None = None
+    ) -> str:
         payload = {
             "model": self.model_name,
             "prompt": prompt,
-            "temperature": temperature,
+            "options": {"temperature": temperature},
             "stream": False
         }
-        r = requests.post(self._url, json=payload, timeout=600)
-        r.raise_for_status()
-        return r.json()["response"].strip()
+        if max_tokens is not None:
+            payload["options"]["num_predict"] = max_tokens
+
+        def _send():
+            r = requests.post(self._url, json=payload, timeout=timeout or 600)
+            r.raise_for_status()
+            body = r.json()
+            self._note_usage(body)          # prompt_eval_count / eval_count
+            return body
+
+        return self._scheduled(_send, prompt=prompt, max_tokens=max_tokens)["response"].strip()
+
+    def _stream_chunks(self, prompt, *, temperature, max_tokens, timeout):
+        payload = {
+            "model": self.model_name,
+            "prompt": prompt,
+            "options": {"temperature": temperature},
+            "stream": True
+        }
+        if max_tokens is not None:
+            payload["options"]["num_predict"] = max_tokens
+
+        r = requests.post(self._url, json=payload, timeout=timeout or 600, stream=True)
+        try:
+            r.raise_for_status()
+            for line in r.iter_lines():
+                if not line:
+                    continue
+                msg = json.loads(line)
+                if msg.get("done"):
+                    self._note_usage(msg)
+                yield msg.get("response", ""), msg.get("eval_count") if msg.get("done") else None
+        finally:
+            r.close()
+
+    @property
+    def price(self) -> tuple[float, float, float]:
+        return (0.0, 0.0, 0.0)         # local – tokens are budgeted, dollars are not
 
     def count_tokens(self, text: str) -> int:
         # transformers encoders expose either .encode or __call__
         if hasattr(self._encoding, "encode"):
             return len(self._encoding.encode(text))
         return len(self._encoding(text)["input_ids"])
+
+    def _encode_lengths(self, texts: list[str]) -> list[int]:
+        if hasattr(self._encoding, "encode_batch"):          # tiktoken
+            return [len(ids) for ids in self._encoding.encode_batch(texts)]
+        ids = self._encoding(texts)["input_ids"]
+        return [len(x) for x in ids]
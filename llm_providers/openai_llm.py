@@ -4,28 +4,114 @@ import time
 import uuid
 from openai import OpenAI
 from dotenv import load_dotenv
-import tiktoken
+from functools import lru_cache
+from .base import LLMProvider
 
-class OpenAIProvider:
+@lru_cache(maxsize=None)
+def get_encoding(model_name: str):
+    """tiktoken encoding, loaded on first use and shared across instances."""
+    import tiktoken
+    return tiktoken.encoding_for_model(model_name)
+
+class OpenAIProvider(LLMProvider):
     provider_id = "openai"
     model_name  = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
     token_set_path = "tokens/gpt4o_tokens_clean.json"
+    max_concurrency = 8
+    rpm_limit       = 500          # tier-1 defaults; headers take over once seen
+    tpm_limit       = 200_000
+    # USD per 1M tokens (input, cached input, output); Batch API is half price
+    prices = {
+        "gpt-4o-mini":   (0.15, 0.075, 0.60),
+        "gpt-4o":        (2.50, 1.25, 10.00),
+        "gpt-3.5-turbo": (0.50, 0.50, 1.50),
+    }
+    batch_discount  = 0.5
 
-    def __init__(self):
+    def __init__(self, model_name: str | None = None):
+        if model_name:
+            self.model_name = model_name
         load_dotenv()
         api_key = os.getenv("OPENAI_API_KEY")
         if not api_key:
             raise RuntimeError("Missing OPENAI_API_KEY")
-        self._client   = OpenAI(api_key=api_key)
-        self._encoding = tiktoken.encoding_for_model(self.model_name)
+        # retries are handled by self.scheduler, not the SDK
+        self._client   = OpenAI(api_key=api_key, max_retries=0)
         self.max_tokens = 16384
 
         self.batch_inputs = []
         self.batch_metadata = []
 
+    @property
+    def _encoding(self):
+        return get_encoding(self.model_name)
+
+    @property
+    def tokenizer_id(self) -> str:
+        from importlib.metadata import version
+        from tiktoken.model import encoding_name_for_model
+        return f"tiktoken-{version('tiktoken')}:{encoding_name_for_model(self.model_name)}"
+
+    def query(
+        self,
+        prompt: str,
+        *,
+        temperature: float = 0.0,
+        max_tokens: int | None = None,
+        timeout:    int | None = None
+    ) -> str:
+        params = dict(
+            model       = self.model_name,
+            messages    = [{"role": "user", "content": prompt}],
+            temperature = temperature,
+        )
+        if max_tokens is not None:
+            params["max_tokens"] = max_tokens
+        if timeout is not None:
+            params["timeout"] = timeout
+
+        def _send():
+            raw = self._client.chat.completions.with_raw_response.create(**params)
+            self.scheduler.observe_headers(raw.headers)
+            resp = raw.parse()
+            self._note_usage(resp.usage)
+            return resp
+
+        resp = self._scheduled(_send, prompt=prompt, max_tokens=max_tokens)
+        return resp.choices[0].message.content.strip()
+
+    def _stream_chunks(self, prompt, *, temperature, max_tokens, timeout):
+        params = dict(
+            model          = self.model_name,
+            messages       = [{"role": "user", "content": prompt}],
+            temperature    = temperature,
+            stream         = True,
+            stream_options = {"include_usage": True},
+        )
+        if max_tokens is not None:
+            params["max_tokens"] = max_tokens
+        if timeout is not None:
+            params["timeout"] = timeout
+
+        raw = self._client.chat.completions.with_raw_response.create(**params)
+        self.scheduler.observe_headers(raw.headers)
+        stream = raw.parse()
+        try:
+            for chunk in stream:
+                if chunk.usage is not None:
+                    self._note_usage(chunk.usage)
+                    yield "", chunk.usage.completion_tokens
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content, None
+        finally:
+            stream.close()                 # drops the connection on early cancel
+
     def count_tokens(self, text: str) -> int:
         return len(self._encoding.encode(text))
 
+    def _encode_lengths(self, texts: list[str]) -> list[int]:
+        return [len(ids) for ids in self._encoding.encode_batch(texts)]
+
     def queue_batch_request(self, prompt: str, metadata: dict, max_tokens=500):
         self.batch_inputs.append({
             "custom_id": str(uuid.uuid4()),
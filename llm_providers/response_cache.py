@@ -0,0 +1,198 @@
+"""
+llm_providers/response_cache.py
+───────────────────────────────
+Persistent, content-addressed cache of model answers.
+
+Entries are keyed by (provider, model, sha256 of the prompt, temperature,
+max_tokens) and live in one SQLite file, zlib-compressed, next to the
+original call's timing (latency, TTFT…) so replayed trials keep the
+metrics they were first measured with.  The least recently used entries
+are evicted once the file outgrows `max_bytes`; hits and misses are
+counted per session and in total.
+
+`LLMProvider.query` / `query_stream` consult `provider.response_cache`
+before touching the network.  With `cache_only=True` a miss raises
+`CacheMiss` instead – a replay that never calls an API.
+
+    python -m llm_providers.response_cache               # stats
+    python -m llm_providers.response_cache --evict-mb 500
+"""
+
+from __future__ import annotations
+import argparse, hashlib, json, sqlite3, threading, time, zlib
+from pathlib import Path
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key         TEXT PRIMARY KEY,
+    provider    TEXT,
+    model       TEXT,
+    prompt_hash TEXT,
+    temperature REAL,
+    max_tokens  INTEGER,
+    data        BLOB,          -- zlib utf-8 answer
+    meta        TEXT,          -- JSON timing of the original call
+    size        INTEGER,
+    created     REAL,
+    last_used   REAL
+);
+CREATE INDEX IF NOT EXISTS idx_responses_lru ON responses (last_used);
+CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER);
+INSERT OR IGNORE INTO counters VALUES ('hits', 0), ('misses', 0);
+"""
+
+
+class CacheMiss(LookupError):
+    """Raised on a miss when the cache is in replay-only mode."""
+
+
+def prompt_hash(prompt) -> str:
+    """sha256 of a prompt string, or of a `LazyPrompt` streamed piece by piece."""
+    h = hashlib.sha256()
+    for part in (prompt.parts() if hasattr(prompt, "parts") else (prompt,)):
+        h.update(part.encode("utf-8"))
+    return h.hexdigest()
+
+
+class ResponseCache:
+    """Thread-safe; one instance can be shared by every provider of a run."""
+
+    def __init__(self, path: str | Path, *, max_bytes: int = 2 << 30,
+                 cache_only: bool = False):
+        self.path       = Path(path)
+        self.max_bytes  = max_bytes
+        self.cache_only = cache_only
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._lock  = threading.Lock()
+        self._local = threading.local()
+        self._bytes = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        self.hits = self.misses = 0             # this session
+
+    # -------- keys --------
+    @staticmethod
+    def key(provider_id: str, model: str, prompt, temperature: float,
+            max_tokens: int | None) -> tuple[str, tuple]:
+        """(cache key, column values) for one request."""
+        cols = (provider_id, model, prompt_hash(prompt), float(temperature), max_tokens)
+        return hashlib.sha256(json.dumps(cols).encode()).hexdigest(), cols
+
+    def key_for(self, llm, prompt, temperature: float, max_tokens: int | None):
+        return self.key(llm.provider_id, llm.model_name, prompt, temperature, max_tokens)
+
+    # -------- lookups --------
+    def get(self, key: tuple[str, tuple]) -> str | None:
+        """The cached answer (and `last_hit()` meta), or None; counts hit/miss."""
+        k, _ = key
+        now  = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data, meta FROM responses WHERE key = ?", (k,)).fetchone()
+            name = "hits" if row else "misses"
+            with self._conn:
+                if row:
+                    self._conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, k))
+                self._conn.execute("UPDATE counters SET value = value + 1 WHERE name = ?", (name,))
+            if row:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if row is None:
+            self._local.hit = None
+            if self.cache_only:
+                raise CacheMiss(f"no cached response for {key[1][:2]} (replay-only mode)")
+            return None
+        self._local.hit = json.loads(row[1] or "{}")
+        return zlib.decompress(row[0]).decode("utf-8")
+
+    def last_hit(self) -> dict | None:
+        """Timing meta of this thread's latest `get` if it was a hit, else None."""
+        return getattr(self._local, "hit", None)
+
+    def __contains__(self, key: tuple[str, tuple]) -> bool:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT 1 FROM responses WHERE key = ?", (key[0],)).fetchone() is not None
+
+    # -------- writes --------
+    def put(self, key: tuple[str, tuple], text: str, meta: dict | None = None) -> None:
+        k, cols = key
+        data = zlib.compress(text.encode("utf-8"), 6)
+        now  = time.time()
+        with self._lock:
+            with self._conn:
+                old = self._conn.execute(
+                    "SELECT size FROM responses WHERE key = ?", (k,)).fetchone()
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO responses VALUES (?,?,?,?,?,?,?,?,?,?,?)",
+                    (k, *cols, data, json.dumps(meta or {}), len(data), now, now))
+            self._bytes += len(data) - (old[0] if old else 0)
+            if self._bytes > self.max_bytes:
+                self._evict(int(self.max_bytes * 0.9))
+
+    def _evict(self, target: int) -> int:
+        """Drop least recently used entries until ≤ target bytes (lock held)."""
+        dropped = 0
+        with self._conn:
+            while self._bytes > target:
+                rows = self._conn.execute(
+                    "SELECT key, size FROM responses ORDER BY last_used LIMIT 256").fetchall()
+                if not rows:
+                    break
+                self._conn.executemany("DELETE FROM responses WHERE key = ?",
+                                       [(r[0],) for r in rows])
+                self._bytes -= sum(r[1] for r in rows)
+                dropped += len(rows)
+        return dropped
+
+    def evict(self, max_bytes: int | None = None) -> int:
+        """Evict down to `max_bytes` (default: the configured limit); returns entries dropped."""
+        with self._lock:
+            return self._evict(self.max_bytes if max_bytes is None else max_bytes)
+
+    def clear(self) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.execute("UPDATE counters SET value = 0")
+            self._bytes = 0
+
+    # -------- reporting --------
+    def stats(self) -> dict:
+        with self._lock:
+            entries, = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()
+            total = dict(self._conn.execute("SELECT name, value FROM counters"))
+        looked = self.hits + self.misses
+        return {
+            "entries": entries,
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / looked, 3) if looked else None,
+            "total_hits": total.get("hits", 0),
+            "total_misses": total.get("misses", 0),
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+if __name__ == "__main__":
+    from config import RESPONSE_CACHE_PATH
+    ap = argparse.ArgumentParser(description="Response cache maintenance.")
+    ap.add_argument("path", nargs="?", default=RESPONSE_CACHE_PATH)
+    ap.add_argument("--evict-mb", type=float, default=None,
+                    help="evict least recently used entries down to this size")
+    ap.add_argument("--clear", action="store_true")
+    a = ap.parse_args()
+    cache = ResponseCache(a.path)
+    if a.clear:
+        cache.clear()
+    if a.evict_mb is not None:
+        print(f"evicted {cache.evict(int(a.evict_mb * 2**20))} entries")
+    print(json.dumps(cache.stats(), indent=2))
@@ -0,0 +1,272 @@
+"""
+llm_providers/scheduler.py
+──────────────────────────
+Rate-limit-aware request scheduler shared by every provider.
+
+• token buckets on requests/min and tokens/min
+• reads `x-ratelimit-*`, `Retry-After` and `retry-after-ms` headers
+• jittered exponential retry for transient errors (429, 408, 409, 5xx,
+  timeouts, dropped connections)
+• AIMD concurrency: halve the in-flight limit on a 429, creep back up
+  after a run of clean responses
+"""
+
+from __future__ import annotations
+import random, re, threading, time
+from email.utils import parsedate_to_datetime
+from typing import Callable, Mapping, TypeVar
+
+T = TypeVar("T")
+
+TRANSIENT_STATUS = {408, 409, 429, 500, 502, 503, 504, 520, 522, 524, 529}
+
+
+class RetriesExhausted(RuntimeError):
+    """A transient error kept coming back after every retry."""
+
+
+# ───────────────────────────────────────────────────
+#  helpers
+# ───────────────────────────────────────────────────
+_DURATION_RE = re.compile(r"(?P<val>\d+(?:\.\d+)?)(?P<unit>ms|h|m|s)")
+_UNIT_S = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+def parse_duration(text: str | None) -> float | None:
+    """'6m0s' / '1.5s' / '20ms' / '2' → seconds."""
+    if not text:
+        return None
+    text = text.strip()
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    parts = _DURATION_RE.findall(text)
+    if not parts:
+        return None
+    return sum(float(v) * _UNIT_S[u] for v, u in parts)
+
+
+def _headers_of(exc: BaseException) -> Mapping[str, str]:
+    resp = getattr(exc, "response", None)
+    return getattr(resp, "headers", None) or {}
+
+
+def status_of(exc: BaseException) -> int | None:
+    """HTTP status of an openai/requests/httpx error, if it carries one."""
+    code = getattr(exc, "status_code", None)
+    if code is None:
+        code = getattr(getattr(exc, "response", None), "status_code", None)
+    return int(code) if code is not None else None
+
+
+def is_transient(exc: BaseException) -> bool:
+    code = status_of(exc)
+    if code is not None:
+        return code in TRANSIENT_STATUS
+    # no status → network level: timeouts and dropped connections retry
+    name = type(exc).__name__
+    return any(s in name for s in ("Timeout", "Connection", "RemoteProtocol"))
+
+
+def retry_after(headers: Mapping[str, str]) -> float | None:
+    """Seconds the server asked us to wait, if it said so."""
+    h = {k.lower(): v for k, v in dict(headers).items()}
+    if "retry-after-ms" in h:
+        try:
+            return float(h["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+    val = h.get("retry-after")
+    if not val:
+        return None
+    try:
+        return float(val)
+    except ValueError:
+        try:
+            return max(0.0, parsedate_to_datetime(val).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+
+# ───────────────────────────────────────────────────
+#  token bucket
+# ───────────────────────────────────────────────────
+class TokenBucket:
+    """Continuous-refill bucket sized in units per minute (None = unlimited)."""
+
+    def __init__(self, per_minute: float | None):
+        self.capacity = per_minute
+        self.level    = per_minute or 0.0
+        self._stamp   = time.monotonic()
+        self._hold    = 0.0              # monotonic time before which we refuse
+
+    def _refill(self, now: float) -> None:
+        if self.capacity:
+            self.level = min(self.capacity,
+                             self.level + (now - self._stamp) * self.capacity / 60.0)
+        self._stamp = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until `amount` fits; 0 means it was taken."""
+        if now < self._hold:
+            return self._hold - now
+        if not self.capacity:
+            return 0.0
+        self._refill(now)
+        amount = min(amount, self.capacity)   # oversize requests still go
+        if self.level >= amount:
+            self.level -= amount
+            return 0.0
+        return (amount - self.level) * 60.0 / self.capacity
+
+    def refund(self, amount: float) -> None:
+        if self.capacity:
+            self.level = min(self.capacity, self.level + amount)
+
+    def sync(self, limit: float | None, remaining: float | None,
+             reset_s: float | None, now: float) -> None:
+        """Align with what the server reports."""
+        if limit:
+            self.capacity = float(limit)
+        if remaining is not None and self.capacity:
+            self._refill(now)
+            self.level = min(self.level, float(remaining))
+            if remaining <= 0 and reset_s:
+                self._hold = max(self._hold, now + reset_s)
+
+
+# ───────────────────────────────────────────────────
+#  scheduler
+# ───────────────────────────────────────────────────
+class RequestScheduler:
+    """
+    Gate every provider call through `call(fn, est_tokens=…)`.
+
+    `fn` performs exactly one HTTP request and returns its result; it may
+    report response headers back through `observe_headers`.
+    """
+
+    def __init__(
+        self,
+        *,
+        rpm: float | None = None,
+        tpm: float | None = None,
+        max_concurrency: int = 8,
+        min_concurrency: int = 1,
+        max_retries: int = 6,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+        increase_after: int = 10,
+    ):
+        self.requests = TokenBucket(rpm)
+        self.tokens   = TokenBucket(tpm)
+        self.max_concurrency = max(1, max_concurrency)
+        self.min_concurrency = max(1, min(min_concurrency, self.max_concurrency))
+        self.limit           = self.max_concurrency
+        self.max_retries     = max_retries
+        self.base_delay      = base_delay
+        self.max_delay       = max_delay
+        self.increase_after  = increase_after
+
+        self._cv        = threading.Condition()
+        self._in_flight = 0
+        self._streak    = 0
+        self.stats      = {"calls": 0, "retries": 0, "throttled": 0, "failed": 0}
+
+    # -------- slot & bucket acquisition --------
+    def _acquire(self, est_tokens: float) -> None:
+        with self._cv:
+            while True:
+                if self._in_flight < self.limit:
+                    now  = time.monotonic()
+                    wait = self.requests.wait_time(1, now)
+                    if wait == 0:
+                        wait = self.tokens.wait_time(est_tokens, now)
+                        if wait == 0:
+                            self._in_flight += 1
+                            return
+                        self.requests.refund(1)     # give back the request slot
+                    self._cv.wait(timeout=min(wait, 5.0))
+                else:
+                    self._cv.wait()
+
+    def _release(self) -> None:
+        with self._cv:
+            self._in_flight -= 1
+            self._cv.notify_all()
+
+    # -------- AIMD --------
+    def _on_success(self) -> None:
+        with self._cv:
+            self._streak += 1
+            if self._streak >= self.increase_after and self.limit < self.max_concurrency:
+                self.limit  += 1
+                self._streak = 0
+                self._cv.notify_all()
+
+    def _on_throttle(self) -> None:
+        with self._cv:
+            self._streak = 0
+            self.limit   = max(self.min_concurrency, self.limit // 2)
+            self.stats["throttled"] += 1
+
+    # -------- header feedback --------
+    def observe_headers(self, headers: Mapping[str, str] | None) -> None:
+        if not headers:
+            return
+        h   = {k.lower(): v for k, v in dict(headers).items()}
+        now = time.monotonic()
+
+        def _num(key):
+            try:
+                return float(h[key])
+            except (KeyError, TypeError, ValueError):
+                return None
+
+        with self._cv:
+            self.requests.sync(_num("x-ratelimit-limit-requests"),
+                               _num("x-ratelimit-remaining-requests"),
+                               parse_duration(h.get("x-ratelimit-reset-requests")), now)
+            self.tokens.sync(_num("x-ratelimit-limit-tokens"),
+                             _num("x-ratelimit-remaining-tokens"),
+                             parse_duration(h.get("x-ratelimit-reset-tokens")), now)
+
+    def _backoff(self, attempt: int, exc: BaseException) -> float:
+        hinted = retry_after(_headers_of(exc))
+        if hinted is not None:
+            return min(hinted, self.max_delay) + random.uniform(0, 0.25)
+        # full jitter
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    # -------- public --------
+    def call(self, fn: Callable[[], T], *, est_tokens: float = 0) -> T:
+        for attempt in range(self.max_retries + 1):
+            self._acquire(est_tokens)
+            try:
+                self.stats["calls"] += 1
+                result = fn()
+            except Exception as e:
+                if not is_transient(e):
+                    self.stats["failed"] += 1
+                    raise
+                if status_of(e) == 429:
+                    self._on_throttle()
+                self.observe_headers(_headers_of(e))
+                if attempt == self.max_retries:
+                    self.stats["failed"] += 1
+                    raise RetriesExhausted(
+                        f"gave up after {attempt + 1} attempts: {e}") from e
+                error = e
+            else:
+                self._on_success()
+                return result
+            finally:
+                self._release()
+
+            # back off outside the slot so other calls keep flowing
+            self.stats["retries"] += 1
+            delay = self._backoff(attempt, error)
+            print(f"⏳ transient error ({status_of(error) or type(error).__name__}), "
+                  f"retry {attempt + 1}/{self.max_retries} in {delay:.1f}s")
+            time.sleep(delay)
+        raise AssertionError("unreachable")
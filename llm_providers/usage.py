@@ -0,0 +1,154 @@
+"""
+llm_providers/usage.py
+──────────────────────
+Provider-reported token usage, prices, and per-run budgets.
+
+Every backend hands the `usage` block of its response to
+`LLMProvider._note_usage`; it is normalised to
+
+    {"prompt_tokens", "completion_tokens", "cached_tokens"}
+
+(`cached_tokens` = prompt tokens served from the provider's prompt cache)
+and priced with the provider's `prices` table, USD per million tokens.
+
+A `RunBudget` caps dollars and/or tokens for a run.  Each request
+reserves its worst case – prompt plus the completion cap – before it is
+dispatched and is settled to the reported usage afterwards, so the sum
+of what was sent can never pass the budget.  A request that does not
+fit waits while other reservations are still open (they usually settle
+far below their worst case); once nothing is open and it still does not
+fit, the budget is exhausted and the runner stops dispatching.
+
+Every reservation ends in one `settle` or `release`.  `release` is
+idempotent; a reservation this budget does not hold (journaled by an
+earlier process, or released when a run stopped waiting for its batch)
+is charged in full on settle.
+"""
+
+from __future__ import annotations
+import itertools, threading, uuid
+
+_IDS = itertools.count(1)
+
+
+class BudgetExceeded(RuntimeError):
+    """A request would take the run past its dollar or token budget."""
+
+
+def normalize_usage(usage) -> dict | None:
+    """Usage object / dict from the OpenAI, DeepSeek or Ollama APIs → common dict."""
+    if usage is None:
+        return None
+    get = usage.get if isinstance(usage, dict) else (lambda k: getattr(usage, k, None))
+    prompt, completion = get("prompt_tokens"), get("completion_tokens")
+    if prompt is None and get("prompt_eval_count") is not None:         # Ollama
+        prompt, completion = get("prompt_eval_count"), get("eval_count")
+    details = get("prompt_tokens_details")
+    cached  = (details.get("cached_tokens") if isinstance(details, dict)
+               else getattr(details, "cached_tokens", None)) if details else None
+    if cached is None:
+        cached = get("prompt_cache_hit_tokens")                         # DeepSeek
+    if prompt is None and completion is None:
+        return None
+    return {"prompt_tokens": int(prompt or 0), "completion_tokens": int(completion or 0),
+            "cached_tokens": int(cached or 0)}
+
+
+def cost_usd(price: tuple[float, float, float] | None, usage: dict | None, *,
+             discount: float = 1.0) -> float | None:
+    """USD for one request; price = (input, cached input, output) per 1M tokens."""
+    if price is None or usage is None:
+        return None
+    p_in, p_cached, p_out = price
+    fresh = usage["prompt_tokens"] - usage.get("cached_tokens", 0)
+    usd = (fresh * p_in + usage.get("cached_tokens", 0) * p_cached
+           + usage["completion_tokens"] * p_out) / 1e6
+    return round(usd * discount, 8)
+
+
+class RunBudget:
+    """Thread-safe dollar / token cap shared by every request of a run (None = no cap)."""
+
+    def __init__(self, usd: float | None = None, tokens: int | None = None, *,
+                 spent_usd: float = 0.0, spent_tokens: int = 0):
+        self.id        = uuid.uuid4().hex[:12]   # unique across processes (batch journals)
+        self.usd       = usd
+        self.tokens    = tokens
+        self.spent_usd = spent_usd          # carried over when a run is resumed
+        self.spent_tokens = spent_tokens
+        self.exhausted = False
+        self._held: set[str] = set()        # ids of reservations not yet settled / released
+        self._cond     = threading.Condition()
+
+    @property
+    def open(self) -> int:
+        return len(self._held)
+
+    def _fits(self, tokens: int, usd: float) -> bool:
+        return ((self.usd is None or self.spent_usd + usd <= self.usd) and
+                (self.tokens is None or self.spent_tokens + tokens <= self.tokens))
+
+    def reserve(self, tokens: int, usd: float | None, *, wait: bool = True) -> list:
+        """
+        Hold a request's worst case; returns the reservation.  Raises
+        `BudgetExceeded` when it does not fit: with `wait` only after open
+        reservations have settled, without it at once – the budget is
+        marked exhausted only when nothing open could free room.
+        """
+        if self.usd is not None and usd is None:
+            raise BudgetExceeded("dollar budget set but this model has no price")
+        usd = usd or 0.0
+        with self._cond:
+            while not self.exhausted and not self._fits(tokens, usd) and wait and self.open:
+                self._cond.wait()
+            if self.exhausted or not self._fits(tokens, usd):
+                if not self.open:
+                    self.exhausted = True
+                    self._cond.notify_all()
+                raise BudgetExceeded(f"budget reached: {self.describe()}")
+            self.spent_usd    += usd
+            self.spent_tokens += tokens
+            rid = f"{self.id}:{next(_IDS)}"
+            self._held.add(rid)
+        return [rid, tokens, usd]
+
+    def settle(self, reservation: list | None, tokens: int | None = None,
+               usd: float | None = None) -> None:
+        """
+        Replace a reservation by what the request actually used; None keeps
+        the reserved amount (billed, but no usage was reported).
+        """
+        rid, r_tok, r_usd = reservation if reservation else (None, 0, 0.0)
+        tokens = r_tok if tokens is None else tokens
+        usd    = r_usd if usd is None else usd
+        with self._cond:
+            if rid in self._held:
+                self._held.discard(rid)
+                self.spent_tokens -= r_tok
+                self.spent_usd    -= r_usd
+                self._cond.notify_all()
+            self.spent_tokens += tokens
+            self.spent_usd    += usd
+
+    def release(self, reservation: list | None) -> None:
+        """The request never went out (or failed before it could be billed)."""
+        if not reservation:
+            return
+        with self._cond:
+            if reservation[0] in self._held:
+                self._held.discard(reservation[0])
+                self.spent_tokens -= reservation[1]
+                self.spent_usd    -= reservation[2]
+                self._cond.notify_all()
+
+    def to_dict(self) -> dict:
+        return {"usd": self.usd, "tokens": self.tokens,
+                "spent_usd": round(self.spent_usd, 8), "spent_tokens": self.spent_tokens}
+
+    def describe(self) -> str:
+        parts = []
+        if self.usd is not None:
+            parts.append(f"${self.spent_usd:.4f} of ${self.usd:g}")
+        if self.tokens is not None:
+            parts.append(f"{self.spent_tokens:,} of {self.tokens:,} tokens")
+        return ", ".join(parts) or "unlimited"
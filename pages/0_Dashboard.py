@@ -1,62 +1,133 @@
-import streamlit as st, pandas as pd, sqlite3
-from core.db_utils import get_conn
-from core.json_import import import_json_dir
+import sqlite3
 import streamlit as st
 import pandas as pd
-import ace_tools_open as tools
+from core import parquet_store
+from core.db_utils import get_conn, query_readonly, trial_texts
+from core.json_import import import_json_dir
+from core.summary import load_cells
 
 st.set_page_config(layout="wide")
 st.title("📊 Experiment Dashboard")
 
-# Connect to DB and load data
+PAGE_SIZE   = 50
+CELL_KEYS   = ["provider", "model", "num_facts", "k"]
+METRIC_COLS = "id, trial_idx, seq_acc, tok_acc, flaw, latency_ms, prompt_tokens"
+
 conn = get_conn()
-df = pd.read_sql_query("SELECT * FROM trials LIMIT 10000;", conn)
 
-# Sidebar filters
+
+# ─────────────────────────── queries ────────────────────────────
+# Everything below is cached by its arguments, i.e. by the filter
+# signature; the refresh button clears the caches after an import.
+@st.cache_data(show_spinner=False)
+def filter_options() -> dict[str, list]:
+    """Distinct values for the sidebar – read from cell_summary, not trials."""
+    return {c: [r[0] for r in conn.execute(
+                f"SELECT DISTINCT {c} FROM cell_summary WHERE {c} IS NOT NULL ORDER BY {c}")]
+            for c in CELL_KEYS}
+
+
+def _where(filters: tuple) -> tuple[str, list]:
+    """((column, (values…)), …) → parameterized `col IN (?, …) AND …`."""
+    clauses, params = [], []
+    for col, values in filters:
+        clauses.append(f"{col} IN ({','.join('?' * len(values))})" if values else "0")
+        params.extend(values)
+    return " AND ".join(clauses), params
+
+
+@st.cache_data(show_spinner=False)
+def cell_stats(filters: tuple) -> pd.DataFrame:
+    where, params = _where(filters)
+    return load_cells(CELL_KEYS, where, params, conn=conn)
+
+
+@st.cache_data(show_spinner=False)
+def custom_stats(custom_where: str) -> pd.DataFrame:
+    """Aggregate in SQL so a broad clause never drags trial rows into pandas."""
+    cols, rows = query_readonly(f"""
+        SELECT provider, model, num_facts, k,
+               AVG(seq_acc) AS seq_acc, AVG(tok_acc) AS tok_acc,
+               AVG(flaw > 0) AS flaw_rate, COUNT(*) AS n
+        FROM trials WHERE ({custom_where})
+        GROUP BY provider, model, num_facts, k""")
+    return pd.DataFrame(rows, columns=cols)
+
+
+@st.cache_data(show_spinner=False)
+def store_cell(cell: tuple) -> pd.DataFrame:
+    """A cell's metric rows from the Parquet store: partition + N/K row-group pushdown."""
+    provider, model, n, k = cell
+    return (parquet_store.load_metrics(
+                columns=[c.strip() for c in METRIC_COLS.split(",")],
+                filter=parquet_store.nk_filter(n_min=n, n_max=n, k_min=k, k_max=k,
+                                               providers=[provider], models=[model]))
+            .sort_values(["id", "trial_idx"], ignore_index=True))
+
+
+def trial_page(cell: tuple, custom_where: str, after: tuple | None,
+               n_trials: int) -> pd.DataFrame:
+    """
+    One keyset page of metric rows for a cell, ordered by (id, trial_idx).
+    Read from the Parquet store when it holds the whole cell; SQLite for a
+    custom WHERE clause or when the store is missing / behind the DB.
+    """
+    if not custom_where and parquet_store.exists():
+        df = store_cell(cell)
+        if len(df) == n_trials:
+            if after:
+                df = df[(df.id > after[0]) | ((df.id == after[0]) & (df.trial_idx > after[1]))]
+            return df.iloc[:PAGE_SIZE + 1].reset_index(drop=True)
+    return sql_page(cell, custom_where, after)
+
+
+@st.cache_data(show_spinner=False)
+def sql_page(cell: tuple, custom_where: str, after: tuple | None) -> pd.DataFrame:
+    where  = " AND ".join(f"{c} = ?" for c in CELL_KEYS)
+    params = list(cell)
+    if after:
+        where += " AND (id, trial_idx) > (?, ?)"
+        params += list(after)
+    if custom_where:
+        where += f" AND ({custom_where})"
+    cols, rows = query_readonly(
+        f"SELECT {METRIC_COLS} FROM trials WHERE {where} "
+        f"ORDER BY id, trial_idx LIMIT {PAGE_SIZE + 1}", params)
+    return pd.DataFrame(rows, columns=cols)
+
+
+# ─────────────────────────── sidebar ────────────────────────────
+opts = filter_options()
 with st.sidebar.expander("🎛️ Filters & Settings", expanded=False):
-    provider_options = sorted(df['provider'].dropna().unique())
-    model_options = sorted(df['model'].dropna().unique())
-    n_options = sorted(df['num_facts'].dropna().unique())
-    k_options = sorted(df['k'].dropna().unique())
-
-    selected_provider = st.multiselect("Provider", provider_options, default=provider_options)
-    selected_model = st.multiselect("Model", model_options, default=model_options)
-    selected_n = st.multiselect("Num Facts (N)", n_options, default=n_options)
-    selected_k = st.multiselect("Tokens per Fact (K)", k_options, default=k_options)
-
-    custom_where = st.text_input("Optional SQL WHERE override")
-
-# Filter data based on sidebar or custom SQL
-if custom_where.strip():
-    try:
-        df_filtered = pd.read_sql_query(f"SELECT * FROM trials WHERE {custom_where}", conn)
-    except Exception as e:
-        st.error(f"Invalid SQL WHERE clause: {e}")
-        df_filtered = pd.DataFrame()
-else:
-    df_filtered = df[
-        df["provider"].isin(selected_provider) &
-        df["model"].isin(selected_model) &
-        df["num_facts"].isin(selected_n) &
-        df["k"].isin(selected_k)
-    ]
-
-# Summary statistics grouped by (provider, model, N, K)
-if not df_filtered.empty:
-    stats_df = (
-        df_filtered
-        .groupby(['provider', 'model', 'num_facts', 'k'], as_index=False)
-        .agg(
-            avg_seq_acc=('seq_acc', 'mean'),
-            avg_tok_acc=('tok_acc', 'mean'),
-            pct_major_flaw=('flaw', lambda x: (x > 0).mean() * 100),
-            n_trials=('trial_idx', 'count')
-        )
-        .sort_values(['provider', 'model', 'num_facts', 'k'])
-    )
+    selected = {
+        "provider":  st.multiselect("Provider", opts["provider"], default=opts["provider"]),
+        "model":     st.multiselect("Model", opts["model"], default=opts["model"]),
+        "num_facts": st.multiselect("Num Facts (N)", opts["num_facts"], default=opts["num_facts"]),
+        "k":         st.multiselect("Tokens per Fact (K)", opts["k"], default=opts["k"]),
+    }
+    custom_where = st.text_input(
+        "Optional SQL WHERE override",
+        help="Read-only, over the trials table only; aborted after a few seconds.").strip()
+
+# a filter left at "everything" adds no clause at all
+signature = tuple((c, tuple(v)) for c, v in selected.items() if len(v) != len(opts[c]))
+
+# ───────────────────────── summary table ────────────────────────
+try:
+    stats_df = custom_stats(custom_where) if custom_where else cell_stats(signature)
+except sqlite3.Error as e:
+    st.error(f"Invalid SQL WHERE clause: {e}")
+    stats_df = pd.DataFrame()
+
+if not stats_df.empty:
+    stats_df = (stats_df.assign(pct_major_flaw=stats_df.flaw_rate * 100)
+                [CELL_KEYS + ["seq_acc", "tok_acc", "pct_major_flaw", "n"]]
+                .rename(columns={"seq_acc": "avg_seq_acc", "tok_acc": "avg_tok_acc",
+                                 "n": "n_trials"})
+                .sort_values(CELL_KEYS, ignore_index=True))
 
     st.markdown("### 📈 Summary Statistics (grouped)")
-    edited = st.data_editor(
+    event = st.dataframe(
         stats_df,
         use_container_width=True,
         hide_index=True,
@@ -65,29 +136,49 @@ if not df_filtered.empty:
             "avg_tok_acc": st.column_config.NumberColumn("Avg Token Accuracy", format="%.3f"),
             "pct_major_flaw": st.column_config.ProgressColumn("Major Format Flaws (%)", format="%.1f"),
         },
-        key="summary_table"
+        on_select="rerun",
+        selection_mode="single-row",
+        key="summary_table",
     )
 
-    # Select row for drill-down
-    selected_rows = st.session_state["summary_table"]["edited_rows"]
-    if selected_rows:
-        selected = stats_df.iloc[list(selected_rows.keys())[0]]  # single selection
-        st.markdown(f"### 🔍 Trials for `{selected['provider']}` / `{selected['model']}` / N={selected['num_facts']} / K={selected['k']}")
+    # ─────────────────────── drill-down ─────────────────────────
+    if event.selection.rows:
+        row  = stats_df.iloc[event.selection.rows[0]]
+        cell = (row["provider"], row["model"], int(row["num_facts"]), int(row["k"]))
+        st.markdown(f"### 🔍 Trials for `{cell[0]}` / `{cell[1]}` / N={cell[2]} / K={cell[3]}")
+
+        # keyset cursor stack: one (id, trial_idx) per page already shown
+        state = st.session_state.setdefault("drill", {"cell": None, "cursors": [None]})
+        if state["cell"] != (cell, custom_where):
+            state.update(cell=(cell, custom_where), cursors=[None])
 
-        matching_trials = df_filtered[
-            (df_filtered['provider'] == selected['provider']) &
-            (df_filtered['model'] == selected['model']) &
-            (df_filtered['num_facts'] == selected['num_facts']) &
-            (df_filtered['k'] == selected['k'])
-        ].sort_values("trial_idx")
+        page     = trial_page(cell, custom_where, state["cursors"][-1], int(row["n_trials"]))
+        has_next = len(page) > PAGE_SIZE
+        page     = page.iloc[:PAGE_SIZE]
+        trials   = st.dataframe(page, use_container_width=True, hide_index=True,
+                                on_select="rerun", selection_mode="single-row",
+                                key="trial_table")
 
-        st.dataframe(matching_trials, use_container_width=True)
+        prev_col, info_col, next_col = st.columns([1, 4, 1])
+        if prev_col.button("◀ Prev", disabled=len(state["cursors"]) == 1):
+            state["cursors"].pop()
+            st.rerun()
+        info_col.caption(f"Page {len(state['cursors'])} · {PAGE_SIZE} trials per page")
+        if next_col.button("Next ▶", disabled=not has_next):
+            last = page.iloc[-1]
+            state["cursors"].append((last["id"], int(last["trial_idx"])))
+            st.rerun()
 
-        if st.button("👁️ Inspect first trial"):
-            trial = matching_trials.iloc[0]
-            st.session_state["current_experiment_id"] = trial["id"]
-            st.session_state["current_trial_idx"] = int(trial["trial_idx"])
-            st.switch_page("pages/3_👁️_Trial_Viewer.py")
+        # text is only fetched for the trial actually opened
+        if trials.selection.rows:
+            t = page.iloc[trials.selection.rows[0]]
+            texts = trial_texts(conn, t["id"], int(t["trial_idx"]))
+            st.markdown(f"#### Trial {int(t['trial_idx'])} of `{t['id']}`")
+            exp_col, rsp_col = st.columns(2)
+            exp_col.text_area("Expected", texts.get("expected", ""), height=300)
+            rsp_col.text_area("Response", texts.get("response", ""), height=300)
+            with st.expander("Prompt"):
+                st.code(texts.get("prompt", ""), language=None)
 
 else:
     st.info("No trials match the current filter criteria.")
@@ -96,5 +187,6 @@ else:
 st.divider()
 if st.button("🔄  Refresh DB from JSON folders"):
     rows = import_json_dir()
+    st.cache_data.clear()
     st.toast(f"Imported {rows} new rows", icon="✅")
-    st.rerun()
\ No newline at end of file
+    st.rerun()
@@ -1,8 +1,9 @@
-from pathlib import Path
 import streamlit as st
 from jinja2 import Template, meta
 
-TPL_PATH = Path("prompt_template.j2")
+from config import TEMPLATE_PATH
+
+TPL_PATH = TEMPLATE_PATH           # scripts/build_prompt reloads it when the content changes
 if not TPL_PATH.exists():          # bootstrap if first run
     TPL_PATH.write_text("{{ intro }}\n\n{{ facts_block }}\n")
 
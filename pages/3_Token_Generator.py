@@ -2,46 +2,27 @@
 Streamlit page: Token Generator & Cleaner
 """
 
-import os, json, pkgutil, importlib, inspect
+import os, json
+import importlib.util
 import streamlit as st
 import pandas as pd
 
+from core.discover import discover_providers
+from llm_providers import PROVIDERS
 from scripts.token_generation import (
-    generate_alpha_tokens, alpha_tokens_from_vocab, save_tokens
+    alpha_tokens_from_encoding, alpha_tokens_from_vocab, save_tokens
 )
-from scripts.token_trim import trim_token_set, DEFAULT_SEP
+from scripts.token_trim import trim_token_set, token_pieces, DEFAULT_SEP
 
-# Optional heavy dependencies
-try:
-    import tiktoken
-except ImportError:
-    tiktoken = None
-
-try:
-    from transformers import AutoTokenizer
-except ImportError:
-    AutoTokenizer = None
+# Optional heavy dependencies – only probed here, imported when used
+HAS_TIKTOKEN     = importlib.util.find_spec("tiktoken") is not None
+HAS_TRANSFORMERS = importlib.util.find_spec("transformers") is not None
 
 
 TOKENS_DIR = "tokens"
-LLM_ROOT   = "llm_providers"
 os.makedirs(TOKENS_DIR, exist_ok=True)
 
 
-# ───────── provider discovery ─────────
-@st.cache_data(show_spinner=False)
-def discover_providers() -> dict[str, str]:
-    providers: dict[str, str] = {}
-    for mod in pkgutil.iter_modules([LLM_ROOT]):
-        if not mod.name.endswith("_llm"):
-            continue
-        module = importlib.import_module(f"{LLM_ROOT}.{mod.name}")
-        for name, obj in inspect.getmembers(module, inspect.isclass):
-            if name.lower().endswith("provider"):
-                providers[name.replace("Provider", "")] = f"{LLM_ROOT}.{mod.name}.{name}"
-    return providers
-
-
 # ───────── UI ─────────
 st.set_page_config(layout="wide")
 st.title("🔤 Token Generator & Cleaner")
@@ -75,10 +56,8 @@ with tab_generate:
     providers = discover_providers()
     prov = st.selectbox("Provider", sorted(providers))
 
-    if prov.lower() == "openai":
-        model_name = st.selectbox("Model", ["gpt-3.5-turbo", "gpt-4o-mini", "custom…"])
-    elif prov.lower() == "deepseek":
-        model_name = st.selectbox("Model", ["deepseek-chat", "deepseek-llama3", "custom…"])
+    if prov.lower() in ("openai", "deepseek"):
+        model_name = st.selectbox("Model", PROVIDERS[prov]["models"] + ["custom…"])
     else:
         model_name = st.text_input("Model name (stub)", value="llama3")
 
@@ -99,15 +78,13 @@ with tab_generate:
         with st.spinner("Working…"):
 
             if prov.lower() == "openai":
-                if not tiktoken:
+                if not HAS_TIKTOKEN:
                     st.error("`tiktoken` not installed.")
                     st.stop()
+                import tiktoken
                 enc = tiktoken.encoding_for_model(model_name)
-                toks = generate_alpha_tokens(
-                    N=N,
-                    encode=enc.encode,
-                    decode_single=lambda tid: enc.decode_single_token_bytes(tid).decode(),
-                    min_len=min_len, max_len=max_len,
+                toks = alpha_tokens_from_encoding(
+                    enc, N=N, min_len=min_len, max_len=max_len
                 )
                 save_tokens(toks, out_path)
                 cleaned = trim_token_set(
@@ -118,10 +95,11 @@ with tab_generate:
                 )
 
             elif prov.lower() == "deepseek":
-                if not AutoTokenizer:
+                if not HAS_TRANSFORMERS:
                     st.error("`transformers` not installed.")
                     st.stop()
-                tok = AutoTokenizer.from_pretrained("deepseek-ai/DeepSeek-V3", trust_remote_code=True)
+                from llm_providers.deepseek_llm import get_encoder
+                tok = get_encoder()
                 toks = alpha_tokens_from_vocab(
                     tok, N=N, min_len=min_len, max_len=max_len
                 )
@@ -132,6 +110,7 @@ with tab_generate:
                     separator=sep,
                     single_surround=single_surround,
                     max_sequence_length=max_L,
+                    pieces=token_pieces(tok),
                 )
 
             else:
@@ -1,20 +1,19 @@
 # pages/02_attention_dashboard.py
-import streamlit as st, pandas as pd, sqlite3, numpy as np, matplotlib.pyplot as plt
-from core.db_utils import get_conn
+import streamlit as st, matplotlib.pyplot as plt
+from core.summary import load_cells
 
 st.title("📊 Attention-capacity dashboard")
 
-conn = get_conn()
-df   = pd.read_sql("SELECT num_facts AS N, k AS K, seq_acc, latency_ms FROM trials",
-                   conn)
+# one pre-aggregated row per (N, K) from cell_summary – no trial scan
+cells = load_cells(group_by=("num_facts", "k")).rename(columns={"num_facts": "N", "k": "K"})
 
-if df.empty:
+if cells.empty:
     st.info("No trials in the database yet.")
     st.stop()
 
 # 1️⃣ Heat-map --------------------------------------------------------------
 st.subheader("Heat-map: mean sequence accuracy")
-pivot = df.pivot_table(index="N", columns="K", values="seq_acc", aggfunc="mean")
+pivot = cells.pivot(index="N", columns="K", values="seq_acc")
 fig, ax = plt.subplots()
 im = ax.imshow(pivot.values, aspect="auto", origin="lower")
 ax.set_xticks(range(len(pivot.columns)), labels=pivot.columns)
@@ -27,8 +26,9 @@ st.pyplot(fig)
 # 2️⃣ Boundary curve -------------------------------------------------------
 st.subheader("Capacity curve (P = N × K)")
 
-df["P"] = df["N"] * df["K"]
-cap = df.groupby("P")["seq_acc"].mean().sort_index()
+cells["P"] = cells["N"] * cells["K"]
+by_p = cells.groupby("P")[["n", "seq_sum", "lat_n", "lat_sum"]].sum().sort_index()
+cap = by_p.seq_sum / by_p.n
 smooth = cap.rolling(3, center=True).mean()
 
 fig2, ax2 = plt.subplots()
@@ -42,7 +42,7 @@ st.pyplot(fig2)
 
 # Latency toggle
 with st.expander("Show latency overlay"):
-    cap_lat = df.groupby("P")["latency_ms"].mean().sort_index()
+    cap_lat = by_p.lat_sum / by_p.lat_n
     fig3, ax3 = plt.subplots()
     ax3.plot(cap_lat.index, cap_lat.values, marker="x")
     ax3.set_xscale("log")
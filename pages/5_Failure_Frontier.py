@@ -11,34 +11,32 @@ import altair as alt
 import streamlit as st
 from skimage.measure import find_contours
 import statsmodels.stats.proportion as smp
-from core.db_utils import get_conn           # ← keep your helper
+from core.summary import load_cells, FLAW_THRESHOLD
 
 # ──────────────────────── load & cache ──────────────────────────
 @st.cache_data(show_spinner=False)
-def load_trials() -> pd.DataFrame:
-    return (pd.read_sql("""
-            SELECT num_facts AS N,
-                   k          AS K,
-                   flaw       AS flaw,
-                   seq_acc    AS acc
-            FROM trials
-        """, get_conn())
-            .assign(P=lambda t: t.N * t.K))
-
-df = load_trials()
-if df.empty:
+def load_agg(n_range, k_range) -> pd.DataFrame:
+    """Flaw rate + run count per (N, K), straight from cell_summary."""
+    cells = load_cells(group_by=("num_facts", "k"),
+                       where="num_facts BETWEEN ? AND ? AND k BETWEEN ? AND ?",
+                       params=(*n_range, *k_range))
+    return (cells.rename(columns={"num_facts": "N", "k": "K", "n": "runs"})
+                 [["N", "K", "flaw_rate", "runs"]]
+                 .assign(P=lambda t: t.N * t.K))
+
+with st.sidebar.expander("📐 N / K range", expanded=False):
+    n_lo, n_hi = st.number_input("N min", 1, value=1),  st.number_input("N max", 1, value=10_000)
+    k_lo, k_hi = st.number_input("K min", 1, value=1),  st.number_input("K max", 1, value=1_000)
+
+agg = load_agg((int(n_lo), int(n_hi)), (int(k_lo), int(k_hi)))
+if agg.empty:
     st.info("No data yet."); st.stop()
 
-agg = (df.groupby(["N", "K"])
-         .agg(flaw_rate=("flaw", "mean"),
-              runs      =("flaw", "size"))
-         .reset_index())
-
 # ──────────────────────── UI controls ───────────────────────────
 st.title("🛑 Failure-Frontier Dashboard")
 
 st.sidebar.header("🔧 Controls")
-thr        = st.sidebar.slider("Major-flaw threshold", 0.0, 1.0, 0.50, 0.05)
+thr        = st.sidebar.slider("Major-flaw threshold", 0.0, 1.0, FLAW_THRESHOLD, 0.05)
 x_axis_opt = ["N", "K", "P"]
 x_axis_lab = st.sidebar.radio("X-axis", x_axis_opt, index=0)
 y_axis_lab = st.sidebar.radio("Y-axis", ["K", "N"], index=1)
@@ -126,6 +124,6 @@ with st.expander("🔍 Aggregated statistics"):
     )
 
 st.sidebar.markdown(
-    f"**{len(df):,}** individual trials  •  "
-    f"**{agg.runs.sum():,}** aggregated runs"
+    f"**{agg.runs.sum():,}** trials  •  "
+    f"**{len(agg):,}** (N, K) cells"
 )
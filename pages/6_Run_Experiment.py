@@ -4,17 +4,27 @@ Streamlit page: run one-or-many experiments.
 ▶ Highlights
 • Multi-select providers.
 • Free-form lists for num_facts and k  (e.g. “3,6,9” or “1-5”).
-• Model override per provider (only shown when that provider is checked).
-• Robust traceback + class sanity-check to avoid the object.__init__ trap.
+• Several models per provider, each provider with its own concurrency /
+  RPM budget; every (provider, model) runs at the same time.
+• Per-job dollar / token budget and a pre-run cost estimate.
+• Frontier search: bisect N per K towards the flaw threshold instead of
+  running the whole grid (scripts/frontier_planner.py).
+• Runs are queued to background workers (scripts/job_queue.py): the page
+  stays responsive, polls progress / throughput / ETA, and can cancel or
+  resume a job.
+• Class sanity-check to avoid the object.__init__ trap.
 """
 from __future__ import annotations
-import os, re, traceback, inspect
+import re, inspect
 import streamlit as st
 
-import scripts.run_experiments as rex
+from llm_providers      import PROVIDERS, default_model
 from core.discover      import discover_providers
-from core.json_import   import import_json_dir
 from core.template_utils import generate_prompt_id_from_template
+from core.summary       import FLAW_THRESHOLD
+from scripts.helpers.fact_gen import new_seed
+from scripts.orchestrator import SweepJob, ProviderBudget
+import scripts.job_queue as jq
 
 # ─────────────────────────── helpers ────────────────────────────
 def parse_int_list(text: str) -> list[int]:
@@ -32,38 +42,43 @@ def parse_int_list(text: str) -> list[int]:
     # plain CSV
     return [int(x) for x in re.split(r'[ ,]+', text) if x]
 
-def safe_run(**kw):
-    "Wrap run_experiments with class-check + full traceback on error."
-    try:
-        # sanity-check: dotted path must reference a *class*
-        mod, cls = kw["provider_module"].rsplit(".", 1)
-        obj = getattr(__import__(mod, fromlist=[cls]), cls, None)
-        if not inspect.isclass(obj):
-            raise TypeError(f"{kw['provider_module']} does not resolve to a class")
-        return rex.run_experiments(**kw)
-    except Exception as e:
-        traceback.print_exc()            # to the server console
-        raise e                          # surfaced in UI
+def check_provider(dotted: str) -> None:
+    "Sanity-check: the dotted path must reference a *class*."
+    mod, cls = dotted.rsplit(".", 1)
+    obj = getattr(__import__(mod, fromlist=[cls]), cls, None)
+    if not inspect.isclass(obj):
+        raise TypeError(f"{dotted} does not resolve to a class")
 
 # ──────────────────────────── UI ────────────────────────────────
 st.title("⚡ Batch-run experiments")
 
+jobs_conn = st.cache_resource(jq.connect)()
+
 providers = discover_providers()
 prov_labels = st.multiselect("Providers", list(providers.keys()), default=list(providers.keys())[:1])
 
-# Per-provider model overrides
-model_overrides: dict[str,str] = {}
+# Per-provider models and budgets – models go to the provider constructor
+jobs: list[SweepJob] = []
+budgets: dict[str, ProviderBudget] = {}
+label_of = {dotted: label for label, dotted in providers.items()}
 for label in prov_labels:
-    if label == "OpenAI":
-        with st.expander(f"{label} settings"):
-            opt = st.text_input("Model name (OpenAI)", value=os.getenv("OPENAI_MODEL","gpt-3.5-turbo"), key=f"mdl_{label}")
-            model_overrides[label] = opt
-    elif label == "DeepSeek":
-        with st.expander(f"{label} settings"):
-            opt = st.text_input("Model name (DeepSeek)", value=os.getenv("DEEPSEEK_MODEL","deepseek-chat"), key=f"mdl_{label}")
-            model_overrides[label] = opt
-    else:
-        model_overrides[label] = ""       # no UI yet
+    meta = PROVIDERS.get(label, {})
+    base = [default_model(label)] if meta else []
+    with st.expander(f"{label} settings"):
+        models = st.multiselect(
+            f"Models ({label})", list(dict.fromkeys(base + meta.get("models", []))),
+            default=base, key=f"mdl_{label}",
+            help="Every selected model runs concurrently (empty → provider default).")
+        extra = st.text_input("Other models", "", key=f"mdl_extra_{label}",
+                              help="Comma-separated model names not listed above.")
+        b1, b2 = st.columns(2)
+        conc = b1.number_input("Max in-flight", 0, 256, 0, key=f"conc_{label}",
+                               help="Per model of this provider (0 → provider default).")
+        rpm = b2.number_input("Requests / min", 0, 100_000, 0, key=f"rpm_{label}",
+                              help="Per model of this provider (0 → provider default).")
+    models = list(dict.fromkeys(models + [m.strip() for m in extra.split(",") if m.strip()]))
+    jobs += [SweepJob(providers[label], m) for m in (models or [None])]
+    budgets[providers[label]] = ProviderBudget(max_concurrency=conc or None, rpm=rpm or None)
 
 st.markdown("#### Experiment parameter grids")
 
@@ -118,6 +133,20 @@ if adaptive:
         st.session_state["n_mode"] = "Range"
         st.session_state["k_mode"] = "Range"
 
+frontier = st.checkbox(
+    "Frontier search",
+    value=False,
+    help="For each K, bisect N (log scale) towards the cell where the major-flaw "
+         f"rate crosses {FLAW_THRESHOLD:.0%}, starting from results already in the "
+         "database; only probed cells are run. Overrides the staircase."
+)
+if frontier:
+    f1, f2 = st.columns(2)
+    frontier_thr = f1.slider("Flaw-rate threshold", 0.05, 0.95, FLAW_THRESHOLD, 0.05)
+    frontier_tol = f2.number_input(
+        "P tolerance", 0.01, 1.0, 0.1, 0.01,
+        help="Stop once the bracket's upper P is within this fraction of its lower P.")
+
 early_abort = st.checkbox(
     "Early abort on first flop",
     value=True,
@@ -125,9 +154,31 @@ early_abort = st.checkbox(
          "major format flaw or <50 % accuracy."
 )
 
+seq_method = st.selectbox(
+    "Sequential stopping",
+    ["off", "wilson", "sprt"],
+    format_func={"off": "Off – fixed trials per cell",
+                 "wilson": "Wilson interval",
+                 "sprt": "SPRT"}.get,
+    help="Test each (N, K) cell after every trial and stop once its flaw rate and "
+         "sequence accuracy are clearly on one side of the threshold (or, for Wilson, "
+         "precisely measured). Trials per experiment becomes the ceiling; replaces early abort."
+)
+if seq_method != "off":
+    s1, s2 = st.columns(2)
+    seq_min = s1.number_input("Minimum trials", 1, 50, 3)
+    if seq_method == "wilson":
+        seq_width = s2.slider("Interval width to stop at", 0.05, 1.0, 0.3, 0.05)
+        sequential = {"method": "wilson", "min_trials": seq_min, "width": seq_width}
+    else:
+        seq_delta = s2.slider("Indifference half-width", 0.05, 0.45, 0.15, 0.05)
+        sequential = {"method": "sprt", "min_trials": seq_min, "delta": seq_delta}
+else:
+    sequential = None
+
 c1, c2, c3 = st.columns([1,1,1], gap="small")
 with c1:
-    trials = st.number_input("Trials per experiment", 1, 50, 1)
+    trials = st.number_input("Trials per experiment", 1, 50, 1 if sequential is None else 10)
 with c2:
     timeout_sec = st.number_input(
     "LLM timeout (sec)",
@@ -141,12 +192,85 @@ with c3:
     help="Completion cap = expected_tokens × this value."
 )
 
+stream = st.checkbox(
+    "Stream responses",
+    value=False,
+    help="Record time-to-first-token / decode rate and cancel answers "
+         "that are already a certain format flaw (skips the Batch API)."
+)
+
+use_cache = st.checkbox(
+    "Response cache",
+    value=True,
+    help="Replay answers already paid for (same provider, model, prompt, "
+         "temperature and max_tokens) instead of calling the API again."
+)
+cache_only = st.checkbox(
+    "Replay from cache only",
+    value=False,
+    disabled=not use_cache,
+    help="Never call an API: trials without a cached answer are skipped."
+)
+
+seed = st.number_input(
+    "Seed",
+    0, 2**53 - 1, 0,
+    help="Same seed → same facts and question order for every provider "
+         "(0 → a fresh seed, shared by all providers of this run)."
+)
+
+bank_path = st.text_input(
+    "Trial bank (optional)", "",
+    placeholder="banks/grid.sqlite",
+    help="Build (or top up) a shared bank of prompts for this grid and the "
+         "selected providers, then run every provider from it – paired trials, "
+         "no per-run generation or prompt tokenizing. Its seed overrides the one above."
+).strip()
+
 default_id = generate_prompt_id_from_template()
 prompt_id = st.text_input(
     "Prompt ID", value=default_id,
     help="Organize all runs under this experiment name."
 )
 
+u1, u2 = st.columns(2)
+budget_usd = u1.number_input(
+    "Budget (USD)", 0.0, 1e6, 0.0, 1.0,
+    help="Whole job, all providers together (0 → no cap). Every request reserves "
+         "its worst case before it is sent, so the job cannot overrun."
+)
+budget_tok = u2.number_input(
+    "Token budget", 0, 10**12, 0, 100_000,
+    help="Prompt + completion tokens for the whole job (0 → no cap)."
+)
+
+if st.button("💰 Estimate cost"):
+    from scripts.cost_report import estimate_run
+    rows = []
+    with st.spinner("Rendering one prompt per cell…"):
+        for j in jobs:
+            try:
+                est = estimate_run(j.provider, num_facts_list, k_list, trials,
+                                   model=j.model, bank=bank_path or None)
+            except Exception as e:
+                st.warning(f"{label_of.get(j.provider, j.provider)}: {e}")
+                continue
+            rows.append({"provider": label_of.get(j.provider, j.provider),
+                         "model": est.model.iat[0] if len(est) else j.model,
+                         "max tokens": int(est.max_tokens.sum()),
+                         "typical USD": est.est_usd.sum(min_count=1),
+                         "max USD": est.max_usd.sum(min_count=1)})
+    if rows:
+        st.dataframe(rows, hide_index=True)
+        st.caption("Full grid at the ceiling of trials; the max is what a budget reserves.")
+
+n_workers = st.number_input(
+    "Worker processes",
+    1, 16, 1,
+    help="Background workers; each runs one queued job at a time. "
+         "Jobs survive page reloads and show their progress below."
+)
+
 if st.button("🚀  Run all"):
     if not prov_labels:
         st.warning("Pick at least one provider")
@@ -155,31 +279,85 @@ if st.button("🚀  Run all"):
         st.warning("Parameter lists are empty or malformed.")
         st.stop()
 
-    st.info("Launching experiments … watch the terminal for progress.")
-    for label in prov_labels:
-        dotted = providers[label]
-        # set env var so the provider picks it up
-        if label == "OpenAI" and model_overrides[label]:
-            os.environ["OPENAI_MODEL"] = model_overrides[label]
-        if label == "DeepSeek" and model_overrides[label]:
-            os.environ["DEEPSEEK_MODEL"] = model_overrides[label]
-
-        st.write(f"➡️  **{label}**  ({model_overrides.get(label,'default')})")
+    for dotted in budgets:
+        check_provider(dotted)
 
-        msg = safe_run(
-            provider_module = dotted,
+    run_seed = int(seed) or new_seed()
+    params = {
+        "jobs":           [[j.provider, j.model] for j in jobs],
+        "budgets":        {p: vars(b) for p, b in budgets.items()},
+        "build_bank":     bool(bank_path),
+        "response_cache": use_cache,
+        "frontier":       ({"threshold": frontier_thr, "tol": frontier_tol}
+                           if frontier else None),
+        "spend":          ({"usd": budget_usd or None, "tokens": int(budget_tok) or None}
+                           if budget_usd or budget_tok else None),
+        "run": dict(
             facts_list_sizes = num_facts_list,
             token_sizes      = k_list,
             trials           = trials,
-            output_root      = "results",           # top-level base
-            prompt_id        = prompt_id,           
+            output_root      = "results",       # top-level base
+            prompt_id        = prompt_id,
             adaptive         = adaptive,
             early_abort      = early_abort,
             timeout_sec      = timeout_sec,
             max_tok_mult     = max_mult,
-        )
+            stream           = stream,
+            seed             = run_seed,
+            bank             = bank_path or None,
+            cache_only       = use_cache and cache_only,
+            sequential       = sequential,
+        ),
+    }
+    label = ", ".join(f"{label_of.get(j.provider, j.provider)}:{j.model or 'default'}"
+                      for j in jobs)
+    job_id = jq.enqueue(jobs_conn, params, label=label)
+    jq.ensure_workers(jobs_conn, n_workers)
+    st.toast(f"Queued job {job_id} – it runs in the background.", icon="🚀")
+
+# ──────────────────────────── jobs ──────────────────────────────
+st.divider()
+st.markdown("### 🗂️ Jobs")
+
+
+def _fmt_eta(sec) -> str:
+    if sec is None:
+        return "–"
+    m, s_ = divmod(int(sec), 60)
+    h, m  = divmod(m, 60)
+    return f"{h}h{m:02d}m" if h else f"{m}m{s_:02d}s"
+
+
+@st.fragment(run_every=3)
+def jobs_panel():
+    """Polls the queue; reruns only this fragment, so the form stays usable."""
+    jobs_list = jq.list_jobs(jobs_conn, limit=20)
+    st.caption(f"{jq.live_workers(jobs_conn)} live worker(s) · log: `{jq.WORKER_LOG.name}`")
+    if not jobs_list:
+        st.info("No jobs yet.")
+        return
+    for j in jobs_list:
+        status = j["status"] + (" (worker lost)" if j["stale"] else "")
+        head   = f"#{j['id']} · {status} · {j['label'] or ''}"
+        with st.expander(head, expanded=j["status"] in jq.ACTIVE):
+            total = j["total"] or 0
+            st.progress(min(1.0, (j["done"] + j["failed"]) / total) if total else 0.0,
+                        text=f"{j['done']}/{total} trials · {j['failed']} failed · "
+                             f"{(j['rate'] or 0):.2f} trials/s · ETA {_fmt_eta(j['eta_s'])}")
+            if j["message"]:
+                st.text(j["message"])
+            if j["error"]:
+                st.code(j["error"], language=None)
+            c1, c2 = st.columns(2)
+            if j["status"] in ("queued", "running") or j["stale"]:
+                if c1.button("⏹️ Cancel", key=f"cancel_{j['id']}"):
+                    jq.cancel(jobs_conn, j["id"])
+                    st.rerun(scope="fragment")
+            if j["status"] in ("cancelled", "failed"):
+                if c2.button("▶️ Resume", key=f"resume_{j['id']}"):
+                    jq.resume(jobs_conn, j["id"])
+                    jq.ensure_workers(jobs_conn, 1)
+                    st.rerun(scope="fragment")
 
-        st.success(msg)
 
-    new_rows = import_json_dir()
-    st.toast(f"Imported {new_rows} fresh rows into SQLite.", icon="✅")
+jobs_panel()
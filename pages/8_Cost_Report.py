@@ -0,0 +1,55 @@
+"""
+Streamlit page: what the experiments cost and how fast they ran, per
+(provider, model, N, K), from the provider-reported usage of every trial
+(scripts/cost_report.py).
+"""
+import streamlit as st
+
+from scripts.cost_report import cost_report
+
+st.title("💰 Cost & throughput")
+
+
+@st.cache_data(ttl=30, show_spinner=False)
+def load_report():
+    return cost_report()
+
+
+report = load_report()
+if report.empty:
+    st.info("No data yet.")
+    st.stop()
+
+c1, c2 = st.columns(2)
+providers = c1.multiselect("Provider", sorted(report.provider.unique()))
+models    = c2.multiselect("Model", sorted(report.model.unique()))
+view = report
+if providers:
+    view = view[view.provider.isin(providers)]
+if models:
+    view = view[view.model.isin(models)]
+
+m1, m2, m3, m4 = st.columns(4)
+m1.metric("Spent", f"${view.cost_usd.sum():,.4f}")
+m2.metric("Trials", f"{int(view.trials.sum()):,}", f"{int(view.replayed.sum()):,} replayed",
+          delta_color="off")
+m3.metric("Prompt tokens", f"{int(view.prompt_tokens.sum()):,}",
+          f"{int(view.cached_tokens.sum()):,} cached", delta_color="off")
+m4.metric("Completion tokens", f"{int(view.completion_tokens.sum()):,}")
+
+per_model = (view.groupby(["provider", "model"], as_index=False)
+                 [["trials", "replayed", "prompt_tokens", "cached_tokens",
+                   "completion_tokens", "cost_usd"]].sum())
+st.markdown("#### Per model")
+st.dataframe(per_model, hide_index=True, use_container_width=True)
+
+st.markdown("#### Per cell")
+st.caption("Trials without usage (recorded before it was stored) count towards "
+           "`trials` but not the token columns – see `with_usage`.")
+st.dataframe(view, hide_index=True, use_container_width=True,
+             column_config={"cost_usd": st.column_config.NumberColumn(format="$%.5f"),
+                            "cost_per_trial": st.column_config.NumberColumn(format="$%.6f"),
+                            "cached_share": st.column_config.NumberColumn(format="%.2f"),
+                            "latency_ms": st.column_config.NumberColumn(format="%.0f"),
+                            "completion_tok_s": st.column_config.NumberColumn(format="%.1f")})
+st.download_button("Download CSV", view.to_csv(index=False), "cost_report.csv", "text/csv")
@@ -0,0 +1,183 @@
+"""
+scripts/async_executor.py
+─────────────────────────
+asyncio driver for the non-batch path of `run_experiments`.
+
+Every (N, K, trial) still goes through the same generate → prompt → query →
+grade → persist steps; the blocking pieces run on a thread pool and at most
+`max_in_flight` trials talk to the provider at any moment.
+"""
+
+from __future__ import annotations
+import asyncio, concurrent.futures
+from time import perf_counter
+from typing import Callable, Iterable, Tuple
+
+from .sequential import CellTest
+
+# ───────────────────────────────────────────────────
+#  throughput bookkeeping
+# ───────────────────────────────────────────────────
+class ThroughputMeter:
+    """Counts finished trials and reports sustained trials/sec."""
+
+    def __init__(self, report_every: float = 30.0, verbose: bool = True):
+        self.report_every = report_every
+        self.verbose      = verbose
+        self.done         = 0
+        self.aborted      = 0
+        self.stopped      = 0             # cells settled by sequential testing
+        self._t0          = perf_counter()
+        self._last        = self._t0
+
+    @property
+    def elapsed(self) -> float:
+        return perf_counter() - self._t0
+
+    @property
+    def rate(self) -> float:
+        return self.done / self.elapsed if self.elapsed > 0 else 0.0
+
+    def tick(self) -> None:
+        self.done += 1
+        now = perf_counter()
+        if self.verbose and now - self._last >= self.report_every:
+            self._last = now
+            print(f"⚡ {self.done} trials in {self.elapsed:.0f}s  ({self.rate:.2f} trials/s)")
+
+    def summary(self) -> dict:
+        return {
+            "trials":         self.done,
+            "aborted_cells":  self.aborted,
+            "stopped_cells":  self.stopped,
+            "elapsed_s":      round(self.elapsed, 2),
+            "trials_per_sec": round(self.rate, 3),
+        }
+
+
+# ───────────────────────────────────────────────────
+#  executor
+# ───────────────────────────────────────────────────
+async def _run_grid(
+    pairs: Iterable[Tuple[int, int]],
+    trials: int,
+    *,
+    run_trial: Callable[[int, int, int], dict | None],
+    save_trial: Callable[[int, int, dict], None],
+    is_flop: Callable[[dict], bool],
+    early_abort: bool,
+    max_in_flight: int,
+    meter: ThroughputMeter,
+    verbose: bool,
+    skip: Callable[[int, int, int], bool] | None = None,
+    should_stop: Callable[[], bool] | None = None,
+    sequential: Callable[[int, int], CellTest] | None = None,
+    on_decision: Callable[[int, int, list, dict], None] | None = None,
+) -> None:
+    loop = asyncio.get_running_loop()
+    pool = concurrent.futures.ThreadPoolExecutor(max_workers=max_in_flight)
+    gate = asyncio.Semaphore(max_in_flight)
+
+    async def _one(n: int, k: int, t: int, test: CellTest | None = None) -> dict | None:
+        async with gate:
+            if should_stop is not None and should_stop():
+                return None              # cancelled – queued trials never start
+            record = await loop.run_in_executor(pool, run_trial, n, k, t)
+        if record is not None:
+            if test is not None:         # the cell's test state goes into the record
+                test.add_record(record)
+                record["sequential"] = test.state(trials)
+            await loop.run_in_executor(pool, save_trial, n, k, record)
+            meter.tick()
+        return record
+
+    async def _cell(n: int, k: int) -> None:
+        todo = [t for t in range(trials) if skip is None or not skip(n, k, t)]
+        if sequential is not None:
+            # each wave waits for the previous outcomes; cells still overlap
+            test = sequential(n, k)
+            while True:
+                state = test.state(trials)
+                if state["decision"] == "stop":
+                    meter.stopped += 1
+                    if on_decision is not None:
+                        on_decision(n, k, todo, state)
+                    if verbose and todo:
+                        print(f"🧮 (N={n}, K={k}) settled after {test.n} trials, "
+                              f"{len(todo)} skipped")
+                    return
+                if not todo:
+                    return
+                size = test.wave()
+                wave, todo = todo[:size], todo[size:]
+                await asyncio.gather(*(_one(n, k, t, test) for t in wave))
+        if not early_abort:
+            await asyncio.gather(*(_one(n, k, t) for t in todo))
+            return
+        # early abort needs the previous outcome before the next trial starts,
+        # so a cell stays sequential while different cells overlap
+        for t in todo:
+            record = await _one(n, k, t)
+            if record is not None and is_flop(record):
+                meter.aborted += 1
+                if verbose: print(f"⏹️ early abort for (N={n}, K={k})")
+                break
+
+    try:
+        await asyncio.gather(*(_cell(n, k) for n, k in pairs))
+    finally:
+        pool.shutdown(wait=True)
+
+
+def run_grid(
+    pairs: Iterable[Tuple[int, int]],
+    trials: int,
+    *,
+    run_trial: Callable[[int, int, int], dict | None],
+    save_trial: Callable[[int, int, dict], None],
+    is_flop: Callable[[dict], bool],
+    early_abort: bool = False,
+    max_in_flight: int = 1,
+    verbose: bool = True,
+    skip: Callable[[int, int, int], bool] | None = None,
+    should_stop: Callable[[], bool] | None = None,
+    sequential: Callable[[int, int], CellTest] | None = None,
+    on_decision: Callable[[int, int, list, dict], None] | None = None,
+) -> dict:
+    """
+    Run every (N, K, trial) with at most `max_in_flight` concurrent trials.
+
+    run_trial  : (n, k, t) -> trial record, or None if nothing should be saved
+    save_trial : (n, k, record) -> None
+    is_flop    : record -> bool, consulted only when `early_abort` is set
+    skip       : (n, k, t) -> True for trials that are already done
+    should_stop: () -> True to stop starting new trials (in-flight ones finish)
+    sequential : (n, k) -> CellTest (scripts/sequential.py) – run each cell
+                 in waves until its test says "stop"; `trials` is the ceiling
+                 and `early_abort` is ignored
+    on_decision: (n, k, skipped trials, test state) when a cell stops
+    Returns the throughput summary.
+    """
+    meter = ThroughputMeter(verbose=verbose)
+    coro  = _run_grid(
+        list(pairs), trials,
+        run_trial=run_trial, save_trial=save_trial, is_flop=is_flop,
+        early_abort=early_abort, max_in_flight=max(1, int(max_in_flight)),
+        meter=meter, verbose=verbose, skip=skip, should_stop=should_stop,
+        sequential=sequential, on_decision=on_decision,
+    )
+
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        asyncio.run(coro)
+    else:
+        # already inside an event loop (Jupyter) – run on a helper thread
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as helper:
+            helper.submit(asyncio.run, coro).result()
+
+    stats = meter.summary()
+    if verbose:
+        print(f"⚡ {stats['trials']} trials in {stats['elapsed_s']}s "
+              f"→ {stats['trials_per_sec']} trials/s")
+    return stats
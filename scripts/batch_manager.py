@@ -0,0 +1,366 @@
+"""
+scripts/batch_manager.py
+────────────────────────
+Keeps several OpenAI Batch jobs in flight and survives restarts.
+
+Every submission is appended to `batch_journal.jsonl` inside the
+provider's result folder together with the (model, prompt_id) it belongs
+to and the metadata of the trials it carries – once as "submitting"
+when the request file is uploaded, before the batch is created, and
+once as "submitted" with the batch ID.  The request file is kept under
+`batch_inputs/` until the batch is collected, so a restarted run can
+re-attach to pending batches and still write full result files (prompt
+text included) without paying to resubmit anything.  A "submitting"
+record without its "submitted" one (a crash around `batches.create`) is
+matched against the account's batches by input file on the next start.
+"""
+
+from __future__ import annotations
+import json, os, time, uuid
+from json.encoder import encode_basestring_ascii
+from datetime import datetime
+from pathlib import Path
+from typing import Callable
+
+from llm_providers.usage import normalize_usage
+
+MAX_MB    = 100
+MAX_BYTES = MAX_MB * 1024 * 1024   # 100 MB hard limit (OpenAI batch)
+
+TERMINAL = {"completed", "failed", "expired", "cancelled"}
+
+_CONTENT = "\x00prompt\x00"      # placeholder the prompt is streamed over
+
+
+def _extract_answer(resp_obj):
+    """
+    Extract assistant text or an error string from one Batch-API
+    output line (already json-loaded).
+    """
+    # Hard error at top level
+    if resp_obj.get("error"):
+        return f"ERROR: {resp_obj['error']}"
+
+    resp = resp_obj.get("response", {})
+    if resp.get("status_code") != 200:
+        return f"ERROR: status {resp.get('status_code')} – {resp.get('body')}"
+
+    try:
+        return resp["body"]["choices"][0]["message"]["content"].strip()
+    except Exception as e:
+        return f"ERROR: malformed completion – {e}"
+
+
+class BatchManager:
+    """
+    submit()  – upload a list of trials as one (or more, if >100 MB) batch,
+                blocking only while `max_in_flight` batches are already open
+    poll()    – collect every batch that finished since the last call
+    drain()   – poll until nothing is pending
+
+    `collect(results, stamp, prompt_id)` is called once per finished batch
+    with `results = [(meta, prompt, answer), ...]`; it grades and persists.
+    Only batches of this manager's (model, prompt_id) are re-attached.
+    """
+
+    def __init__(
+        self,
+        llm,
+        base_dir: Path,
+        *,
+        collect: Callable[[list, str, str], None],
+        prompt_id: str = "default_prompt",
+        max_in_flight: int = 4,
+        poll_every: float = 10.0,
+        verbose: bool = True,
+        on_queued: Callable[[str, list], None] | None = None,
+    ):
+        self.llm           = llm
+        self.base_dir      = Path(base_dir)
+        self.collect       = collect
+        self.prompt_id     = prompt_id
+        self.max_in_flight = max(1, max_in_flight)
+        self.poll_every    = poll_every
+        self.verbose       = verbose
+        self.on_queued     = on_queued     # (batch_id, [(n, k, t), ...]) → None
+
+        self.journal_path = self.base_dir / "batch_journal.jsonl"
+        self.inputs_dir   = self.base_dir / "batch_inputs"
+        self.inputs_dir.mkdir(parents=True, exist_ok=True)
+
+        self.pending: dict[str, dict] = {}     # batch_id → submitted record
+        self.submitting: dict[str, dict] = {}  # submit_id → record, batch not confirmed
+        self._replay()
+        if self.submitting:
+            self._recover()
+        if self.pending and verbose:
+            print(f"🔗 Re-attached to {len(self.pending)} pending batch(es) "
+                  f"({sum(len(r['items']) for r in self.pending.values())} trials)")
+
+    # ------------------------------------------------------------------
+    # journal
+    # ------------------------------------------------------------------
+    def _replay(self) -> None:
+        if not self.journal_path.exists():
+            return
+        with self.journal_path.open(encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except json.JSONDecodeError:
+                    continue                    # torn last line after a crash
+                if not self._mine(rec):
+                    continue
+                if rec["event"] == "submitting":
+                    self.submitting[rec["submit_id"]] = rec
+                elif rec["event"] == "abandoned":
+                    self.submitting.pop(rec["submit_id"], None)
+                elif rec["event"] == "submitted":
+                    # items live in the "submitting" record (inline in older journals)
+                    self.pending[rec["batch_id"]] = {
+                        **self.submitting.pop(rec.get("submit_id"), {}), **rec}
+                else:
+                    self.pending.pop(rec["batch_id"], None)
+
+    def _mine(self, rec: dict) -> bool:
+        # records from before prompt_id was journaled belong to the default prompt
+        return (rec.get("model") in (None, self.llm.model_name) and
+                rec.get("prompt_id", "default_prompt") == self.prompt_id)
+
+    def _tag(self, rec: dict) -> dict:
+        return {**rec, "model": self.llm.model_name, "prompt_id": self.prompt_id}
+
+    def _recover(self) -> None:
+        """Resolve "submitting" records: created → pending, never created → abandoned."""
+        want = {rec["input_file_id"]: sid for sid, rec in self.submitting.items()}
+        found = {}
+        try:
+            for batch in self.llm._client.batches.list(limit=100):
+                if batch.input_file_id in want:
+                    found[want[batch.input_file_id]] = batch.id
+                    if len(found) == len(want):
+                        break
+        except Exception as e:         # keep them unresolved for the next start
+            print(f"⚠️ Could not list batches to resolve interrupted submissions: {e}")
+            return
+        for sid, rec in list(self.submitting.items()):
+            tmp_path = self.inputs_dir / f"_tmp_{sid}.jsonl"
+            if sid in found:
+                # the crash may have hit between the rename and the journal write
+                if tmp_path.exists():
+                    tmp_path.rename(self.inputs_dir / f"{found[sid]}.jsonl")
+                self._submitted(sid, found[sid])
+                if self.verbose:
+                    print(f"🔗 Recovered batch {found[sid]} from an interrupted submission")
+            else:
+                self._append(self._tag({"event": "abandoned", "submit_id": sid}))
+                del self.submitting[sid]
+                tmp_path.unlink(missing_ok=True)
+
+    def _submitted(self, submit_id: str, batch_id: str) -> dict:
+        rec = self._tag({"event": "submitted", "batch_id": batch_id, "submit_id": submit_id})
+        self._append(rec)
+        self.pending[batch_id] = {**self.submitting.pop(submit_id), **rec}
+        return self.pending[batch_id]
+
+    def _append(self, rec: dict) -> None:
+        rec  = {"ts": datetime.utcnow().isoformat(timespec="seconds"), **rec}
+        line = (json.dumps(rec) + "\n").encode("utf-8")
+        # one O_APPEND write per record: runs for other models of this
+        # provider share the file and must never interleave inside a line
+        fd = os.open(self.journal_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def _release(self, metas) -> None:
+        """Give back the budget reservations of trials that will not be collected."""
+        budget = getattr(self.llm, "budget", None)
+        if budget is not None:
+            for meta in metas:
+                budget.release(meta.get("reserved"))
+
+    def pending_trials(self) -> set[tuple[int, int, int]]:
+        """(N, K, trial) already sitting in an open (or possibly created) batch."""
+        return {(m["num_facts"], m["k"], m["trial"])
+                for recs in (self.pending, self.submitting)
+                for rec in recs.values() for m in rec["items"]}
+
+    # ------------------------------------------------------------------
+    # submission
+    # ------------------------------------------------------------------
+    def _write_jsonl(self, path: Path, items) -> int:
+        with path.open("w", encoding="utf-8") as f:
+            for (_, _, _, prompt, meta) in items:
+                line = json.dumps({
+                    "custom_id": meta["custom_id"],
+                    "method": "POST",
+                    "url": "/v1/chat/completions",
+                    "body": {
+                        "model": self.llm.model_name,
+                        "messages": [{"role": "user", "content": _CONTENT}],
+                        "temperature": 0,
+                        "max_tokens": min(meta["num_facts"] * meta["k"] + 100,
+                                          self.llm.max_tokens)
+                    }
+                })
+                head, tail = line.split(json.dumps(_CONTENT), 1)
+                f.write(head)
+                f.write('"')
+                # a LazyPrompt streams its pieces straight into the file;
+                # JSON escaping is per character, so escaping piecewise is exact
+                for part in (prompt.parts() if hasattr(prompt, "parts") else (prompt,)):
+                    f.write(encode_basestring_ascii(part)[1:-1])
+                f.write('"')
+                f.write(tail + "\n")
+        return path.stat().st_size
+
+    def submit(self, batch_items: list) -> None:
+        """`batch_items`: [(n, k, t, prompt, meta), ...]"""
+        if not batch_items:
+            return
+        for (_, _, _, _, meta) in batch_items:
+            meta.setdefault("custom_id", str(uuid.uuid4()))
+
+        submit_id = uuid.uuid4().hex
+        tmp_path  = self.inputs_dir / f"_tmp_{submit_id}.jsonl"
+        byte_size = self._write_jsonl(tmp_path, batch_items)
+
+        if byte_size > MAX_BYTES and len(batch_items) > 1:
+            tmp_path.unlink()
+            mid = len(batch_items) // 2
+            print(f"⚠️ Batch {byte_size/1e6:.1f} MB exceeds {MAX_MB} MB – splitting")
+            self.submit(batch_items[:mid])
+            self.submit(batch_items[mid:])
+            return
+
+        try:
+            batch_id = self._create(submit_id, tmp_path, batch_items)
+        except BaseException:
+            # not in flight – or, if create did go through, charged in full on recovery
+            self._release(meta for (_, _, _, _, meta) in batch_items)
+            raise
+        if self.on_queued is not None:
+            self.on_queued(batch_id, [(n, k, t) for (n, k, t, _, _) in batch_items])
+        print(f"🔁 Batch ID {batch_id}  ({byte_size/1e6:.1f} MB, "
+              f"{len(batch_items)} trials) submitted – {len(self.pending)} in flight")
+
+    def _create(self, submit_id: str, tmp_path: Path, batch_items: list) -> str:
+        """Upload, journal, create; returns the batch ID."""
+        self.wait_for_slot()
+
+        client = self.llm._client
+        with tmp_path.open("rb") as fh:
+            input_file = client.files.create(file=fh, purpose="batch")
+        # journaled before the batch exists: a crash from here on cannot
+        # lose a batch that is already paid for
+        rec = self._tag({
+            "event":     "submitting",
+            "submit_id": submit_id,
+            "input_file_id": input_file.id,
+            "items": [{key: meta[key] for key in
+                       ("custom_id", "trial", "seed", "num_facts", "k", "keys", "expected",
+                        "reserved") if key in meta}
+                      for (_, _, _, _, meta) in batch_items],
+        })
+        self._append(rec)
+        self.submitting[submit_id] = rec
+        batch = client.batches.create(
+            input_file_id=input_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
+        )
+        tmp_path.rename(self.inputs_dir / f"{batch.id}.jsonl")
+        self._submitted(submit_id, batch.id)
+        return batch.id
+
+    def wait_for_slot(self) -> None:
+        while len(self.pending) >= self.max_in_flight:
+            time.sleep(self.poll_every)
+            self.poll()
+
+    # ------------------------------------------------------------------
+    # collection
+    # ------------------------------------------------------------------
+    def _download(self, file_id: str, path: Path) -> None:
+        with path.open("wb") as f_out:
+            f_out.write(self.llm._client.files.content(file_id).read())
+
+    def _prompts(self, batch_id: str) -> dict[str, str]:
+        path = self.inputs_dir / f"{batch_id}.jsonl"
+        out  = {}
+        with path.open(encoding="utf-8") as f:
+            for line in f:
+                req = json.loads(line)
+                out[req["custom_id"]] = req["body"]["messages"][0]["content"]
+        return out
+
+    def _finish(self, batch) -> None:
+        rec   = self.pending[batch.id]
+        # microseconds: batches collected in the same poll must not collide
+        stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S%f")
+
+        if getattr(batch, "error_file_id", None):
+            err_path = self.base_dir / f"errors_{batch.id}.jsonl"
+            self._download(batch.error_file_id, err_path)
+            print(f"⚠️ Batch {batch.id} has failed requests → {err_path}")
+
+        outputs = {}
+        if getattr(batch, "output_file_id", None):
+            result_path = self.base_dir / f"batch_output_{batch.id}.jsonl"
+            self._download(batch.output_file_id, result_path)
+            with result_path.open(encoding="utf-8") as f_in:
+                for line in f_in:
+                    obj = json.loads(line)
+                    outputs[obj["custom_id"]] = obj
+
+        prompts  = self._prompts(batch.id)
+        results, errors = [], 0
+        for meta in rec["items"]:
+            obj = outputs.get(meta["custom_id"])
+            answer = _extract_answer(obj) if obj else "ERROR: missing from output"
+            if answer.startswith("ERROR:"):
+                errors += 1                 # not a model failure – leave for a re-run
+                self._release([meta])
+                continue
+            meta["usage"] = normalize_usage(obj["response"]["body"].get("usage"))
+            results.append((meta, prompts[meta["custom_id"]], answer))
+
+        if results:
+            self.collect(results, stamp, rec.get("prompt_id", self.prompt_id))
+        self._append(self._tag({"event": "collected", "batch_id": batch.id,
+                                "status": batch.status,
+                                "saved": len(results), "errors": errors}))
+        del self.pending[batch.id]
+        (self.inputs_dir / f"{batch.id}.jsonl").unlink(missing_ok=True)
+
+        if batch.status != "completed":
+            reason = getattr(batch, "errors", None) or getattr(batch, "failed_reason", None)
+            print(f"❌ Batch {batch.id} ended as {batch.status}: {reason}")
+        print(f"📦 Batch {batch.id}: {len(results)} trials saved, {errors} errored")
+
+    def poll(self) -> int:
+        """Collect every finished batch; returns how many are still pending."""
+        for batch_id in list(self.pending):
+            batch = self.llm._client.batches.retrieve(batch_id)
+            if batch.status in TERMINAL:
+                self._finish(batch)
+            elif self.verbose:
+                counts = getattr(batch, "request_counts", None)
+                done   = f" {counts.completed}/{counts.total}" if counts else ""
+                print(f"⏳ {batch_id}: {batch.status}{done}")
+        return len(self.pending)
+
+    def drain(self, timeout_sec: float | None = None) -> None:
+        start = time.time()
+        while self.poll():
+            if timeout_sec is not None and time.time() - start > timeout_sec:
+                # this run stops waiting: free its reservations (a later run that
+                # re-attaches is charged what the batches actually used)
+                self._release(m for rec in self.pending.values() for m in rec["items"])
+                raise TimeoutError(
+                    f"{len(self.pending)} batch(es) still pending – "
+                    f"re-run to re-attach to them")
+            time.sleep(self.poll_every)
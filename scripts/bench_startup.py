@@ -0,0 +1,96 @@
+"""
+scripts/bench_startup.py
+────────────────────────
+Startup-time benchmark for provider discovery.
+
+Each measurement runs in a fresh interpreter so import caches do not leak
+between them:
+
+  registry  – list providers from `llm_providers.PROVIDERS` (what app.py and
+              the pages do now)
+  import    – import every `*_llm` module (the old discovery scan)
+  tokenizer – import + load every tokenizer through its module-level
+              getter, i.e. what every old import paid up front because
+              tokenizers loaded at module level
+
+A provider whose module or tokenizer cannot load here is reported as
+skipped; the comparison is only printed when nothing was skipped.
+
+Usage:  python -m scripts.bench_startup [--repeat 3]
+"""
+
+from __future__ import annotations
+import argparse, statistics, subprocess, sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# provider label → (module-level tokenizer getter, its arguments)
+TOKENIZERS = {
+    "OpenAI":   ("get_encoding", ("gpt-4o-mini",)),
+    "DeepSeek": ("get_encoder", ()),
+    "Ollama":   ("get_encoding", ()),
+}
+
+_SKIP = "SKIPPED "      # prefix of a line naming a provider that could not load
+
+_REPORT_SKIP = ("    except Exception as e:\n"
+                f"        print({_SKIP!r} + label, type(e).__name__ + ': ' + str(e)[:80])\n")
+
+_SNIPPETS = {
+    "registry": "from llm_providers import PROVIDERS; list(PROVIDERS)",
+    "import": (
+        "import importlib\n"
+        "from llm_providers import PROVIDERS\n"
+        "for label, m in PROVIDERS.items():\n"
+        "    try: importlib.import_module(m['path'].rsplit('.', 1)[0])\n"
+        + _REPORT_SKIP
+    ),
+    "tokenizer": (
+        "import importlib\n"
+        "from llm_providers import PROVIDERS\n"
+        f"for label, (getter, args) in {TOKENIZERS!r}.items():\n"
+        "    try:\n"
+        "        mod = importlib.import_module(PROVIDERS[label]['path'].rsplit('.', 1)[0])\n"
+        "        getattr(mod, getter)(*args).encode('warm up')\n"
+        + _REPORT_SKIP
+    ),
+}
+
+
+def _time_snippet(code: str) -> tuple[float, list[str]]:
+    """Seconds taken and the providers the snippet had to skip."""
+    wrapped = (
+        "import time; _t0 = time.perf_counter()\n"
+        f"{code}\n"
+        "print(time.perf_counter() - _t0)\n"
+    )
+    out = subprocess.run([sys.executable, "-c", wrapped], cwd=ROOT,
+                         capture_output=True, text=True, check=True)
+    lines = out.stdout.strip().splitlines()
+    return float(lines[-1]), [ln[len(_SKIP):] for ln in lines if ln.startswith(_SKIP)]
+
+
+def main(repeat: int = 3) -> dict[str, float]:
+    results, skipped = {}, []
+    for name, code in _SNIPPETS.items():
+        runs = [_time_snippet(code) for _ in range(repeat)]
+        results[name] = statistics.median(t for t, _ in runs)
+        print(f"{name:<10} {results[name] * 1_000:9.1f} ms  (median of {repeat})")
+        for line in runs[0][1]:
+            print(f"           skipped {line}")
+        skipped += runs[0][1]
+
+    if skipped:
+        print("\nSome providers were skipped – install their dependencies for a fair comparison.")
+    else:
+        gain = results["tokenizer"] / max(results["registry"], 1e-9)
+        print(f"\nListing providers is {gain:,.0f}× cheaper than eager tokenizer loading.")
+    return results
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description=__doc__,
+                                 formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--repeat", type=int, default=3)
+    main(ap.parse_args().repeat)
@@ -2,30 +2,178 @@
 Prompt builder – Jinja2 powered.
 
 Any {{variable}} in prompt_template.j2 can be filled via `context` below.
+
+Templates are compiled once per *content hash* (the same sha1 that
+`generate_prompt_id_from_template` shortens into the prompt id) and
+recompiled only when the file's contents change, so edits saved from the
+Prompt Editor apply to the next run without a restart.
+
+Each compiled template is also rendered once with sentinel values into a
+skeleton – literal text with {{ facts_block }} / {{ questions_block }} /
+{{ n }} / {{ k }} slots – so a prompt can be streamed piece by piece
+(`prompt_parts`) without building the joined blocks or the full string.
+Templates that compute with a slot ({{ n * k }}, {% if k > 3 %}…) have no
+skeleton and are rendered in full.
 """
+from __future__ import annotations
+import hashlib, re, threading
+from dataclasses import dataclass
 from pathlib import Path
 import random
-from jinja2 import Template
+from typing import Iterator
+from jinja2 import Environment, Template, nodes
 
-TPL = Template(Path("prompt_template.j2").read_text())
+from config import TEMPLATE_PATH
+
+SLOTS     = ("facts_block", "questions_block", "n", "k")
+_SENTINEL = "\x00{}\x00"
+_SLOT_RE  = re.compile("\x00(" + "|".join(SLOTS) + ")\x00")
+
+
+@dataclass(frozen=True)
+class CompiledTemplate:
+    template_id: str                       # "tpl_" + sha1[:8] of the source
+    template: Template
+    segments: tuple | None                 # literal str / ("slot", name); None → render only
+
+    def render(self, **ctx) -> str:
+        return self.template.render(**ctx).strip() + "\n\n"
+
+
+_CACHE: dict[str, CompiledTemplate] = {}           # sha1 → compiled
+_STAT:  dict[str, tuple[int, int, str]] = {}       # path → (mtime_ns, size, sha1)
+_LOCK = threading.Lock()
+
+
+def _slots_output_only(source: str) -> bool:
+    """True if every slot is only ever printed as is (`{{ n }}`), never used in
+    an expression, test or loop – only then can a sentinel stand in for it."""
+    ast    = Environment().parse(source)
+    direct = {id(node) for out in ast.find_all(nodes.Output) for node in out.nodes
+              if isinstance(node, nodes.Name)}
+    return all(id(name) in direct for name in ast.find_all(nodes.Name) if name.name in SLOTS)
+
+
+def _skeleton(tpl: Template, source: str) -> tuple | None:
+    """Split a sentinel render into literals and slots; None if the template
+    transforms a slot (filters, arithmetic, comparisons…) so streaming would
+    be wrong – those templates take the plain render path."""
+    if not _slots_output_only(source):
+        return None
+    try:
+        rendered = tpl.render(**{s: _SENTINEL.format(s) for s in SLOTS})
+    except Exception:           # e.g. {{ n * k }} / {% if k > 3 %} on the sentinels
+        return None
+    parts    = _SLOT_RE.split(rendered)
+    segs     = [("slot", p) if i % 2 else p for i, p in enumerate(parts)]
+    if segs and isinstance(segs[0], str):
+        segs[0] = segs[0].lstrip()
+    if segs and isinstance(segs[-1], str):
+        segs[-1] = segs[-1].rstrip()
+    segs.append("\n\n")
+    segs = tuple(s for s in segs if s != "")
+
+    # probe: the skeleton must reproduce real renders exactly, at more than
+    # one (n, k) so arithmetic or a comparison on them cannot pass by chance
+    probe = CompiledTemplate("", tpl, segs)
+    for n, k in ((2, 2), (3, 5)):
+        facts = [(f"a{i}|b{i} => c{i}|d{i}", f"a{i}|b{i}", f"c{i}|d{i}") for i in range(n)]
+        keys  = [key for _, key, _ in reversed(facts)]
+        try:
+            expect = probe.render(facts_block="\n".join(f for f, _, _ in facts),
+                                  questions_block="\n".join(keys), n=n, k=k)
+        except Exception:
+            return None
+        if "".join(_iter_parts(probe, facts, keys, n=n, k=k)) != expect:
+            return None
+    return segs
 
-def build_prompt_for_all_keys(facts_list, *, k: int | None = None):
-    """
-    facts_list : [(fact_line, key, value), ...]
-    k          : tokens per fact (passed in run_experiments)
-    Returns (prompt_str, keys_in_order)
-    """
-    facts_block = "\n".join(f for (f,_,_) in facts_list)
 
+def get_template(path: str | Path = TEMPLATE_PATH) -> CompiledTemplate:
+    """The compiled template for the file's current contents."""
+    path = Path(path)
+    st   = path.stat()
+    key  = str(path)
+    with _LOCK:
+        cached = _STAT.get(key)
+        if cached and cached[:2] == (st.st_mtime_ns, st.st_size):
+            return _CACHE[cached[2]]
+
+    text = path.read_text()
+    sha1 = hashlib.sha1(text.encode()).hexdigest()
+    with _LOCK:
+        if sha1 not in _CACHE:
+            tpl = Template(text)
+            _CACHE[sha1] = CompiledTemplate("tpl_" + sha1[:8], tpl, _skeleton(tpl, text))
+        _STAT[key] = (st.st_mtime_ns, st.st_size, sha1)
+        return _CACHE[sha1]
+
+
+# ───────────────────────────────────────────────────
+#  rendering
+# ───────────────────────────────────────────────────
+def _lines(items: list[str]) -> Iterator[str]:
+    for i, s in enumerate(items):
+        if i:
+            yield "\n"
+        yield s
+
+
+def _iter_parts(ct: CompiledTemplate, facts_list, keys, *, n, k) -> Iterator[str]:
+    for seg in ct.segments:
+        if isinstance(seg, str):
+            yield seg
+        elif seg[1] == "facts_block":
+            yield from _lines([f for (f, _, _) in facts_list])
+        elif seg[1] == "questions_block":
+            yield from _lines(keys)
+        else:
+            yield str(n if seg[1] == "n" else k)
+
+
+def prompt_parts(facts_list, keys, *, k, template: CompiledTemplate | None = None) -> Iterator[str]:
+    """The prompt as a stream of string pieces (joined, equal to the full render)."""
+    ct = template or get_template()
+    if ct.segments is None:
+        yield ct.render(facts_block="\n".join(f for (f, _, _) in facts_list),
+                        questions_block="\n".join(keys), n=len(facts_list), k=k)
+        return
+    yield from _iter_parts(ct, facts_list, keys, n=len(facts_list), k=k)
+
+
+@dataclass
+class LazyPrompt:
+    """A prompt that is only rendered when written out (see BatchManager)."""
+    facts_list: list
+    keys: list
+    k: int | None
+    template: CompiledTemplate
+
+    def parts(self) -> Iterator[str]:
+        return prompt_parts(self.facts_list, self.keys, k=self.k, template=self.template)
+
+    def __str__(self) -> str:
+        return "".join(self.parts())
+
+
+def order_questions(facts_list, rng=None) -> list[str]:
     keys = [k for (_,k,_) in facts_list]
+    if rng is not None:
+        return [keys[i] for i in rng.permutation(len(keys))]
     random.shuffle(keys)
-    questions_block = "\n".join(keys)
+    return keys
 
-    prompt = TPL.render(
-        facts_block     = facts_block,
-        questions_block = questions_block,
-        n               = len(facts_list),
-        k               = k,
-    ).strip() + "\n\n"
 
-    return prompt, keys
+def build_prompt_for_all_keys(facts_list, *, k: int | None = None, rng=None,
+                              template: CompiledTemplate | None = None, lazy: bool = False):
+    """
+    facts_list : [(fact_line, key, value), ...]
+    k          : tokens per fact (passed in run_experiments)
+    rng        : numpy Generator for the question order (None → `random`)
+    template   : pin a compiled template (default: the file's current one)
+    lazy       : return a `LazyPrompt` instead of the rendered string
+    Returns (prompt_str, keys_in_order)
+    """
+    keys = order_questions(facts_list, rng)
+    lp   = LazyPrompt(facts_list, keys, k, template or get_template())
+    return (lp if lazy else str(lp)), keys
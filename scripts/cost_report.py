@@ -0,0 +1,133 @@
+"""
+scripts/cost_report.py
+──────────────────────
+What runs cost and how fast they went, per (provider, model, N, K), from
+the provider-reported usage stored with every trial – and, before a run,
+what a grid will cost at most.
+
+    python -m scripts.cost_report report [--provider openai]
+    python -m scripts.cost_report estimate OpenAI --n 3,6,12 --k 2,4 --trials 5
+
+The estimate renders trial 0 of every cell: prompt tokens are exact, the
+completion is the expected answer (typical) or the request's cap (worst
+case, which is what a `RunBudget` reserves).
+"""
+
+from __future__ import annotations
+import argparse
+
+import pandas as pd
+
+from core.db_utils import get_conn
+from llm_providers import make_provider
+
+REPORT_SQL = """
+SELECT provider, model, num_facts, k,
+       COUNT(*)                   AS trials,
+       TOTAL(replayed)            AS replayed,
+       TOTAL(usage_estimated)     AS estimated,     -- cancelled streams, counted locally
+       COUNT(completion_tokens)   AS with_usage,
+       TOTAL(usage_prompt_tokens) AS prompt_tokens,
+       TOTAL(cached_tokens)       AS cached_tokens,
+       TOTAL(completion_tokens)   AS completion_tokens,
+       TOTAL(cost_usd)            AS cost_usd,
+       TOTAL(latency_ms)          AS lat_sum,
+       COUNT(latency_ms)          AS lat_n,
+       -- decode throughput only over trials that have both numbers
+       TOTAL(CASE WHEN latency_ms IS NOT NULL THEN completion_tokens END) AS timed_tokens,
+       TOTAL(CASE WHEN completion_tokens IS NOT NULL THEN latency_ms END) AS timed_ms
+FROM trials {where}
+GROUP BY provider, model, num_facts, k
+ORDER BY provider, model, num_facts, k
+"""
+
+
+def cost_report(where: str = "", params=(), conn=None) -> pd.DataFrame:
+    """
+    One row per (provider, model, N, K).  `where` is an SQL fragment over
+    the trials columns with `?` placeholders bound from `params`.
+    """
+    sql = REPORT_SQL.format(where=f"WHERE {where}" if where else "")
+    df  = pd.read_sql(sql, conn or get_conn(), params=list(params))
+    billed = (df.trials - df.replayed).where(lambda s: s > 0)
+    return df.assign(
+        cost_per_trial   = df.cost_usd / billed,
+        cached_share     = df.cached_tokens / df.prompt_tokens.where(lambda s: s > 0),
+        latency_ms       = df.lat_sum / df.lat_n.where(lambda s: s > 0),
+        completion_tok_s = df.timed_tokens / (df.timed_ms / 1_000).where(lambda s: s > 0),
+    ).drop(columns=["lat_sum", "lat_n", "timed_tokens", "timed_ms"])
+
+
+def estimate_run(provider_module: str, facts_list_sizes, token_sizes, trials: int, *,
+                 model: str | None = None, seed: int = 0, bank=None,
+                 batch: bool | None = None) -> pd.DataFrame:
+    """
+    Tokens and USD for a grid before running it, one row per (N, K).
+    batch : price at the Batch-API discount (None → if the provider batches).
+    """
+    from .run_experiments import _prepare_trial
+    from .build_prompt import get_template
+    from .helpers.token_utils import build_single_token_vocab
+    from .trial_bank import TrialBank
+
+    llm = make_provider(provider_module, model)
+    if batch is None:
+        batch = hasattr(llm, "submit_batch")
+    if bank is not None:
+        bank  = TrialBank(bank, tokenizer_id=getattr(llm, "tokenizer_id", None))
+        vocab = None
+    else:
+        vocab = build_single_token_vocab(llm)
+    template = get_template()
+
+    rows = []
+    for n in facts_list_sizes:
+        for k in token_sizes:
+            prompt, keys, kv, p_tok = _prepare_trial(vocab, n, k, 0, seed=seed,
+                                                     template=template, bank=bank)
+            p_tok = p_tok or llm.count_tokens(prompt)
+            exp   = llm.count_tokens("\n".join(kv[key] for key in keys))
+            cap   = min(n * k + 100, llm.max_tokens)
+            typical = llm.cost({"prompt_tokens": p_tok, "completion_tokens": exp}, batch=batch)
+            worst   = llm.cost({"prompt_tokens": p_tok, "completion_tokens": cap}, batch=batch)
+            rows.append({
+                "provider": llm.provider_id, "model": llm.model_name,
+                "num_facts": n, "k": k, "trials": trials,
+                "prompt_tokens": p_tok * trials,
+                "completion_tokens": exp * trials,
+                "max_tokens": (p_tok + cap) * trials,
+                "est_usd": float("nan") if typical is None else typical * trials,
+                "max_usd": float("nan") if worst is None else worst * trials,
+            })
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    ap  = argparse.ArgumentParser(description="Cost / throughput report and run estimates.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    r = sub.add_parser("report")
+    r.add_argument("--provider", default=None)
+    r.add_argument("--model", default=None)
+    r.add_argument("--csv", default=None, help="write the table here instead of printing it")
+    e = sub.add_parser("estimate")
+    e.add_argument("provider", help="registry label or dotted class path")
+    e.add_argument("--model", default=None)
+    e.add_argument("--n", required=True, help="comma-separated N values")
+    e.add_argument("--k", required=True, help="comma-separated K values")
+    e.add_argument("--trials", type=int, default=1)
+    e.add_argument("--bank", default=None)
+    a = ap.parse_args()
+
+    if a.cmd == "report":
+        conds  = [(c, v) for c, v in (("provider = ?", a.provider), ("model = ?", a.model)) if v]
+        df = cost_report(" AND ".join(c for c, _ in conds), [v for _, v in conds])
+    else:
+        df = estimate_run(a.provider, [int(x) for x in a.n.split(",")],
+                          [int(x) for x in a.k.split(",")], a.trials,
+                          model=a.model, bank=a.bank)
+        print(f"total: {df.max_tokens.sum():,} tokens at most, "
+              f"${df.est_usd.sum():.4f} typical / ${df.max_usd.sum():.4f} at most")
+    if getattr(a, "csv", None):
+        df.to_csv(a.csv, index=False)
+    else:
+        print(df.to_string(index=False))
@@ -0,0 +1,194 @@
+"""
+scripts/frontier_planner.py
+───────────────────────────
+Adaptive search for the failure frontier: for each K, the prompt size
+P = N × K at which the major-flaw rate crosses the threshold of the
+Failure Frontier page (`core.summary.FLAW_THRESHOLD`).
+
+Instead of the full N × K grid, every K is bisected on a log scale over
+its candidate N values, starting from what the database already holds for
+the (provider, model, prompt_id):
+
+    lo  – largest N measured below the threshold (and under hi)
+    hi  – smallest N measured at or above it
+
+The next probe is the candidate closest to the geometric mean of the
+bracket (an open end is the end of the N range).  A K is settled once
+hi / lo ≤ 1 + tol, the two are neighbouring candidates, or the frontier
+lies outside the range – roughly log2(log(N_max / N_min) / log(1 + tol))
+probed cells per K instead of one per candidate.
+
+    python -m scripts.frontier_planner OpenAI --n 4,6,8,12,16,24,32,48,64 --k 2,4 --trials 3
+"""
+
+from __future__ import annotations
+import argparse, math, threading
+from dataclasses import dataclass
+from pathlib import Path
+
+from core.summary import load_cells, FLAW_THRESHOLD
+from llm_providers import load_provider
+from .run_experiments import run_experiments
+from .sequential import SequentialRule
+
+# result import writes the shared DB; one at a time per process
+_IMPORT_LOCK = threading.Lock()
+
+
+@dataclass
+class KFrontier:
+    k: int
+    threshold: float = FLAW_THRESHOLD
+    lo: int | None = None           # largest N below the threshold
+    hi: int | None = None           # smallest N at / above it
+    lo_rate: float | None = None
+    hi_rate: float | None = None
+    probe: int | None = None        # next N to run; None → settled
+    note: str = ""
+
+    @property
+    def settled(self) -> bool:
+        return self.probe is None
+
+    @property
+    def p_estimate(self) -> float | None:
+        """P where the flaw rate crosses the threshold, interpolated in log P."""
+        if self.lo is None or self.hi is None:
+            return None
+        f = (self.threshold - self.lo_rate) / (self.hi_rate - self.lo_rate)
+        return self.k * math.exp(math.log(self.lo) + f * math.log(self.hi / self.lo))
+
+    def __str__(self) -> str:
+        p = self.p_estimate
+        head = f"K={self.k}: " + (f"P*≈{p:.0f} (N {self.lo}–{self.hi})" if p else
+                                  f"N {self.lo or '?'}–{self.hi or '?'}")
+        return head + (f", next N={self.probe}" if self.probe else "") + \
+            (f" [{self.note}]" if self.note else "")
+
+
+def observed(provider_id: str, model: str, prompt_id: str, ks,
+             conn=None) -> dict[int, dict[int, tuple[float, int]]]:
+    """K → {N: (flaw rate, runs)} from `cell_summary`."""
+    ks    = [int(k) for k in ks]
+    marks = ",".join("?" * len(ks))
+    df = load_cells(group_by=("num_facts", "k"),
+                    where=f"provider = ? AND model = ? AND prompt_id = ? AND k IN ({marks})",
+                    params=(provider_id, model, prompt_id, *ks), conn=conn)
+    out = {k: {} for k in ks}
+    for r in df.itertuples():
+        if r.n:
+            out[int(r.k)][int(r.num_facts)] = (float(r.flaw_rate), int(r.n))
+    return out
+
+
+def plan_k(obs: dict[int, tuple[float, int]], k: int, candidates, *,
+           threshold: float = FLAW_THRESHOLD, tol: float = 0.1,
+           min_trials: int = 1) -> KFrontier:
+    """Bracket and next probe for one K; cells with < min_trials runs are unmeasured."""
+    cand  = sorted(set(int(n) for n in candidates))
+    st = KFrontier(k, threshold)
+    if not cand:                    # nothing to probe – settled, and the search stops
+        st.note = "no candidate N"
+        return st
+    known = {n: rate for n, (rate, runs) in obs.items()
+             if runs >= min_trials and cand[0] <= n <= cand[-1]}
+    st.hi = min((n for n, r in known.items() if r >= threshold), default=None)
+    st.lo = max((n for n, r in known.items()
+                 if r < threshold and (st.hi is None or n < st.hi)), default=None)
+    st.lo_rate = known.get(st.lo)
+    st.hi_rate = known.get(st.hi)
+
+    inner = [n for n in cand if (st.lo is None or n > st.lo) and (st.hi is None or n < st.hi)]
+    if not inner:
+        st.note = ("frontier at or below the N range" if st.lo is None else
+                   "no failure within the N range" if st.hi is None else "converged")
+        return st
+    if st.lo is not None and st.hi is not None and st.hi / st.lo <= 1 + tol:
+        st.note = "converged"
+        return st
+    mid = math.sqrt((st.lo or inner[0]) * (st.hi or inner[-1]))
+    st.probe = min(inner, key=lambda n: abs(math.log(n / mid)))
+    return st
+
+
+def plan(provider_id: str, model: str, prompt_id: str, candidates, ks, *,
+         threshold: float = FLAW_THRESHOLD, tol: float = 0.1, min_trials: int = 1,
+         conn=None) -> list[KFrontier]:
+    obs = observed(provider_id, model, prompt_id, ks, conn=conn)
+    return [plan_k(obs[int(k)], int(k), candidates, threshold=threshold, tol=tol,
+                   min_trials=min_trials) for k in ks]
+
+
+def search_frontier(provider_module: str, facts_list_sizes, token_sizes, trials: int = 3, *,
+                    model: str | None = None, prompt_id: str = "default_prompt",
+                    output_root="results", threshold: float = FLAW_THRESHOLD,
+                    tol: float = 0.1, max_rounds: int = 30, verbose: bool = True,
+                    should_stop=None, **run_kwargs) -> str:
+    """
+    Plan → run the probes of every unsettled K (one `run_experiments` call)
+    → import → re-plan, until all K are settled.
+
+    facts_list_sizes are the candidate N values, token_sizes the K values;
+    each probe gets `trials` trials (with `sequential`, at least its
+    min_trials and up to `trials`).  Early abort and the staircase are
+    ignored – a probe needs every trial for its flaw rate.  Remaining
+    run_kwargs (seed, bank, stream, scheduler…) go to `run_experiments`.
+    Returns one line per K.
+    """
+    from core.json_import import import_json_dir
+
+    cls   = load_provider(provider_module)
+    name  = model or cls.model_name
+    run_kwargs.pop("early_abort", None)
+    run_kwargs.pop("adaptive", None)
+    ks    = sorted(set(int(k) for k in token_sizes))
+    rule  = run_kwargs.get("sequential")
+    if isinstance(rule, dict):
+        rule = SequentialRule(**rule)
+    need  = min(trials, rule.min_trials) if rule is not None else trials
+    last  = None
+    for rnd in range(max_rounds):
+        obs    = observed(cls.provider_id, name, prompt_id, ks)
+        states = [plan_k(obs[k], k, facts_list_sizes, threshold=threshold, tol=tol,
+                         min_trials=need) for k in ks]
+        probes = [(s.probe, s.k) for s in states if not s.settled]
+        if verbose:
+            print(f"🎯 round {rnd}: " + "; ".join(map(str, states)))
+        if not probes or (should_stop and should_stop()):
+            break
+        seen = [obs[k].get(n) for n, k in probes]
+        if (probes, seen) == last:      # the probes' trials keep failing / being skipped
+            for s in states:
+                if not s.settled:
+                    s.note = "no progress on this probe"
+            break
+        last = probes, seen
+        run_experiments(provider_module, facts_list_sizes, token_sizes, trials,
+                        output_root=output_root, prompt_id=prompt_id, verbose=verbose,
+                        model=model, cells=probes, should_stop=should_stop, **run_kwargs)
+        with _IMPORT_LOCK:
+            import_json_dir(Path(output_root).resolve())
+    else:
+        for s in states:
+            if not s.settled:
+                s.note = f"stopped after {max_rounds} rounds"
+    return "; ".join(map(str, states))
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Adaptive failure-frontier search.")
+    ap.add_argument("provider", help="registry label or dotted class path")
+    ap.add_argument("--model", default=None)
+    ap.add_argument("--n", required=True, help="comma-separated candidate N values")
+    ap.add_argument("--k", required=True, help="comma-separated K values")
+    ap.add_argument("--trials", type=int, default=3)
+    ap.add_argument("--threshold", type=float, default=FLAW_THRESHOLD)
+    ap.add_argument("--tol", type=float, default=0.1, help="relative width of the final P bracket")
+    ap.add_argument("--prompt-id", default="default_prompt")
+    ap.add_argument("--output-root", default="results")
+    ap.add_argument("--seed", type=int, default=None)
+    a = ap.parse_args()
+    print(search_frontier(a.provider, [int(x) for x in a.n.split(",")],
+                          [int(x) for x in a.k.split(",")], a.trials,
+                          model=a.model, prompt_id=a.prompt_id, output_root=a.output_root,
+                          threshold=a.threshold, tol=a.tol, seed=a.seed))
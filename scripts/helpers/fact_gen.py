@@ -1,4 +1,116 @@
-import random
+import random, threading
+from collections import OrderedDict
+from typing import Iterable, Iterator
+
+import numpy as np
+
+# Facts are drawn as token *indices* into the vocabulary: one (2N, K) int
+# matrix per trial – rows [0, N) are keys, rows [N, 2N) their values –
+# from a generator seeded by (seed, N, K, trial), so any trial can be
+# re-created exactly from the seed stored with its result.
+
+_HASH_MULT = np.random.default_rng(0x5EED).integers(1, 2**63, size=4096, dtype=np.uint64) | 1
+
+
+def trial_rng(seed: int, n: int, k: int, t: int) -> np.random.Generator:
+    """Independent, reproducible stream for one (N, K, trial)."""
+    return np.random.default_rng(np.random.SeedSequence([seed, n, k, t]))
+
+
+def new_seed() -> int:
+    """A fresh 128-bit run seed (stored with the results)."""
+    return int(np.random.SeedSequence().entropy)
+
+
+def _row_hashes(rows: np.ndarray) -> np.ndarray:
+    """64-bit hash per row (wrapping multiply-add); equal rows → equal hashes."""
+    mult = np.resize(_HASH_MULT, rows.shape[1])
+    with np.errstate(over="ignore"):
+        return (rows.astype(np.uint64) * mult).sum(axis=1, dtype=np.uint64)
+
+
+def draw_fact_indices(rng: np.random.Generator, vocab_size: int,
+                      n: int, k: int, *, max_rounds: int = 100) -> np.ndarray:
+    """
+    (2N, K) token indices: no token repeats inside a row and no row repeats
+    anywhere in the trial.  All rows are drawn in one call; only offending
+    rows are redrawn.
+    """
+    if k > vocab_size:
+        raise ValueError(f"K={k} exceeds the vocabulary ({vocab_size} tokens)")
+    out  = rng.integers(0, vocab_size, size=(2 * n, k))
+    h    = _row_hashes(out)
+    redo = np.arange(2 * n)
+    for _ in range(max_rounds):
+        # duplicate token inside a row → redraw that row
+        s   = np.sort(out[redo], axis=1)
+        bad = redo[(s[:, 1:] == s[:, :-1]).any(axis=1)]
+        # duplicate row (by hash) → redraw every copy after the first
+        _, first = np.unique(h, return_index=True)
+        dup = np.setdiff1d(np.arange(2 * n), first, assume_unique=True)
+        redo = np.union1d(bad, dup)
+        if redo.size == 0:
+            return out
+        out[redo] = rng.integers(0, vocab_size, size=(redo.size, k))
+        h[redo]   = _row_hashes(out[redo])
+    raise ValueError(f"Could not draw {2 * n} distinct {k}-token sequences "
+                     f"from {vocab_size} tokens after {max_rounds} rounds.")
+
+
+# pool object → its fixed-width encoding; the entry holds the pool itself, so
+# its id cannot be reused while cached.  Pools are never mutated in place.
+_ENCODED: OrderedDict[int, tuple[object, np.ndarray]] = OrderedDict()
+_ENCODED_LOCK = threading.Lock()
+_ENCODED_MAX  = 8
+
+
+def _encoded_pool(pool) -> np.ndarray:
+    """'token|' as NUL-padded fixed-width bytes, one per pool entry – built once per pool."""
+    with _ENCODED_LOCK:
+        hit = _ENCODED.get(id(pool))
+        if hit is not None and hit[0] is pool:
+            _ENCODED.move_to_end(id(pool))
+            return hit[1]
+    enc  = [f"{t}|".encode() for t in pool]
+    cell = np.array(enc, dtype=f"S{max(map(len, enc))}")
+    with _ENCODED_LOCK:
+        _ENCODED[id(pool)] = (pool, cell)
+        while len(_ENCODED) > _ENCODED_MAX:
+            _ENCODED.popitem(last=False)
+    return cell
+
+
+def _join_rows(idx: np.ndarray, pool) -> list[str]:
+    """'|'.join of every row of tokens, via one fixed-width bytes gather."""
+    cell = _encoded_pool(pool)
+    buf  = cell[idx].tobytes()
+    step = idx.shape[1] * cell.itemsize
+    return [buf[i:i + step].replace(b"\0", b"")[:-1].decode()
+            for i in range(0, len(buf), step)]
+
+
+def facts_from_indices(idx: np.ndarray, pool) -> tuple[list, dict]:
+    """Index matrix → (facts_list, key_value_dict) in the classic format."""
+    n    = idx.shape[0] // 2
+    seqs = _join_rows(idx, pool)
+    keys, vals = seqs[:n], seqs[n:]
+    facts_list = [(f"{key} => {val}", key, val) for key, val in zip(keys, vals)]
+    return facts_list, dict(zip(keys, vals))
+
+
+def generate_grid(pool, cells: Iterable[tuple[int, int]], trials: int,
+                  seed: int) -> Iterator[tuple[int, int, int, np.ndarray, np.random.Generator]]:
+    """
+    Yield (N, K, trial, index matrix, rng) for every trial of every cell –
+    the bulk path used to pre-build a whole grid.  `rng` has already drawn
+    the facts; drawing the question order from it next reproduces exactly
+    what `run_experiments` does for the same seed.
+    """
+    size = len(pool)
+    for n, k in cells:
+        for t in range(trials):
+            rng = trial_rng(seed, n, k, t)
+            yield n, k, t, draw_fact_indices(rng, size, n, k), rng
 
 
 def generate_unique_sequence(k: int, single_token_pool, used_sequences: set) -> str:
@@ -15,24 +127,17 @@ def generate_unique_sequence(k: int, single_token_pool, used_sequences: set) ->
             return seq
     raise ValueError(f"Could not find a new {k}-token sequence after {max_tries} attempts.")
 
-def generate_facts_k_tokens(num_facts: int, k: int, single_token_pool):
+def generate_facts_k_tokens(num_facts: int, k: int, single_token_pool,
+                            *, rng: np.random.Generator | None = None):
     """
     Generate `num_facts` lines, each of form:
         "Key: <k-token-seq> => Value: <k-token-seq>"
     where no key or value is repeated.
+    rng : seeded generator (see `trial_rng`); None draws from fresh entropy.
     Returns:
       facts_list: list of (fact_line, key_string, value_string)
       key_value_dict: mapping key_string -> value_string
     """
-    used_sequences = set()
-    facts_list = []
-    key_value_dict = {}
-
-    for _ in range(num_facts):
-        key_seq = generate_unique_sequence(k, single_token_pool, used_sequences)
-        val_seq = generate_unique_sequence(k, single_token_pool, used_sequences)
-        fact_line = f"{key_seq} => {val_seq}"
-        facts_list.append((fact_line, key_seq, val_seq))
-        key_value_dict[key_seq] = val_seq
-
-    return facts_list, key_value_dict
\ No newline at end of file
+    rng = rng if rng is not None else np.random.default_rng()
+    idx = draw_fact_indices(rng, len(single_token_pool), num_facts, k)
+    return facts_from_indices(idx, single_token_pool)
@@ -1,22 +1,77 @@
-import json, functools
+import json, functools, hashlib
+from pathlib import Path
 from typing import Callable, Set
 
+import numpy as np
+
 # Cache prevents re-reading JSON every call
 @functools.lru_cache(maxsize=None)
 def load_token_set(path: str) -> Set[str]:
     with open(path, "r") as f:
         return set(json.load(f))
 
-def build_single_token_vocab(provider) -> list[str]:
+
+# ───────────────────────────────────────────────────
+#  verified-vocabulary sidecar
+# ───────────────────────────────────────────────────
+# Verifying a token file means re-tokenizing every entry.  The result only
+# depends on the file contents and the tokenizer, so it is stored next to
+# the file as  <stem>.<fingerprint>.npy  (a fixed-width unicode array that
+# np.load memory-maps and the fact generator can index directly).
+def vocab_fingerprint(path: str, tokenizer_id: str) -> str:
+    h = hashlib.sha1(tokenizer_id.encode())
+    h.update(Path(path).read_bytes())
+    return h.hexdigest()[:16]
+
+
+def _sidecar(path: str, fingerprint: str) -> Path:
+    p = Path(path)
+    return p.with_name(f"{p.stem}.{fingerprint}.npy")
+
+
+@functools.lru_cache(maxsize=None)
+def _load_verified(path: str, fingerprint: str) -> np.ndarray | None:
+    side = _sidecar(path, fingerprint)
+    return np.load(side, mmap_mode="r") if side.exists() else None
+
+
+def load_verified_vocab(provider) -> np.ndarray:
     """
-    Returns a *list* (not set) of tokens guaranteed to be single tokens
-    for this provider. You said you'll keep these files in sync.
+    The provider's single-token vocabulary as a sorted numpy string array,
+    verified against its tokenizer at most once per (file, tokenizer).
     """
-    token_set = load_token_set(provider.token_set_path)
-    good = [tok for tok in token_set if provider.count_tokens(tok) == 1]
-    if len(good) != len(token_set):
-        bad = set(token_set) - set(good)
+    path = provider.token_set_path
+    tokenizer_id = getattr(provider, "tokenizer_id", None) or \
+        f"{type(provider).__module__}.{type(provider).__qualname__}:{provider.model_name}"
+    fp   = vocab_fingerprint(path, tokenizer_id)
+    cached = _load_verified(path, fp)
+    if cached is not None:
+        return cached
+
+    token_set = sorted(load_token_set(path))
+    if hasattr(provider, "count_tokens_batch"):
+        counts = provider.count_tokens_batch(token_set)
+    else:
+        counts = [provider.count_tokens(tok) for tok in token_set]
+    bad = [tok for tok, n in zip(token_set, counts) if n != 1]
+    if bad:
         raise ValueError(
             f"{provider.provider_id}: {len(bad)} entries are not single tokens"
         )
-    return good
+
+    arr  = np.asarray(token_set, dtype=str)
+    side = _sidecar(path, fp)
+    tmp  = side.with_suffix(".tmp.npy")
+    np.save(tmp, arr)
+    tmp.replace(side)                          # readers never see half a file
+    _load_verified.cache_clear()
+    return arr
+
+
+def build_single_token_vocab(provider) -> list[str]:
+    """
+    Returns a *list* (not set) of tokens guaranteed to be single tokens
+    for this provider. You said you'll keep these files in sync.
+    Verification is cached on disk – see `load_verified_vocab`.
+    """
+    return load_verified_vocab(provider).tolist()
@@ -0,0 +1,332 @@
+"""
+scripts/job_queue.py
+────────────────────
+SQLite-backed queue that runs experiment sweeps outside Streamlit.
+
+The page enqueues a job (the `run_sweep` arguments as JSON) and returns
+at once; worker processes – started detached, so a browser refresh or a
+rerun cannot kill them – claim queued jobs one at a time, run them and
+write structured progress (trials done / failed / planned, trials/s,
+ETA) that the page polls.
+
+    queued ─▶ running ─▶ done | failed
+       │         └─▶ cancelling ─▶ cancelled
+       └─▶ cancelled                   └─▶ (resume) queued
+
+Cancelling stops new trials from starting; resuming re-queues the job,
+and the run journal makes it do only the missing trials.  A running job
+whose worker stopped heart-beating is handed to the next free worker.
+
+    python -m scripts.job_queue worker            # one worker, this terminal
+    python -m scripts.job_queue list
+"""
+
+from __future__ import annotations
+import argparse, json, os, sqlite3, subprocess, sys, threading, time, traceback
+from pathlib import Path
+
+from config import JOBS_DB_PATH, PROJECT_ROOT
+
+HEARTBEAT_S = 5.0
+STALE_S     = 60.0            # no heartbeat for this long → worker presumed dead
+REPORT_S    = 2.0             # min seconds between progress records
+WORKER_LOG  = JOBS_DB_PATH.with_suffix(".log")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id        INTEGER PRIMARY KEY AUTOINCREMENT,
+    label     TEXT,
+    params    TEXT,                       -- JSON, see `enqueue`
+    status    TEXT DEFAULT 'queued',
+    created   REAL,
+    started   REAL,
+    finished  REAL,
+    worker    INTEGER,                    -- pid
+    heartbeat REAL,
+    total     INTEGER DEFAULT 0,
+    done      INTEGER DEFAULT 0,
+    failed    INTEGER DEFAULT 0,
+    rate      REAL,                       -- trials / s
+    eta_s     REAL,
+    message   TEXT,
+    error     TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, id);
+CREATE TABLE IF NOT EXISTS job_progress (
+    job_id INTEGER, ts REAL, total INTEGER, done INTEGER, failed INTEGER,
+    rate REAL, eta_s REAL
+);
+CREATE INDEX IF NOT EXISTS idx_job_progress ON job_progress (job_id, ts);
+CREATE TABLE IF NOT EXISTS workers (pid INTEGER PRIMARY KEY, started REAL, heartbeat REAL,
+                                    job_id INTEGER);
+"""
+
+ACTIVE = ("queued", "running", "cancelling")
+
+
+def connect(path: str | Path = JOBS_DB_PATH) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None,
+                           check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+# ───────────────────────────────────────────────────
+#  page side
+# ───────────────────────────────────────────────────
+def enqueue(conn, params: dict, label: str = "") -> int:
+    """
+    params: {"jobs": [[provider, model|None], ...],
+             "budgets": {provider: {"max_concurrency", "rpm", "tpm"}},
+             "build_bank": bool, "response_cache": bool,
+             "frontier": {"threshold", "tol"} | None,
+             "spend": {"usd", "tokens"} | None – the job's budget, carried
+                      over (with what was spent) when it is resumed,
+             "run": {run_experiments keyword arguments}}
+    """
+    cur = conn.execute("INSERT INTO jobs (label, params, created) VALUES (?, ?, ?)",
+                       (label, json.dumps(params), time.time()))
+    return cur.lastrowid
+
+
+def list_jobs(conn, limit: int = 50) -> list[dict]:
+    now = time.time()
+    rows = conn.execute("SELECT * FROM jobs ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+    out  = []
+    for r in rows:
+        d = dict(r)
+        d["stale"] = d["status"] in ("running", "cancelling") and \
+            (d["heartbeat"] or 0) < now - STALE_S
+        out.append(d)
+    return out
+
+
+def progress_history(conn, job_id: int) -> list[dict]:
+    return [dict(r) for r in conn.execute(
+        "SELECT * FROM job_progress WHERE job_id = ? ORDER BY ts", (job_id,))]
+
+
+def cancel(conn, job_id: int) -> None:
+    """Queued (or orphaned) → cancelled now; running → cancelling (the worker stops it)."""
+    now = time.time()
+    conn.execute("UPDATE jobs SET status = 'cancelled', finished = ? WHERE id = ? AND "
+                 "(status = 'queued' OR (status IN ('running', 'cancelling') AND "
+                 " COALESCE(heartbeat, 0) < ?))", (now, job_id, now - STALE_S))
+    conn.execute("UPDATE jobs SET status = 'cancelling' WHERE id = ? AND status = 'running'",
+                 (job_id,))
+
+
+def resume(conn, job_id: int) -> None:
+    """Re-queue a cancelled or failed job; it only runs what is still missing."""
+    conn.execute("UPDATE jobs SET status = 'queued', error = NULL, finished = NULL "
+                 "WHERE id = ? AND status IN ('cancelled', 'failed')", (job_id,))
+
+
+def live_workers(conn) -> int:
+    return conn.execute("SELECT COUNT(*) FROM workers WHERE heartbeat > ?",
+                        (time.time() - STALE_S,)).fetchone()[0]
+
+
+def ensure_workers(conn, n: int) -> int:
+    """Start detached workers until `n` are alive; returns how many were started."""
+    started = 0
+    for _ in range(max(0, n - live_workers(conn))):
+        with WORKER_LOG.open("a") as log:
+            subprocess.Popen([sys.executable, "-m", "scripts.job_queue", "worker",
+                              "--idle-exit", "300"],
+                             cwd=PROJECT_ROOT, start_new_session=True,
+                             stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT)
+        started += 1
+    if started:         # register before returning so the next poll counts them
+        time.sleep(0.5)
+    return started
+
+
+# ───────────────────────────────────────────────────
+#  worker side
+# ───────────────────────────────────────────────────
+def claim(conn, pid: int) -> sqlite3.Row | None:
+    """Atomically take the oldest queued job (or one whose worker died)."""
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        row = conn.execute("""
+            SELECT * FROM jobs
+            WHERE status = 'queued'
+               OR (status = 'running' AND COALESCE(heartbeat, 0) < ?)
+            ORDER BY id LIMIT 1""", (now - STALE_S,)).fetchone()
+        if row is not None:
+            conn.execute("UPDATE jobs SET status = 'running', worker = ?, heartbeat = ?, "
+                         "started = COALESCE(started, ?), total = 0, done = 0, failed = 0 "
+                         "WHERE id = ?", (pid, now, now, row["id"]))
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    return row
+
+
+class _Progress:
+    """Aggregates run_experiments progress events across a sweep's threads."""
+
+    def __init__(self, conn, job_id: int):
+        self.conn, self.job_id = conn, job_id
+        self.total = self.done = self.failed = 0
+        self._t0   = time.monotonic()
+        self._last = 0.0
+        self._lock = threading.Lock()
+
+    def __call__(self, event: str, n: int) -> None:
+        with self._lock:
+            if event == "planned":
+                self.total += n
+            elif event == "completed":
+                self.done += n
+            elif event == "failed":
+                self.failed += n
+            elif event == "stopped":        # sequential testing dropped these trials
+                self.total -= n
+            else:
+                return
+        self.report()
+
+    def report(self, force: bool = False) -> None:
+        with self._lock:
+            now = time.monotonic()
+            if not force and now - self._last < REPORT_S:
+                return
+            self._last = now
+            elapsed = now - self._t0
+            rate = self.done / elapsed if elapsed > 0 else 0.0
+            left = max(0, self.total - self.done - self.failed)
+            eta  = left / rate if rate > 0 else None
+            rec  = (self.total, self.done, self.failed, rate, eta)
+            self.conn.execute("UPDATE jobs SET total = ?, done = ?, failed = ?, rate = ?, "
+                              "eta_s = ? WHERE id = ?", (*rec, self.job_id))
+            self.conn.execute("INSERT INTO job_progress VALUES (?, ?, ?, ?, ?, ?, ?)",
+                              (self.job_id, time.time(), *rec))
+
+
+def _with_spend(params: dict, spend) -> str:
+    """params JSON with the budget's running totals (None → unchanged)."""
+    return json.dumps(params if spend is None else {**params, "spend": spend.to_dict()})
+
+
+def _heartbeat(path, job_id: int, pid: int, stop: threading.Event,
+               cancelled: threading.Event, params: dict, spend=None) -> None:
+    conn = connect(path)                 # own connection: this is another thread
+    while not stop.wait(HEARTBEAT_S):
+        now = time.time()
+        # spend is saved with every beat, so a job reclaimed after its worker
+        # died resumes from (at most one beat before) what it had spent
+        conn.execute("UPDATE jobs SET heartbeat = ?, params = ? WHERE id = ?",
+                     (now, _with_spend(params, spend), job_id))
+        conn.execute("UPDATE workers SET heartbeat = ? WHERE pid = ?", (now, pid))
+        status = conn.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()[0]
+        if status == "cancelling":
+            cancelled.set()
+    conn.close()
+
+
+def run_job(conn, row: sqlite3.Row, pid: int, path: str | Path = JOBS_DB_PATH) -> None:
+    from core.json_import import import_json_dir
+    from .orchestrator import SweepJob, ProviderBudget, run_sweep
+    from .trial_bank import build_bank
+    from llm_providers.usage import RunBudget
+
+    job_id, params = row["id"], json.loads(row["params"])
+    jobs     = [SweepJob(p, m) for p, m in params["jobs"]]
+    budgets  = {p: ProviderBudget(**b) for p, b in params.get("budgets", {}).items()}
+    run      = dict(params.get("run", {}))
+    progress = _Progress(conn, job_id)
+    spend    = RunBudget(**params["spend"]) if params.get("spend") else None
+    stop, cancelled = threading.Event(), threading.Event()
+    beat = threading.Thread(target=_heartbeat,
+                            args=(path, job_id, pid, stop, cancelled, params, spend),
+                            daemon=True)
+    beat.start()
+    conn.execute("UPDATE workers SET job_id = ? WHERE pid = ?", (job_id, pid))
+
+    messages, errors = [], []
+    try:
+        if params.get("build_bank") and run.get("bank"):
+            build_bank(run["bank"], [(j.provider, j.model) for j in jobs],
+                       run["facts_list_sizes"], run["token_sizes"], run["trials"],
+                       seed=run.get("seed"))
+        for job, msg, err in run_sweep(jobs, budgets=budgets,
+                                       response_cache=params.get("response_cache", True),
+                                       frontier=params.get("frontier"),
+                                       budget=spend,
+                                       should_stop=cancelled.is_set, progress=progress,
+                                       **run):
+            name = f"{job.provider.rsplit('.', 1)[-1]} ({job.model or 'default'})"
+            if err is not None:
+                errors.append(f"{name}: {''.join(traceback.format_exception(err))}")
+            else:
+                messages.append(f"{name}: {msg}")
+        import_json_dir()
+        status = "cancelled" if cancelled.is_set() else ("failed" if errors else "done")
+    except Exception:
+        errors.append(traceback.format_exc())
+        status = "failed"
+    finally:
+        stop.set()
+        beat.join()
+        progress.report(force=True)
+
+    if spend is not None:                   # a resumed job continues from what it spent
+        messages.append(f"spent {spend.describe()}")
+    conn.execute("UPDATE jobs SET status = ?, finished = ?, message = ?, error = ?, "
+                 "params = ? WHERE id = ?",
+                 (status, time.time(), "\n".join(messages) or None,
+                  "\n\n".join(errors) or None, _with_spend(params, spend), job_id))
+    conn.execute("UPDATE workers SET job_id = NULL WHERE pid = ?", (pid,))
+
+
+def worker(path: str | Path = JOBS_DB_PATH, *, poll_s: float = 2.0,
+           idle_exit: float | None = None) -> None:
+    """Claim and run jobs until idle for `idle_exit` seconds (None → forever)."""
+    conn, pid = connect(path), os.getpid()
+    conn.execute("INSERT OR REPLACE INTO workers VALUES (?, ?, ?, NULL)",
+                 (pid, time.time(), time.time()))
+    idle_since = time.monotonic()
+    try:
+        while True:
+            row = claim(conn, pid)
+            if row is None:
+                if idle_exit is not None and time.monotonic() - idle_since > idle_exit:
+                    return
+                conn.execute("UPDATE workers SET heartbeat = ? WHERE pid = ?", (time.time(), pid))
+                time.sleep(poll_s)
+                continue
+            print(f"▶️ job {row['id']} {row['label'] or ''}", flush=True)
+            run_job(conn, row, pid, path)
+            idle_since = time.monotonic()
+    finally:
+        conn.execute("DELETE FROM workers WHERE pid = ?", (pid,))
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Experiment job queue.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    w = sub.add_parser("worker", help="run queued jobs")
+    w.add_argument("--idle-exit", type=float, default=None,
+                   help="exit after this many idle seconds")
+    sub.add_parser("list", help="show recent jobs")
+    for name in ("cancel", "resume"):
+        sub.add_parser(name).add_argument("job_id", type=int)
+    a = ap.parse_args()
+
+    if a.cmd == "worker":
+        worker(idle_exit=a.idle_exit)
+    else:
+        conn = connect()
+        if a.cmd == "list":
+            for j in list_jobs(conn):
+                print(f"{j['id']:>4}  {j['status']:<10} {j['done']}/{j['total']} "
+                      f"({j['failed']} failed)  {j['label'] or ''}")
+        else:
+            (cancel if a.cmd == "cancel" else resume)(conn, a.job_id)
@@ -0,0 +1,96 @@
+"""
+scripts/orchestrator.py
+───────────────────────
+Run one grid against several providers and several models per provider
+at the same time, in one process.
+
+Every (provider, model) is its own `run_experiments` call on its own
+thread, so a sweep takes as long as its slowest member instead of the sum.
+Each of them also gets its own `RequestScheduler`: OpenAI-style rate
+limits are per model, and a scheduler adapts to the `x-ratelimit-*`
+headers and 429s of the model it serves, so one model's limits must not
+throttle (or loosen) its siblings.  The model is passed to the provider's
+constructor; no environment variable is touched.
+"""
+
+from __future__ import annotations
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Iterable, Iterator
+
+from config import RESPONSE_CACHE_PATH
+from llm_providers import load_provider
+from llm_providers.response_cache import ResponseCache
+from llm_providers.scheduler import RequestScheduler
+from llm_providers.usage import RunBudget
+from .run_experiments import run_experiments
+from .frontier_planner import search_frontier
+
+
+@dataclass(frozen=True)
+class SweepJob:
+    provider: str                 # registry label or dotted class path
+    model: str | None = None      # None → the provider's default
+
+
+@dataclass(frozen=True)
+class ProviderBudget:
+    """Per-provider limits, applied to each of its models separately (None → class default)."""
+    max_concurrency: int | None = None
+    rpm: int | None = None
+    tpm: int | None = None
+
+
+def _schedulers(jobs: list[SweepJob],
+                budgets: dict[str, ProviderBudget]) -> dict[SweepJob, tuple[RequestScheduler, int]]:
+    """(provider, model) → (its scheduler, in-flight cap)."""
+    out = {}
+    for job in jobs:
+        if job in out:
+            continue
+        cls    = load_provider(job.provider)
+        budget = budgets.get(job.provider, ProviderBudget())
+        conc   = budget.max_concurrency or getattr(cls, "max_concurrency", 1)
+        out[job] = (RequestScheduler(rpm=budget.rpm or getattr(cls, "rpm_limit", None),
+                                     tpm=budget.tpm or getattr(cls, "tpm_limit", None),
+                                     max_concurrency=conc), conc)
+    return out
+
+
+def run_sweep(jobs: Iterable[SweepJob], *,
+              budgets: dict[str, ProviderBudget] | None = None,
+              response_cache=True,
+              frontier: dict | None = None,
+              budget: RunBudget | dict | None = None,
+              **run_kwargs) -> Iterator[tuple[SweepJob, str | None, BaseException | None]]:
+    """
+    Start every job at once; yield (job, message, error) as each finishes.
+
+    run_kwargs are passed to every `run_experiments` call (grid, trials,
+    seed, bank, prompt_id…).  One response cache is shared by all jobs.
+    frontier : {"threshold", "tol"} → each job runs `search_frontier` over
+               the grid instead of every cell.
+    budget   : one `RunBudget` (or {"usd", "tokens"}) for the whole sweep.
+    """
+    jobs   = list(dict.fromkeys(jobs))
+    scheds = _schedulers(jobs, budgets or {})
+    if response_cache is True:
+        response_cache = RESPONSE_CACHE_PATH
+    if response_cache and not isinstance(response_cache, ResponseCache):
+        response_cache = ResponseCache(response_cache)
+    if isinstance(budget, dict):
+        budget = RunBudget(**budget)
+
+    def _one(job: SweepJob) -> str | None:
+        sched, conc = scheds[job]
+        run = run_experiments if frontier is None else search_frontier
+        return run(job.provider, model=job.model, scheduler=sched, concurrency=conc,
+                   response_cache=response_cache, budget=budget,
+                   **(frontier or {}), **run_kwargs)
+
+    with ThreadPoolExecutor(max_workers=max(1, len(jobs)),
+                            thread_name_prefix="sweep") as pool:
+        futures = {pool.submit(_one, job): job for job in jobs}
+        for fut in as_completed(futures):
+            err = fut.exception()
+            yield futures[fut], (None if err else fut.result()), err
@@ -0,0 +1,206 @@
+"""
+scripts/regrade.py
+──────────────────
+Bulk re-grader for every saved result.
+
+Re-applies the `grade_response` rules (repeated line, too few tokens,
+first/last character) and the `evaluate_token_sequences` scores to whole
+chunks of trials at once with NumPy, spreads the chunks over a process
+pool, and writes `sequence_accuracy` / `token_accuracy` /
+`major_format_flaw` back into the JSON files and the SQLite `trials` table.
+
+Token counts come from the `expected_token_count` / `response_token_count`
+recorded at grading time; files that predate those fields fall back to the
+single-token vocabulary rule (a line of m tokens joined by '|' is 2m-1
+tokens).
+
+Usage:  python -m scripts.regrade [results_root] [--workers N] [--dry-run]
+"""
+
+from __future__ import annotations
+import argparse, json, os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from time import perf_counter
+
+import numpy as np
+
+CHUNK_FILES = 256
+
+
+# ───────────────────────────────────────────────────
+#  vectorised scoring
+# ───────────────────────────────────────────────────
+def _lines(text: str) -> list[str]:
+    return [ln.strip() for ln in text.splitlines() if ln.strip()]
+
+
+def _line_tokens(lines: list[str]) -> int:
+    return sum(2 * ln.count("|") + 1 for ln in lines)
+
+
+def score_trials(trials: list[dict]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    (seq_acc, tok_acc, flaw) for a list of trial dicts, computed together.
+    Equivalent to `grade_response` + `evaluate_token_sequences` per trial.
+    """
+    T = len(trials)
+    if T == 0:
+        empty = np.zeros(0)
+        return empty, empty, np.zeros(0, dtype=bool)
+
+    flaw    = np.zeros(T, dtype=bool)
+    exp_tok = np.zeros(T)
+    rsp_tok = np.zeros(T)
+
+    pair_trial: list[int] = []            # trial index of each compared line pair
+    r_tokens, r_len, c_tokens, c_len = [], [], [], []
+
+    for i, tr in enumerate(trials):
+        text = tr.get("response_text") or ""
+        resp = _lines(text)
+        corr = _lines(tr.get("expected_response_text") or "")
+
+        if len(set(resp)) != len(resp):
+            flaw[i] = True
+        if not text or not text[0].isalpha() or not (text[-1].isalpha() or text[-1] == "|"):
+            flaw[i] = True
+
+        n_exp, n_rsp = tr.get("expected_token_count"), tr.get("response_token_count")
+        exp_tok[i] = n_exp if n_exp is not None else _line_tokens(corr)
+        rsp_tok[i] = n_rsp if n_rsp is not None else _line_tokens(resp)
+
+        for r, c in zip(resp, corr):
+            rt, ct = r.split("|"), c.split("|")
+            r_tokens.extend(rt); r_len.append(len(rt))
+            c_tokens.extend(ct); c_len.append(len(ct))
+            pair_trial.append(i)
+
+    flaw |= (exp_tok - rsp_tok) > np.maximum(3, exp_tok * 0.25)
+
+    seq_acc = np.zeros(T)
+    tok_acc = np.zeros(T)
+    if pair_trial:
+        # intern every token string to an int id in one shot
+        _, ids = np.unique(np.asarray(r_tokens + c_tokens), return_inverse=True)
+        r_ids, c_ids = ids[:len(r_tokens)], ids[len(r_tokens):]
+        r_len, c_len = np.asarray(r_len), np.asarray(c_len)
+        P, W = len(pair_trial), int(max(r_len.max(), c_len.max()))
+
+        def _pad(flat, lengths, fill):
+            out  = np.full((P, W), fill, dtype=np.int64)
+            rows = np.repeat(np.arange(P), lengths)
+            cols = np.arange(len(flat)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+            out[rows, cols] = flat
+            return out
+
+        R = _pad(r_ids, r_len, -1)
+        C = _pad(c_ids, c_len, -2)        # different pads never match
+        common  = np.minimum(r_len, c_len)
+        tok_hit = ((R == C) & (np.arange(W) < common[:, None])).sum(axis=1)
+        seq_hit = (r_len == c_len) & (tok_hit == r_len)
+
+        owner   = np.asarray(pair_trial)
+        n_pairs = np.bincount(owner, minlength=T)
+        n_toks  = np.bincount(owner, weights=common, minlength=T)
+        seq_acc = np.divide(np.bincount(owner, weights=seq_hit, minlength=T), n_pairs,
+                            out=np.zeros(T), where=n_pairs > 0)
+        tok_acc = np.divide(np.bincount(owner, weights=tok_hit, minlength=T), n_toks,
+                            out=np.zeros(T), where=n_toks > 0)
+
+    seq_acc[flaw] = 0.0
+    tok_acc[flaw] = 0.0
+    return seq_acc, tok_acc, flaw
+
+
+# ───────────────────────────────────────────────────
+#  worker
+# ───────────────────────────────────────────────────
+def _regrade_chunk(paths: list[str], dry_run: bool = False) -> list[tuple]:
+    """Grade every trial in `paths`; return DB updates for the changed ones."""
+    docs, trials, owners = [], [], []
+    for p in paths:
+        try:
+            data = json.loads(Path(p).read_text())
+        except Exception as e:
+            print(f"[!] Error reading {p}: {e}")
+            continue
+        docs.append((p, data))
+        for tr in data.get("trials", []):
+            trials.append(tr)
+            owners.append(len(docs) - 1)
+
+    seq_acc, tok_acc, flaw = score_trials(trials)
+
+    updates, dirty = [], set()
+    for tr, owner, sa, ta, fl in zip(trials, owners, seq_acc, tok_acc, flaw):
+        new = (float(sa), float(ta), bool(fl))
+        old = (tr.get("sequence_accuracy"), tr.get("token_accuracy"),
+               bool(tr.get("major_format_flaw")))
+        if new == old:
+            continue
+        tr["sequence_accuracy"], tr["token_accuracy"], tr["major_format_flaw"] = new
+        dirty.add(owner)
+        updates.append((new[0], new[1], int(new[2]), docs[owner][1]["id"], tr["trial"]))
+
+    if not dry_run:
+        for owner in dirty:
+            p, data = docs[owner]
+            tmp = f"{p}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=2)
+            os.replace(tmp, p)
+    return updates
+
+
+# ───────────────────────────────────────────────────
+#  driver
+# ───────────────────────────────────────────────────
+def _write_db(updates: list[tuple]) -> None:
+    from core.db_utils import get_conn
+    conn = get_conn()
+    with conn:
+        conn.executemany(
+            "UPDATE trials SET seq_acc = ?, tok_acc = ?, flaw = ? "
+            "WHERE id = ? AND trial_idx = ?", updates)
+
+
+def regrade_all(root: str | Path | None = None, *, workers: int | None = None,
+                chunk_files: int = CHUNK_FILES, dry_run: bool = False,
+                update_db: bool = True) -> dict:
+    if root is None:
+        from config import RESULTS_ROOT
+        root = RESULTS_ROOT
+    t0    = perf_counter()
+    files = sorted(str(p) for p in Path(root).rglob("*.json"))
+    chunks = [files[i:i + chunk_files] for i in range(0, len(files), chunk_files)]
+
+    updates: list[tuple] = []
+    if len(chunks) <= 1 or workers == 1:
+        for ch in chunks:
+            updates.extend(_regrade_chunk(ch, dry_run))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for res in pool.map(_regrade_chunk, chunks, [dry_run] * len(chunks)):
+                updates.extend(res)
+
+    if updates and update_db and not dry_run:
+        _write_db(updates)
+
+    stats = {"files": len(files), "changed_trials": len(updates),
+             "elapsed_s": round(perf_counter() - t0, 2)}
+    print(f"✓ Regraded {stats['files']} files in {stats['elapsed_s']}s – "
+          f"{stats['changed_trials']} trials changed" + (" (dry run)" if dry_run else ""))
+    return stats
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Bulk re-grade saved results.")
+    ap.add_argument("root", nargs="?", default=None)
+    ap.add_argument("--workers", type=int, default=None)
+    ap.add_argument("--chunk-files", type=int, default=CHUNK_FILES)
+    ap.add_argument("--dry-run", action="store_true")
+    ap.add_argument("--no-db", action="store_true", help="only rewrite JSON files")
+    a = ap.parse_args()
+    regrade_all(a.root, workers=a.workers, chunk_files=a.chunk_files,
+                dry_run=a.dry_run, update_db=not a.no_db)
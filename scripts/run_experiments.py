@@ -1,15 +1,21 @@
-import json, importlib
+import json
 from datetime import datetime
 from pathlib import Path
 from time import perf_counter
-import os
-import uuid
-import time
 
-from .build_prompt           import build_prompt_for_all_keys
+from config                  import RESPONSE_CACHE_PATH
+from llm_providers           import make_provider
+from llm_providers.response_cache import ResponseCache
+from llm_providers.usage     import RunBudget, BudgetExceeded
+from .build_prompt           import build_prompt_for_all_keys, get_template
 from .helpers.eval           import evaluate_token_sequences
 from .helpers.token_utils    import build_single_token_vocab
-from .helpers.fact_gen       import generate_facts_k_tokens
+from .helpers.fact_gen       import generate_facts_k_tokens, trial_rng, new_seed
+from .async_executor         import run_grid
+from .batch_manager          import BatchManager
+from .trial_bank             import TrialBank
+from .run_journal            import RunJournal
+from .sequential             import SequentialRule
 
 def staircase_schedule(n0: int, k0: int,
                        n_max: int, k_max: int,
@@ -21,11 +27,19 @@ def staircase_schedule(n0: int, k0: int,
         n *= factor
         k *= factor
 
-def grade_response(response_text, question_keys_in_order, key_value_dict, *, tokenizer):
-    ### 
+def grade_response(response_text, question_keys_in_order, key_value_dict, *,
+                   tokenizer, batch_tokenizer=None):
+    """
+    tokenizer       : str -> token count
+    batch_tokenizer : list[str] -> list[int]; when given, every expected and
+                      response line is counted in one call (see
+                      `LLMProvider.count_tokens_batch`).
+    """
     correct_seqs = [key_value_dict[k] for k in question_keys_in_order]
     response_seqs = [ln.strip() for ln in response_text.splitlines() if ln.strip()]
 
+    major_format_flaw = False
+
     seen = set()
     for seq in response_seqs:
         if seq in seen:
@@ -34,16 +48,21 @@ def grade_response(response_text, question_keys_in_order, key_value_dict, *, tok
             break
         seen.add(seq)
 
-    expected_tokens = sum(tokenizer(seq) for seq in correct_seqs)
-    response_tokens = sum(tokenizer(seq) for seq in response_seqs)
-
-    major_format_flaw = False
+    if batch_tokenizer is not None:
+        counts = batch_tokenizer(correct_seqs + response_seqs)
+        expected_tokens = sum(counts[:len(correct_seqs)])
+        response_tokens = sum(counts[len(correct_seqs):])
+    else:
+        expected_tokens = sum(tokenizer(seq) for seq in correct_seqs)
+        response_tokens = sum(tokenizer(seq) for seq in response_seqs)
 
     diff = expected_tokens - response_tokens
     if diff > max(3, expected_tokens * 0.25):
         major_format_flaw = True
 
-    if not response_text[0].isalpha() or not (response_text[-1].isalpha() or response_text[-1] == '|'):
+    if not response_text:
+        major_format_flaw = True
+    elif not response_text[0].isalpha() or not (response_text[-1].isalpha() or response_text[-1] == '|'):
         print("first or last char not a-z or | at end")
         major_format_flaw = True
 
@@ -54,6 +73,143 @@ def grade_response(response_text, question_keys_in_order, key_value_dict, *, tok
         seq_acc, tok_acc = 0.0, 0.0
     return (seq_acc, tok_acc), major_format_flaw, expected_tokens, response_tokens
 
+def early_format_flaw(partial_text: str) -> bool:
+    """
+    True once a partial (streamed) answer is already guaranteed to be a
+    major format flaw under `grade_response`: the first visible character
+    is not a letter, or a finished line repeats an earlier one.
+    """
+    text = partial_text.lstrip()
+    if text and not text[0].isalpha():
+        return True
+    finished = [ln.strip() for ln in text.split("\n")[:-1] if ln.strip()]
+    return len(finished) != len(set(finished))
+
+def _prepare_trial(vocab, n, k, t, *, seed, template, bank=None, lazy=False):
+    """(prompt, keys, key→value, prompt tokens or None) – from the bank if given."""
+    if bank is not None:
+        bt = bank.get(n, k, t)
+        return bt.prompt, bt.keys, bt.kv, bt.prompt_tokens
+    rng          = trial_rng(seed, n, k, t)
+    facts, kv    = generate_facts_k_tokens(n, k, vocab, rng=rng)
+    prompt, keys = build_prompt_for_all_keys(facts, k=k, rng=rng,
+                                             template=template, lazy=lazy)
+    return prompt, keys, kv, None
+
+def _run_trial(llm, vocab, n, k, t, *, seed, template, timeout_sec, verbose, stream=False,
+               bank=None):
+    """generate (or fetch from the bank) → prompt → query → grade for one (N, K, trial)."""
+    prompt, keys, kv, prompt_tok = _prepare_trial(vocab, n, k, t, seed=seed,
+                                                  template=template, bank=bank)
+    cap_tok      = min(n * k + 100, llm.max_tokens)
+
+    if verbose:
+        print(f"[N={n} K={k} trial={t}]")
+
+    if prompt_tok is None:
+        prompt_tok = llm.count_tokens(prompt)
+
+    timing = {}
+    try:
+        if stream:
+            res = llm.query_stream(
+                prompt,
+                temperature=0.0,
+                max_tokens=cap_tok,
+                timeout=timeout_sec,
+                should_stop=early_format_flaw
+            )
+            answer, latency_ms, usage = res.text, res.total_ms, res.usage
+            timing = {
+                "ttft_ms": res.ttft_ms,
+                "decode_tok_per_s": res.decode_tok_per_s,
+                "completion_tokens": res.completion_tokens,
+                "cancelled_early": res.cancelled,
+            }
+            if res.cached:
+                timing["cached"] = True
+            if res.cancelled and verbose:
+                print(f"✂️ [N={n} K={k} trial={t}] cancelled after "
+                      f"{res.completion_tokens} tokens – format flaw already certain")
+        else:
+            t0 = perf_counter()
+            answer = llm.query(
+                prompt,
+                temperature=0.0,
+                max_tokens=cap_tok,
+                timeout=timeout_sec
+            )
+            latency_ms = (perf_counter() - t0) * 1_000
+            usage = llm.last_usage() if hasattr(llm, "last_usage") else None
+            cache = getattr(llm, "response_cache", None)
+            hit   = cache.last_hit() if cache else None
+            if hit is not None:          # replayed: keep the originally measured latency
+                latency_ms, usage = hit.get("latency_ms"), hit.get("usage")
+                timing = {"cached": True}
+    except BudgetExceeded:
+        return None                      # the run reports the budget once
+    except Exception as e:
+        # retries already happened in the provider's scheduler – an API error
+        # is not a model failure, so leave the trial unsaved for a re-run
+        print(f"⚠️ [N={n} K={k} trial={t}] not recorded: {e}")
+        return None
+
+    answer = "\n".join(line.strip() for line in answer.splitlines() if line.strip())
+    correct_text = "\n".join(kv[k] for k in keys)
+
+    (seq_acc, tok_acc), flaw, exp_ct, resp_ct = grade_response(
+        answer, keys, kv, tokenizer=llm.count_tokens,
+        batch_tokenizer=getattr(llm, "count_tokens_batch", None)
+    )
+
+    return {
+        "trial": t,
+        "seed": seed,
+        "sequence_accuracy": seq_acc,
+        "token_accuracy": tok_acc,
+        "major_format_flaw": flaw,
+        "response_time_ms": latency_ms,
+        "prompt_tokens": prompt_tok,
+        "prompt_text": prompt,
+        "response_text": answer,
+        "response_token_count": resp_ct,
+        "expected_response_text": correct_text,
+        "expected_token_count": exp_ct,
+        "usage": usage,                  # provider-reported ("estimated" on a cancelled stream);
+                                         # the original call's on a replay
+        "cost_usd": 0.0 if timing.get("cached") else _cost(llm, usage),
+        **timing,
+    }
+
+def _save_trial(llm, base_dir, prompt_id, n, k, record):
+    """Persist one trial as its own result file."""
+    # microseconds keep concurrent trials of the same cell from colliding
+    file_id = f"{llm.model_name}_{n}N_{k}K_{datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')}"
+    out_f   = base_dir / f"{file_id}.json"
+    grp = {
+        "id": file_id,
+        "prompt_id": prompt_id,
+        "provider": llm.provider_id,
+        "model": llm.model_name,
+        "num_facts": n,
+        "k": k,
+        "trials": [record]
+    }
+    with out_f.open("w", encoding="utf-8") as f:
+        json.dump(grp, f, indent=2)
+    return out_f.name
+
+def _is_flop(record):
+    return record["sequence_accuracy"] < 0.5 or record["major_format_flaw"]
+
+def _cost(llm, usage, *, batch=False):
+    """USD at the provider's price, None without one (or for non-LLMProvider backends)."""
+    return llm.cost(usage, batch=batch) if hasattr(llm, "cost") else None
+
+def _outcome(record):
+    """(flaw, sequence accuracy) – what the journal keeps for sequential tests."""
+    return bool(record["major_format_flaw"]), record["sequence_accuracy"]
+
 def run_experiments(
     provider_module: str,
     facts_list_sizes=[3, 6],
@@ -66,227 +222,323 @@ def run_experiments(
     early_abort=False,
     timeout_sec=60,
     max_tok_mult=2,
-    batch_size=20
+    batch_size=20,
+    concurrency=None,
+    max_batches_in_flight=4,
+    batch_timeout_sec=None,
+    stream=False,
+    seed=None,
+    bank=None,
+    response_cache=True,
+    cache_only=False,
+    model=None,
+    scheduler=None,
+    should_stop=None,
+    progress=None,
+    cells=None,
+    sequential=None,
+    budget=None
 ):
-    mod_path, cls_name = provider_module.rsplit(".", 1)
-    ProviderClass      = getattr(importlib.import_module(mod_path), cls_name)
-    llm                = ProviderClass()
-    vocab              = build_single_token_vocab(llm)
+    """
+    concurrency           : max in-flight trials for the non-batch path
+                            (None → the provider's `max_concurrency`).
+    max_batches_in_flight : open Batch-API jobs before submission blocks.
+    batch_timeout_sec     : stop waiting on open batches after this long;
+                            they are journaled, so a re-run picks them up.
+    stream                : stream completions (non-batch path) to record
+                            time-to-first-token / decode rate and cancel
+                            answers that are already a certain format flaw.
+    seed                  : run seed; trial (N, K, t) draws its facts and
+                            question order from SeedSequence([seed, N, K, t]).
+                            None picks a fresh one.  Stored in every trial
+                            record, so any prompt can be rebuilt exactly.
+    bank                  : path of a trial bank (scripts/trial_bank.py).
+                            Prompts, expected answers and prompt token
+                            counts come from the bank and its seed replaces
+                            `seed`; every requested cell must be in it.
+    response_cache        : True → the shared cache at RESPONSE_CACHE_PATH,
+                            a path or a `ResponseCache`, False → off.  Prompts
+                            already answered are replayed instead of sent.
+    cache_only            : replay mode – never call the API; trials whose
+                            answer is not cached are skipped (not recorded).
+    model                 : model name (None → the provider's default).
+    scheduler             : a `RequestScheduler` to share with other runs
+                            against the same account (see scripts/orchestrator).
+    should_stop           : () -> bool, polled before every trial / batch
+                            submission; True stops the run (resumable).
+    cells                 : explicit [(N, K), ...] to run instead of the
+                            facts_list_sizes × token_sizes grid (the
+                            frontier planner's probes).
+    progress              : (event, n_trials) callback – "planned" once with
+                            the trials this run waits for, then every
+                            journal "completed" / "failed" / "stopped" event.
+    sequential            : a `SequentialRule` (or its kwargs) – run each
+                            cell until its flaw-rate / sequence-accuracy
+                            test settles, with `trials` as the ceiling
+                            (scripts/sequential.py).  Replaces early_abort
+                            and uses the per-request path, since every
+                            decision needs the previous outcomes.
+    budget                : a `RunBudget` (or {"usd", "tokens"}) – every
+                            request reserves its worst case before it is
+                            sent; once one does not fit, nothing new is
+                            dispatched.  Share one object to cap a sweep.
+    """
+    if isinstance(sequential, dict):
+        sequential = SequentialRule(**sequential)
+    if isinstance(budget, dict):
+        budget = RunBudget(**budget)
+    llm                = make_provider(provider_module, model)
+    if concurrency:
+        llm.max_concurrency = concurrency      # also sizes the rate scheduler
+    if scheduler is not None:
+        llm.scheduler = scheduler
+    if response_cache is True:
+        response_cache = RESPONSE_CACHE_PATH
+    if response_cache is not False and response_cache is not None:
+        if not isinstance(response_cache, ResponseCache):
+            response_cache = ResponseCache(response_cache)
+        response_cache.cache_only = cache_only
+    else:
+        response_cache = None
+    llm.response_cache = response_cache
+    if budget is not None:
+        if budget.usd is not None and getattr(llm, "price", None) is None:
+            raise ValueError(f"no price known for {llm.provider_id}:{llm.model_name} – "
+                             "a dollar budget cannot be enforced (set a token budget)")
+        llm.budget  = budget
+        user_stop   = should_stop
+        should_stop = lambda: budget.exhausted or bool(user_stop and user_stop())
+    if cache_only and response_cache is None:
+        raise ValueError("cache_only needs a response cache")
+    template           = get_template()    # pinned for the whole run
 
-    safe_prompt_id = prompt_id.replace(" ", "_").replace("/", "_")
     base_dir = Path(output_root) / llm.provider_id
     base_dir.mkdir(parents=True, exist_ok=True)
+    journal  = RunJournal(base_dir, llm.model_name, prompt_id, on_event=progress)
 
-    existing_pairs = set()
-    for f in base_dir.glob(f"{llm.model_name}_*N_*K_*.json"):
-        try:
-            parts = f.stem.split('_')
-            n = int(parts[1][:-1])
-            k = int(parts[2][:-1])
-            existing_pairs.add((n, k))
-        except (IndexError, ValueError):
-            continue
+    if bank is not None:
+        bank  = TrialBank(bank, tokenizer_id=getattr(llm, "tokenizer_id", None))
+        seed  = bank.seed
+        vocab = None
+    else:
+        vocab = build_single_token_vocab(llm)
+        if seed is None:         # a resumed run keeps drawing from the same seed
+            seed = journal.seed if journal.seed is not None else new_seed()
 
-    if adaptive:
+    if cells is not None:
+        pairs   = list(dict.fromkeys((int(n), int(k)) for n, k in cells))
+    elif adaptive:
         n0, k0  = min(facts_list_sizes), min(token_sizes)
-        pairs   = staircase_schedule(n0, k0, max(facts_list_sizes), max(token_sizes))
+        pairs   = list(staircase_schedule(n0, k0, max(facts_list_sizes), max(token_sizes)))
+    else:
+        pairs   = [(n, k) for n in facts_list_sizes for k in token_sizes]
+    if sequential is not None:
+        pairs   = [p for p in pairs
+                   if journal.decided.get(p, {}).get("decision") != "stop"]
+    elif early_abort:
+        pairs   = [p for p in pairs if p not in journal.flops]
+
+    if bank is not None:
+        missing = set(pairs) - bank.cells()
+        if missing:
+            raise ValueError(f"cells {sorted(missing)} are not in the bank {bank.path}")
+
+    use_batch = (hasattr(llm, "queue_batch_request") and hasattr(llm, "submit_batch")
+                 and not cache_only)
+    if stream:
+        if not getattr(llm, "supports_streaming", False):
+            raise ValueError(f"{llm.provider_id} has no streaming mode")
+        use_batch = False        # streaming is per-request by nature
+    if sequential is not None:
+        use_batch = False        # each decision waits for the previous outcomes
+
+    if use_batch:
+        # re-attach to batches a previous run left open before planning
+        manager = BatchManager(
+            llm, base_dir,
+            collect=lambda results, stamp, batch_prompt: _collect_batch(
+                llm, base_dir, batch_prompt, results, stamp, journal=journal),
+            prompt_id=prompt_id,
+            max_in_flight=max_batches_in_flight,
+            verbose=verbose,
+            on_queued=lambda batch_id, items: journal.queued(items, batch_id),
+        )
+        in_batch = manager.pending_trials()
     else:
-        all_pairs = [(n, k) for n in facts_list_sizes for k in token_sizes]
-        pairs     = [p for p in all_pairs if p not in existing_pairs]
+        in_batch = set()
 
-    if not pairs:
+    # exactly the missing work: one dict lookup per trial
+    todo = journal.missing(pairs, trials, in_batch=in_batch)
+    if not todo:
+        if use_batch and manager.pending:
+            manager.drain(timeout_sec=batch_timeout_sec)
         print(f"✅ All experiments already completed in {base_dir}/")
         return
+    journal.planned(todo, seed=seed)
+    if progress is not None:   # open batches from earlier runs finish here too
+        progress("planned", len(todo) + len(in_batch & {(n, k, t) for n, k in pairs
+                                                         for t in range(trials)}))
+    todo_set = set(todo)
+    pairs    = list(dict.fromkeys((n, k) for n, k, _ in todo))
+
+    def run_trial(n, k, t):
+        journal.started(n, k, t)
+        rec = _run_trial(llm, vocab, n, k, t, seed=seed, template=template,
+                         timeout_sec=timeout_sec, verbose=verbose, stream=stream, bank=bank)
+        if rec is None and not (budget is not None and budget.exhausted):
+            journal.failed([(n, k, t)])
+        return rec
+
+    def save_trial(n, k, rec):
+        name = _save_trial(llm, base_dir, prompt_id, n, k, rec)
+        journal.completed(n, k, rec["trial"], file=name, flop=_is_flop(rec),
+                          outcome=_outcome(rec))
+
+    if not use_batch:
+        stats = run_grid(
+            pairs, trials,
+            run_trial   = run_trial,
+            save_trial  = save_trial,
+            is_flop     = _is_flop,
+            early_abort = early_abort and sequential is None,
+            max_in_flight = concurrency or getattr(llm, "max_concurrency", 1),
+            verbose     = verbose,
+            skip        = lambda n, k, t: (n, k, t) not in todo_set,
+            should_stop = should_stop,
+            sequential  = None if sequential is None else
+                          (lambda n, k: sequential.cell(journal.outcomes.get((n, k), {}).values())),
+            on_decision = lambda n, k, skipped, state:
+                          journal.stopped(n, k, [(n, k, t) for t in skipped], state),
+        )
+        if budget is not None and budget.exhausted:
+            return (f"💸 Budget reached after {stats['trials']} trials ({budget.describe()}) "
+                    "– raise it and re-run to continue.")
+        if should_stop is not None and should_stop():
+            return f"⏹️ Stopped after {stats['trials']} trials – re-run to resume."
+        settled = (f", {stats['stopped_cells']} cells settled early"
+                   if stats["stopped_cells"] else "")
+        return (f"✅ Finished {stats['trials']} trials "
+                f"({stats['trials_per_sec']} trials/s){settled}{_cache_note(llm)}. "
+                f"Results saved to {base_dir}/")
+
+    pending_batch = []  # store (n, k, t, prompt, meta) until we submit
+    out_of_budget = False
+
+    for n, k, t in todo:
+        if should_stop is not None and should_stop():
+            if budget is not None and budget.exhausted:
+                break               # what is already reserved still goes out
+            # unsent items are only "planned"; open batches stay journaled
+            if budget is not None:
+                for (_, _, _, _, meta) in pending_batch:
+                    budget.release(meta.get("reserved"))
+            return "⏹️ Stopped – re-run to resume (open batches are re-attached)."
+        # rendered only while the request file is written (bank: stored text)
+        prompt, keys, kv, prompt_tok = _prepare_trial(vocab, n, k, t, seed=seed,
+                                                      template=template, bank=bank, lazy=True)
+        cap_tok = min(n * k + 100, llm.max_tokens)
+        if response_cache and response_cache.key_for(llm, prompt, 0.0, cap_tok) \
+                in response_cache:
+            # already answered – replay now instead of paying for it again
+            rec = run_trial(n, k, t)
+            if rec:
+                save_trial(n, k, rec)
+            continue
 
-    use_batch = hasattr(llm, "queue_batch_request") and hasattr(llm, "submit_batch")
-    pending_batch = []  # store (n, k, t, prompt, meta) until we flush
-
-    for n, k in pairs:
-        for t in range(trials):
-            facts, kv    = generate_facts_k_tokens(n, k, vocab)
-            prompt, keys = build_prompt_for_all_keys(facts, k=k)
-            cap_tok      = min(n * k + 100, llm.max_tokens)
-
-            if use_batch:
-                meta = {
-                    "trial": t,
-                    "num_facts": n,
-                    "k": k,
-                    "keys": keys,
-                    "expected": kv,
-                    "prompt": prompt,
-                }
-                llm.queue_batch_request(prompt, meta, max_tokens=cap_tok)
-                pending_batch.append((n, k, t, prompt, meta))
-
-                # Flush if batch limit reached
-                if len(pending_batch) >= batch_size:
-                    flush_batch(llm, pending_batch, base_dir, prompt_id)
-                    pending_batch.clear()
-
-            else:
-                if verbose:
-                    print(f"[N={n} K={k} trial={t}]")
-
-                prompt_tok   = llm.count_tokens(prompt)
-                expected_tok = n * k
-
+        meta = {
+            "trial": t,
+            "seed": seed,
+            "num_facts": n,
+            "k": k,
+            "keys": keys,
+            "expected": kv,
+        }
+        if budget is not None:      # worst case at the batch price, settled on collection
+            if prompt_tok is None:
+                prompt_tok = llm.count_tokens(str(prompt))
+            need = (prompt_tok + cap_tok,
+                    _cost(llm, {"prompt_tokens": prompt_tok, "completion_tokens": cap_tok},
+                          batch=True))
+            try:
+                meta["reserved"] = budget.reserve(*need, wait=False)
+            except BudgetExceeded:
+                out_of_budget = True
+                if budget.exhausted:
+                    break
+                # open batches hold worst-case reservations – collect them, retry once
+                manager.submit(pending_batch)
+                pending_batch = []
+                manager.drain(timeout_sec=batch_timeout_sec)
                 try:
-                    t0 = perf_counter()
-                    answer = llm.query(
-                        prompt,
-                        temperature=0.0,
-                        max_tokens=cap_tok,
-                        timeout=timeout_sec
-                    )
-                    latency_ms = (perf_counter() - t0) * 1_000
-                except Exception as e:
-                    answer, latency_ms = f"ERROR: {e}", None
-                    if verbose: print("⚠️", e)
-
-                answer = "\n".join(line.strip() for line in answer.splitlines() if line.strip())
-                correct_text = "\n".join(kv[k] for k in keys)
-
-                (seq_acc, tok_acc), flaw, exp_ct, resp_ct = grade_response(
-                    answer, keys, kv, tokenizer=llm.count_tokens
-                )
-
-                file_id = f"{llm.model_name}_{n}N_{k}K_{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}"
-                out_f   = base_dir / f"{file_id}.json"
-                grp = {
-                    "id": file_id,
-                    "prompt_id": prompt_id,
-                    "provider": llm.provider_id,
-                    "model": llm.model_name,
-                    "num_facts": n,
-                    "k": k,
-                    "trials": [{
-                        "trial": t,
-                        "sequence_accuracy": seq_acc,
-                        "token_accuracy": tok_acc,
-                        "major_format_flaw": flaw,
-                        "response_time_ms": latency_ms,
-                        "prompt_tokens": prompt_tok,
-                        "prompt_text": prompt,
-                        "response_text": answer,
-                        "response_token_count": resp_ct,
-                        "expected_response_text": correct_text,
-                        "expected_token_count": exp_ct,
-                    }]
-                }
-                with out_f.open("w", encoding="utf-8") as f:
-                    json.dump(grp, f, indent=2)
-
-                if early_abort and (seq_acc < 0.5 or flaw):
-                    if verbose: print("⏹️ early abort for this (N,K)")
+                    meta["reserved"] = budget.reserve(*need, wait=False)
+                    out_of_budget = False
+                except BudgetExceeded:
                     break
+        pending_batch.append((n, k, t, prompt, meta))
+
+        # Submit if batch limit reached; earlier batches keep running
+        if len(pending_batch) >= batch_size:
+            manager.submit(pending_batch)
+            pending_batch = []
+            manager.poll()
 
-    # Final batch flush
-    if use_batch and pending_batch:
-        flush_batch(llm, pending_batch, base_dir, prompt_id)
-        pending_batch.clear()
+    manager.submit(pending_batch)
+    manager.drain(timeout_sec=batch_timeout_sec)
 
-    return f"✅ Finished. Results saved to {base_dir}/"
+    if out_of_budget or (budget is not None and budget.exhausted):
+        return (f"💸 Budget reached ({budget.describe()}) – submitted work was collected; "
+                "raise it and re-run to continue.")
+    return f"✅ Finished{_cache_note(llm)}. Results saved to {base_dir}/"
 
-MAX_MB = 100
-MAX_BYTES = MAX_MB * 1024 * 1024   # 100 MB hard limit (OpenAI batch)
+def _cache_note(llm) -> str:
+    cache = getattr(llm, "response_cache", None)
+    if cache is None:
+        return ""
+    st = cache.stats()
+    return f", response cache {st['hits']} hits / {st['misses']} misses"
 
 def flush_batch(llm, batch_items, base_dir, prompt_id):
     """
-    Write `batch_items` (list of tuples) to a JSONL file, ensuring the file
-    is ≤100 MB.  If it would be larger, recursively split the list and submit
-    smaller batches.
+    Submit `batch_items` [(n, k, t, prompt, meta), ...] and block until the
+    results are graded and saved.  Kept for notebook use – `run_experiments`
+    pipelines several batches through `BatchManager` instead.
     """
-    # --- helper to write a temp JSONL and return byte size ----------
-    def _write_jsonl(path, items):
-        with open(path, "w", encoding="utf-8") as f:
-            for (_, _, _, prompt, meta) in items:
-                f.write(json.dumps({
-                    "custom_id": str(uuid.uuid4()),
-                    "method": "POST",
-                    "url": "/v1/chat/completions",
-                    "body": {
-                        "model": llm.model_name,
-                        "messages": [{"role": "user", "content": prompt}],
-                        "temperature": 0,
-                        "max_tokens": min(meta["num_facts"]*meta["k"] + 100,
-                                          llm.max_tokens)
-                    }
-                }) + "\n")
-        return os.path.getsize(path)
-
-    # ----------------------------------------------------------------
-    if not batch_items:
-        return
+    manager = BatchManager(
+        llm, base_dir,
+        collect=lambda results, stamp, batch_prompt: _collect_batch(
+            llm, base_dir, batch_prompt, results, stamp),
+        prompt_id=prompt_id,
+    )
+    manager.submit(batch_items)
+    manager.drain(timeout_sec=3600)
 
-    tmp_path = os.path.join(base_dir, "_tmp_batch_input.jsonl")
-    byte_size = _write_jsonl(tmp_path, batch_items)
 
-    if byte_size > MAX_BYTES:
-        mid = len(batch_items) // 2
-        print(f"⚠️ Batch {byte_size/1e6:.1f} MB exceeds {MAX_MB} MB – splitting")
-        flush_batch(llm, batch_items[:mid], base_dir, prompt_id)
-        flush_batch(llm, batch_items[mid:], base_dir, prompt_id)
-        os.remove(tmp_path)
-        return
+def _collect_batch(llm, base_dir, prompt_id, results, stamp, *, journal=None):
+    """Grade one finished batch and write one result file per (N, K)."""
+    batch_tokenizer = getattr(llm, "count_tokens_batch", None)
+    prompt_toks = (batch_tokenizer([p for _, p, _ in results]) if batch_tokenizer
+                   else [llm.count_tokens(p) for _, p, _ in results])
 
-    # ---------- safe to submit --------------------------------------
-    # upload the temp file
-    input_file = llm._client.files.create(file=open(tmp_path, "rb"),
-                                          purpose="batch")
-    batch = llm._client.batches.create(
-        input_file_id=input_file.id,
-        endpoint="/v1/chat/completions",
-        completion_window="24h"
-    )
-    print(f"🔁 Batch ID {batch.id}  ({byte_size/1e6:.1f} MB) submitted")
-    os.remove(tmp_path)  # local temp no longer needed
-
-    # ---------- wait -------------------------------------------------
-    start = time.time()
-    while batch.status not in {"completed", "failed", "cancelled"}:
-        if time.time() - start > 3600:         # 1 h guard
-            raise TimeoutError("Batch polling timed-out")
-        time.sleep(10)
-        batch = llm._client.batches.retrieve(batch.id)
-
-    if batch.status != "completed":
-        reason = getattr(batch, "failed_reason", None)
-        if reason:
-            raise RuntimeError(f"Batch failed early: {reason}")
-        if getattr(batch, "error_file_id", None):
-            err_path = os.path.join(base_dir, f"errors_{batch.id}.jsonl")
-            with open(err_path, "wb") as fh:
-                fh.write(llm._client.files.content(batch.error_file_id).read())
-            raise RuntimeError(
-                f"Batch failed during execution. "
-                f"Error file saved → {err_path}")
-        raise RuntimeError("Batch failed for unknown reason")
-
-
-
-    # ---------- download & grade ------------------------------------
-    output_file_id = batch.output_file_id
-    stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S")
-    result_path = os.path.join(base_dir, f"batch_output_{stamp}.jsonl")
-    with open(result_path, "wb") as f_out:
-        f_out.write(llm._client.files.content(output_file_id).read())
-
-    # parse & record (same logic as before) ---------------------------
-    with open(result_path, "r", encoding="utf-8") as f_in:
-        responses = [json.loads(l) for l in f_in]
-
-    assert len(responses) == len(batch_items)
     grouped = {}
-    for (n, k, t, prompt, meta), response in zip(batch_items, responses):
-        answer = _extract_answer(response)
-        correct_text = "\n".join(meta["expected"][k] for k in meta["keys"])
+    cache  = getattr(llm, "response_cache", None)
+    budget = getattr(llm, "budget", None)
+    for (meta, prompt, answer), prompt_tok in zip(results, prompt_toks):
+        n, k, t = meta["num_facts"], meta["k"], meta["trial"]
+        usage   = meta.get("usage")
+        cost    = _cost(llm, usage, batch=True)
+        if budget is not None:          # no usage reported → keep the reserved amount
+            budget.settle(meta.get("reserved"),
+                          None if usage is None else
+                          usage["prompt_tokens"] + usage["completion_tokens"], cost)
+        if cache is not None:            # same cap as the request body (BatchManager)
+            cache.put(cache.key_for(llm, prompt, 0.0, min(n * k + 100, llm.max_tokens)),
+                      answer, {"latency_ms": None, "batch": True, "usage": usage})
+        correct_text = "\n".join(meta["expected"][key] for key in meta["keys"])
         (seq_acc, tok_acc), flaw, exp_ct, resp_ct = grade_response(
             answer, meta["keys"], meta["expected"],
-            tokenizer=llm.count_tokens
+            tokenizer=llm.count_tokens, batch_tokenizer=batch_tokenizer
         )
-        key = (n, k)
-        grouped.setdefault(key, {
+        grouped.setdefault((n, k), {
             "id": f"{llm.model_name}_{n}N_{k}K_{stamp}",
             "prompt_id": prompt_id,
             "provider": llm.provider_id,
@@ -296,39 +548,53 @@ def flush_batch(llm, batch_items, base_dir, prompt_id):
             "trials": []
         })["trials"].append({
             "trial": t,
+            "seed": meta.get("seed"),        # absent in journals from older runs
             "sequence_accuracy": seq_acc,
             "token_accuracy": tok_acc,
             "major_format_flaw": flaw,
             "response_time_ms": None,
-            "prompt_tokens": llm.count_tokens(prompt),
+            "prompt_tokens": prompt_tok,
             "prompt_text": prompt,
             "response_text": answer,
             "response_token_count": resp_ct,
             "expected_response_text": correct_text,
             "expected_token_count": exp_ct,
+            "usage": usage,
+            "cost_usd": cost,
+            "batch": True,
         })
 
     for (n, k), grp in grouped.items():
-        out_f = base_dir / f"{grp['id']}.json"
+        out_f = Path(base_dir) / f"{grp['id']}.json"
         with out_f.open("w", encoding="utf-8") as fh:
             json.dump(grp, fh, indent=2)
+        if journal is not None:
+            for rec in grp["trials"]:
+                journal.completed(n, k, rec["trial"], file=out_f.name, flop=_is_flop(rec),
+                                  outcome=_outcome(rec))
         print(f"📦 Saved batch results to {out_f}")
 
 
-def _extract_answer(resp_obj):
-    """
-    Extract assistant text or an error string from one Batch-API
-    output line (already json-loaded).
-    """
-    # Hard error at top level
-    if resp_obj.get("error"):
-        return f"ERROR: {resp_obj['error']}"
-
-    resp = resp_obj.get("response", {})
-    if resp.get("status_code") != 200:
-        return f"ERROR: status {resp.get('status_code')} – {resp.get('body')}"
-
-    try:
-        return resp["body"]["choices"][0]["message"]["content"].strip()
-    except Exception as e:
-        return f"ERROR: malformed completion – {e}"
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(description="Run a grid of experiments for one provider.")
+    ap.add_argument("provider", help="registry label or dotted class path")
+    ap.add_argument("--n", default="3,6", help="comma-separated N values")
+    ap.add_argument("--k", default="2,3", help="comma-separated K values")
+    ap.add_argument("--trials", type=int, default=1)
+    ap.add_argument("--seed", type=int, default=None)
+    ap.add_argument("--bank", default=None, help="trial bank to run from")
+    ap.add_argument("--prompt-id", default="default_prompt")
+    ap.add_argument("--output-root", default="results")
+    ap.add_argument("--no-cache", action="store_true", help="always call the API")
+    ap.add_argument("--cache-only", action="store_true",
+                    help="replay cached answers only; never call the API")
+    ap.add_argument("--sequential", choices=("wilson", "sprt"), default=None,
+                    help="stop each cell once its outcome is clear (--trials is the ceiling)")
+    a = ap.parse_args()
+    print(run_experiments(a.provider,
+                          [int(x) for x in a.n.split(",")], [int(x) for x in a.k.split(",")],
+                          a.trials, output_root=a.output_root, prompt_id=a.prompt_id,
+                          seed=a.seed, bank=a.bank,
+                          response_cache=not a.no_cache, cache_only=a.cache_only,
+                          sequential=a.sequential and SequentialRule(method=a.sequential)))
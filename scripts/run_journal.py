@@ -0,0 +1,174 @@
+"""
+scripts/run_journal.py
+──────────────────────
+Trial-granular, append-only record of what a provider folder has run.
+
+`run_journal.jsonl` (next to `batch_journal.jsonl`) gets one line per
+event:
+
+    planned    – the (N, K, trial)s a run intends to do
+    started    – a trial is in flight
+    queued     – a trial is sitting in a Batch-API job
+    completed  – its result file is on disk
+    failed     – nothing was recorded (API error, batch error…)
+    stopped    – sequential testing settled a cell; its remaining trials
+                 are not needed (scripts/sequential.py)
+
+Replaying the file gives the latest state of every
+(model, prompt_id, N, K, trial), so a restarted run checks each trial
+with one dict lookup and does exactly the missing work.  A folder from
+before the journal is backfilled once from its result files.
+"""
+
+from __future__ import annotations
+import json, os, threading
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Callable
+
+JOURNAL_NAME = "run_journal.jsonl"
+DONE_STATES  = {"completed"}
+
+# one lock per file: several models of a provider share its journal
+_LOCKS: dict[Path, threading.Lock] = {}
+_LOCKS_GUARD = threading.Lock()
+
+
+def _file_lock(path: Path) -> threading.Lock:
+    with _LOCKS_GUARD:
+        return _LOCKS.setdefault(path.resolve(), threading.Lock())
+
+
+class RunJournal:
+    """State of every trial of one (model, prompt_id) in a provider folder."""
+
+    def __init__(self, base_dir: str | Path, model: str, prompt_id: str, *,
+                 on_event: Callable[[str, int], None] | None = None):
+        self.base_dir  = Path(base_dir)
+        self.model     = model
+        self.prompt_id = prompt_id
+        self.path      = self.base_dir / JOURNAL_NAME
+        self._lock     = _file_lock(self.path)
+        self.on_event  = on_event      # (event, n_trials) after each non-"planned" append
+        self.state: dict[tuple[int, int, int], str] = {}
+        self.flops: set[tuple[int, int]] = set()        # cells with a recorded flop
+        # (N, K) → {trial: (flaw, sequence_accuracy)} of completed trials
+        self.outcomes: dict[tuple[int, int], dict[int, tuple[bool, float]]] = {}
+        self.decided: dict[tuple[int, int], dict] = {}  # latest "stopped" decision per cell
+        self.seed: int | None = None                    # seed of the latest plan
+        with self._lock:
+            if not self.path.exists():
+                self._backfill()
+        self._replay()
+
+    # ------------------------------------------------------------------
+    # replay
+    # ------------------------------------------------------------------
+    def _apply(self, rec: dict) -> None:
+        if (rec.get("model"), rec.get("prompt_id")) != (self.model, self.prompt_id):
+            return
+        if rec["event"] == "planned" and rec.get("seed") is not None:
+            self.seed = rec["seed"]
+        if rec["event"] == "stopped":
+            self.decided[tuple(rec["cell"])] = rec["decision"]
+            return
+        for i, (n, k, t) in enumerate(rec["trials"]):
+            key = (n, k, t)
+            if rec["event"] == "planned":
+                self.state.setdefault(key, "planned")
+            elif self.state.get(key) != "completed":     # completed is final
+                self.state[key] = rec["event"]
+            if rec["event"] == "completed" and rec.get("flop"):
+                self.flops.add((n, k))
+            if rec["event"] == "completed" and rec.get("outcomes"):
+                flaw, seq = rec["outcomes"][i]
+                self.outcomes.setdefault((n, k), {})[t] = (flaw, seq)
+
+    def _replay(self) -> None:
+        with self.path.open(encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except json.JSONDecodeError:
+                    continue                    # torn last line after a crash
+                self._apply(rec)
+
+    def _backfill(self) -> None:
+        """One-time import of trials already saved as result files."""
+        recs = []
+        for f in sorted(self.base_dir.glob("*.json")):
+            try:
+                grp = json.loads(f.read_text(encoding="utf-8"))
+                recs.append({
+                    "event": "completed", "model": grp["model"],
+                    "prompt_id": grp.get("prompt_id", "default_prompt"),
+                    "trials": [[grp["num_facts"], grp["k"], tr.get("trial", i)]
+                               for i, tr in enumerate(grp["trials"])],
+                    "outcomes": [[bool(tr["major_format_flaw"]), tr["sequence_accuracy"]]
+                                 for tr in grp["trials"]],
+                    # one file is one (n, k) cell; same test as run_experiments._is_flop
+                    "flop": any(tr["sequence_accuracy"] < 0.5 or tr["major_format_flaw"]
+                                for tr in grp["trials"]),
+                    "file": f.name, "backfilled": True,
+                })
+            except (OSError, ValueError, KeyError, TypeError):
+                continue
+        self.base_dir.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        with tmp.open("w", encoding="utf-8") as fh:
+            for rec in recs:
+                fh.write(json.dumps(rec) + "\n")
+        os.replace(tmp, self.path)
+
+    # ------------------------------------------------------------------
+    # writes
+    # ------------------------------------------------------------------
+    def _append(self, event: str, trials, *, sync: bool = False, **extra) -> None:
+        rec = {"ts": datetime.utcnow().isoformat(timespec="seconds"), "event": event,
+               "model": self.model, "prompt_id": self.prompt_id,
+               "trials": [list(x) for x in trials], **extra}
+        with self._lock:
+            with self.path.open("a", encoding="utf-8") as f:
+                f.write(json.dumps(rec) + "\n")
+                if sync:                        # states that stop a re-run from re-paying
+                    f.flush()
+                    os.fsync(f.fileno())
+            self._apply(rec)
+        if self.on_event is not None and event != "planned":   # the runner reports its own total
+            self.on_event(event, len(rec["trials"]))
+
+    def planned(self, trials, *, seed: int | None = None) -> None:
+        self._append("planned", trials, seed=seed)
+
+    def started(self, n: int, k: int, t: int) -> None:
+        self._append("started", [(n, k, t)])
+
+    def queued(self, trials, batch_id: str) -> None:
+        self._append("queued", trials, sync=True, batch_id=batch_id)
+
+    def completed(self, n: int, k: int, t: int, *, file: str, flop: bool = False,
+                  outcome: tuple[bool, float] | None = None) -> None:
+        extra = {"outcomes": [list(outcome)]} if outcome is not None else {}
+        self._append("completed", [(n, k, t)], sync=True, file=file, flop=flop, **extra)
+
+    def stopped(self, n: int, k: int, skipped, decision: dict) -> None:
+        """Cell (n, k) is settled; `skipped` are the planned trials it no longer needs."""
+        self._append("stopped", skipped, cell=[n, k], decision=decision)
+
+    def failed(self, trials, reason: str = "") -> None:
+        self._append("failed", trials, reason=reason[:200])
+
+    # ------------------------------------------------------------------
+    # queries
+    # ------------------------------------------------------------------
+    def is_done(self, n: int, k: int, t: int) -> bool:
+        return self.state.get((n, k, t)) in DONE_STATES
+
+    def missing(self, pairs, trials: int, *, in_batch=frozenset()) -> list[tuple[int, int, int]]:
+        """Trials of `pairs` × range(trials) neither completed nor in an open batch."""
+        return [(n, k, t) for n, k in pairs for t in range(trials)
+                if not self.is_done(n, k, t) and (n, k, t) not in in_batch]
+
+    def summary(self) -> Counter:
+        return Counter(self.state.values())
@@ -0,0 +1,135 @@
+"""
+scripts/sequential.py
+─────────────────────
+Per-cell sequential stopping: after each trial of an (N, K) cell, decide
+whether its outcome is already clear or whether it needs another trial
+(up to the run's `trials`, the ceiling).
+
+Two metrics are tested, each as a [0, 1] mean per trial:
+
+    flaw rate          major format flaw, against `threshold`
+    sequence accuracy  against `seq_threshold` (the flop line)
+
+Methods
+    wilson  Wilson score interval at `confidence`.  A metric is settled
+            when its interval excludes the threshold ("above" / "below")
+            or is at most `width` wide ("precise").
+    sprt    Wald's sequential probability ratio test of
+            p = threshold − delta  vs  p = threshold + delta
+            with error rates alpha / beta.
+
+A cell stops once both metrics are settled, so clear-cut cells use
+`min_trials` and the budget goes to cells near a boundary.  Every trial
+record carries the cell's test state after it (`record["sequential"]`);
+the journal keeps each cell's final decision.
+"""
+
+from __future__ import annotations
+import math
+from dataclasses import dataclass, field
+from statistics import NormalDist
+
+from core.summary import FLAW_THRESHOLD
+
+METHODS = ("wilson", "sprt")
+
+
+def wilson(mean: float, n: int, confidence: float = 0.95) -> tuple[float, float]:
+    """Wilson score interval for a mean of n values in [0, 1]."""
+    if n == 0:
+        return 0.0, 1.0
+    z      = NormalDist().inv_cdf(0.5 + confidence / 2)
+    denom  = 1 + z * z / n
+    centre = (mean + z * z / (2 * n)) / denom
+    half   = z * math.sqrt(mean * (1 - mean) / n + z * z / (4 * n * n)) / denom
+    return max(0.0, centre - half), min(1.0, centre + half)
+
+
+@dataclass(frozen=True)
+class SequentialRule:
+    method: str = "wilson"
+    min_trials: int = 3
+    confidence: float = 0.95          # wilson
+    width: float = 0.3                # wilson: "precise" interval width
+    threshold: float = FLAW_THRESHOLD # flaw-rate boundary
+    seq_threshold: float = 0.5        # sequence-accuracy boundary
+    delta: float = 0.15               # sprt: indifference half-width
+    alpha: float = 0.05               # sprt: P(decide "above" | below)
+    beta: float = 0.05                # sprt: P(decide "below" | above)
+
+    def __post_init__(self):
+        if self.method not in METHODS:
+            raise ValueError(f"unknown sequential method {self.method!r} (one of {METHODS})")
+
+    def cell(self, outcomes=()) -> "CellTest":
+        """A test seeded with (flaw, sequence_accuracy) pairs already recorded."""
+        test = CellTest(self)
+        for flaw, seq in outcomes:
+            test.add(flaw, seq)
+        return test
+
+
+@dataclass
+class CellTest:
+    rule: SequentialRule
+    flaws: list[float] = field(default_factory=list)
+    seqs: list[float] = field(default_factory=list)
+
+    @property
+    def n(self) -> int:
+        return len(self.flaws)
+
+    def add(self, flaw, seq_acc) -> None:
+        self.flaws.append(float(bool(flaw)))
+        self.seqs.append(float(seq_acc))
+
+    def add_record(self, record: dict) -> None:
+        self.add(record["major_format_flaw"], record["sequence_accuracy"])
+
+    # -------- per-metric verdicts --------
+    def _wilson(self, xs: list[float], thr: float) -> dict:
+        lo, hi = wilson(sum(xs) / len(xs), len(xs), self.rule.confidence)
+        verdict = ("above" if lo > thr else "below" if hi < thr else
+                   "precise" if hi - lo <= self.rule.width else None)
+        return {"mean": round(sum(xs) / len(xs), 4), "ci": [round(lo, 4), round(hi, 4)],
+                "verdict": verdict}
+
+    def _sprt(self, xs: list[float], thr: float) -> dict:
+        r  = self.rule
+        p0 = min(max(thr - r.delta, 1e-3), 1 - 1e-3)
+        p1 = min(max(thr + r.delta, 1e-3), 1 - 1e-3)
+        llr = sum(x * math.log(p1 / p0) + (1 - x) * math.log((1 - p1) / (1 - p0)) for x in xs)
+        upper, lower = math.log((1 - r.beta) / r.alpha), math.log(r.beta / (1 - r.alpha))
+        verdict = "above" if llr >= upper else "below" if llr <= lower else None
+        return {"mean": round(sum(xs) / len(xs), 4), "llr": round(llr, 4), "verdict": verdict}
+
+    def state(self, ceiling: int) -> dict:
+        """
+        The test after the trials so far: decision "stop" (both metrics
+        settled), "ceiling" (out of trials, unsettled) or "continue".
+        """
+        r = self.rule
+        if not self.n:
+            return {"method": r.method, "trials": 0, "decision": "continue"}
+        test    = self._wilson if r.method == "wilson" else self._sprt
+        metrics = {"flaw_rate": test(self.flaws, r.threshold),
+                   "sequence_accuracy": test(self.seqs, r.seq_threshold)}
+        settled = all(m["verdict"] for m in metrics.values())
+        if settled and self.n >= r.min_trials:
+            decision = "stop"
+        elif self.n >= ceiling:
+            decision = "ceiling"
+        else:
+            decision = "continue"
+        if r.method == "wilson":
+            confidence = r.confidence
+        else:       # a wrong "above" has probability alpha, a wrong "below" beta
+            confidence = 1 - max((r.alpha if m["verdict"] == "above" else r.beta)
+                                 for m in metrics.values() if m["verdict"]) \
+                if any(m["verdict"] for m in metrics.values()) else None
+        return {"method": r.method, "trials": self.n, "decision": decision,
+                "confidence": confidence, **metrics}
+
+    def wave(self) -> int:
+        """How many trials to start next: up to min_trials at once, then one by one."""
+        return max(1, self.rule.min_trials - self.n)
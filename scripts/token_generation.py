@@ -21,7 +21,11 @@ def generate_alpha_tokens(
     min_len: int = 2,
     max_len: int = 10,
 ) -> Set[str]:
-    """Return *N* lowercase strings, each exactly **one** token."""
+    """
+    Return *N* lowercase strings, each exactly **one** token, by probing
+    `encode`.  For tiktoken encodings prefer `alpha_tokens_from_encoding`,
+    which reads the token table directly.
+    """
     assert 1 <= min_len <= max_len
 
     tokens: Set[str] = set()
@@ -46,6 +50,45 @@ def generate_alpha_tokens(
     return tokens
 
 
+# ───────────────────────────────────────────────────
+#  tiktoken shortcut – one pass over the token table
+# ───────────────────────────────────────────────────
+def alpha_tokens_from_encoding(
+    enc,
+    N: int,
+    *,
+    alphabet: str = "abcdefghijklmnopqrstuvwxyz",
+    min_len: int = 2,
+    max_len: int = 10,
+) -> Set[str]:
+    """
+    Same result set as `generate_alpha_tokens` (shortest first, then
+    alphabetical) but read straight off a tiktoken `Encoding`: every id is
+    decoded once with `decode_single_token_bytes`, so the cost is O(vocab)
+    instead of O(len(alphabet) ** max_len).
+    """
+    assert 1 <= min_len <= max_len
+    pattern = re.compile(f"[{re.escape(alphabet)}]{{{min_len},{max_len}}}")
+
+    candidates: list[tuple[str, int]] = []
+    for tid in range(enc.n_vocab):
+        try:
+            s = enc.decode_single_token_bytes(tid).decode("ascii")
+        except (KeyError, UnicodeDecodeError):     # unused id / non-ASCII bytes
+            continue
+        if pattern.fullmatch(s):
+            candidates.append((s, tid))
+
+    # a token that BPE would split differently on its own is not usable
+    strings = [s for s, _ in candidates]
+    encoded = enc.encode_ordinary_batch(strings)
+    single  = sorted((s for (s, tid), ids in zip(candidates, encoded) if ids == [tid]),
+                     key=lambda s: (len(s), s))
+    if len(single) < N:
+        raise ValueError(f"Only {len(single)} tokens found (<{N}).")
+    return set(single[:N])
+
+
 # ───────────────────────────────────────────────────
 #  DeepSeek / SentencePiece shortcut
 # ───────────────────────────────────────────────────
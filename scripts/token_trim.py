@@ -3,43 +3,163 @@ scripts/token_trim.py
 ─────────────────────
 Ensure a single-token vocabulary stays single when surrounded or
 concatenated with a separator (*e.g.*, '|').
+
+How the sequence rule is checked
+────────────────────────────────
+'|t1|t2|…|tL|' can only tokenize differently from its parts if some
+tokenizer piece *bridges* a separator – contains separator characters
+and something else, e.g. 'ab|' or 'a|b'.  Splitting a bridge on its
+separator runs gives the context it needs:
+
+    'x|y'     → a token ending in 'x' followed by one starting with 'y'
+    'x|ab|y'  → …ending in 'x', then exactly 'ab', then …starting with 'y'
+
+so only those sequences (up to length L) are encoded, not every
+combination.  Without the tokenizer's pieces we fall back to the old
+exhaustive check.  A random sample of ordinary sequences is encoded as
+well, as a guard for tokenizers where this boundary argument does not
+hold.  All encoding happens in batches, across processes when `encode`
+can be pickled, and each stage only tests tokens that survived the
+previous one.
 """
 
 from __future__ import annotations
-import json, itertools
-from collections import Counter
-from typing import Callable, Sequence, List
+import json, itertools, pickle, random, re
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Iterable, Iterator, Sequence, List
 
 DEFAULT_SEP = "|"
+BATCH = 4096
 
 
 # ───────────────────────────────────────────────────
 #  helpers
 # ───────────────────────────────────────────────────
-def _single_tokens(path: str, encode: Callable[[str], Sequence[int]]) -> List[str]:
-    with open(path) as f:
-        vocab = json.load(f)
-    return [t for t in vocab if len(encode(t)) == 1]
-
-
 def _seq_expected_len(seq_len: int, sep_len: int) -> int:
     return seq_len + (seq_len + 1) * sep_len
 
 
+def _wrap(seq: Sequence[str], separator: str) -> str:
+    return separator + separator.join(seq) + separator
+
+
+# ---- batched / multi-process encoding ------------
+_ENCODE: Callable | None = None
+
+
+def _init_worker(encode) -> None:
+    global _ENCODE
+    _ENCODE = encode
+
+
+def _encode_lengths(strings: list[str]) -> list[int]:
+    return [len(_ENCODE(s)) for s in strings]
+
+
+def _make_pool(encode, workers: int | None) -> ProcessPoolExecutor | None:
+    """A pool that holds `encode` in every worker, or None to stay in-process."""
+    if workers == 1:
+        return None
+    try:
+        pickle.dumps(encode)
+    except Exception:                          # lambdas etc.
+        return None
+    return ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                               initargs=(encode,))
+
+
+def _lengths(strings: Sequence[str], encode, pool: ProcessPoolExecutor | None = None) -> list[int]:
+    """len(encode(s)) for every string, in batches spread over `pool`."""
+    strings = list(strings)
+    if pool is None or len(strings) <= BATCH:
+        return [len(encode(s)) for s in strings]
+    batches = [strings[i:i + BATCH] for i in range(0, len(strings), BATCH)]
+    return [n for out in pool.map(_encode_lengths, batches) for n in out]
+
+
+# ---- boundary analysis ----------------------------
+def token_pieces(tokenizer) -> list[str]:
+    """Every piece of a tiktoken `Encoding` or a HF tokenizer, as text."""
+    if hasattr(tokenizer, "decode_single_token_bytes"):          # tiktoken
+        out = []
+        for tid in range(tokenizer.n_vocab):
+            try:
+                out.append(tokenizer.decode_single_token_bytes(tid).decode("utf-8", "replace"))
+            except KeyError:
+                pass
+        return out
+    ids = sorted(tokenizer.get_vocab().values())                  # transformers
+    return tokenizer.batch_decode([[i] for i in ids])
+
+
+def _bridges(pieces: Iterable[str], separator: str) -> list[list[str]]:
+    """Pieces containing separator characters plus anything else, split on the separator runs."""
+    sep_chars = set(separator)
+    split = re.compile(f"[{re.escape(''.join(sep_chars))}]+")
+    out = []
+    for p in set(pieces):
+        if sep_chars & set(p) and set(p) - sep_chars:
+            out.append(split.split(p))
+    return out
+
+
+def _bridge_sequences(tokens: List[str], bridges: list[list[str]],
+                      max_len: int) -> Iterator[tuple[str, ...]]:
+    """Token sequences (2 ≤ len ≤ max_len) that could form one of `bridges`."""
+    vocab = set(tokens)
+    by_suffix, by_prefix = defaultdict(list), defaultdict(list)
+    for t in tokens:
+        for i in range(1, len(t) + 1):
+            by_suffix[t[-i:]].append(t)
+            by_prefix[t[:i]].append(t)
+
+    seen = set()
+    for parts in bridges:
+        head, *inner, tail = parts
+        if any(p not in vocab for p in inner):
+            continue                           # interior must be whole tokens
+        slots = ([by_suffix.get(head, [])] if head else []) + \
+                [[p] for p in inner] + \
+                ([by_prefix.get(tail, [])] if tail else [])
+        if not 2 <= len(slots) <= max_len:     # one slot = the '|t|' rule
+            continue
+        for seq in itertools.product(*slots):
+            if seq not in seen:
+                seen.add(seq)
+                yield seq
+
+
 def _mismatch_stats(
     tokens: List[str],
     encode: Callable[[str], Sequence[int]],
     separator: str,
     max_sequence_length: int,
+    *,
+    pieces: Iterable[str] | None = None,
+    sample_checks: int = 2000,
+    pool: ProcessPoolExecutor | None = None,
 ) -> Counter:
+    """How many failing sequences each token appears in."""
+    if pieces is None:                         # exhaustive fallback
+        seqs: Iterable[tuple[str, ...]] = itertools.chain.from_iterable(
+            itertools.combinations(tokens, L) for L in range(2, max_sequence_length + 1))
+    else:
+        seqs = _bridge_sequences(tokens, _bridges(pieces, separator), max_sequence_length)
+        if sample_checks and len(tokens) >= 2:
+            rng = random.Random(0)
+            seqs = itertools.chain(seqs, (
+                tuple(rng.sample(tokens, rng.randint(2, min(max_sequence_length, len(tokens)))))
+                for _ in range(sample_checks)))
+
     sep_len = len(encode(separator))
     stats = Counter()
-    for L in range(2, max_sequence_length + 1):
-        for combo in itertools.combinations(tokens, L):
-            test = separator + separator.join(combo) + separator
-            if len(encode(test)) != _seq_expected_len(L, sep_len):
-                for t in combo:
-                    stats[t] += 1
+    it = iter(seqs)
+    while chunk := list(itertools.islice(it, BATCH * 16)):
+        lengths = _lengths([_wrap(s, separator) for s in chunk], encode, pool)
+        for seq, n in zip(chunk, lengths):
+            if n != _seq_expected_len(len(seq), sep_len):
+                stats.update(seq)
     return stats
 
 
@@ -54,32 +174,54 @@ def trim_token_set(
     single_surround: bool = True,
     max_sequence_length: int = 2,
     save_as: str | None = None,
+    pieces: Iterable[str] | None = None,
+    workers: int | None = None,
+    sample_checks: int = 2000,
 ) -> str:
     """
     Remove tokens that break when written as '|token|' or
     '|t1|t2|…|tL|' (L ≤ `max_sequence_length`).
+
+    pieces  : the tokenizer's vocabulary as text (`token_pieces`); picked
+              up automatically when `encode` is a tiktoken `Encoding.encode`.
+              Without it every combination is checked, as before.
+    workers : processes for the encode batches (None = all cores).
     """
     save_as = save_as or json_path.replace(".json", "_clean.json")
-    vocab = _single_tokens(json_path, encode)
-
-    # 1. '|token|' rule
-    if single_surround:
-        sep_len = len(encode(separator))
-        vocab = [
-            t for t in vocab
-            if len(encode(f"{separator}{t}{separator}")) == 1 + 2 * sep_len
-        ]
-
-    # 2. sequence rule
-    if max_sequence_length > 1:
-        stats = _mismatch_stats(vocab, encode, separator, max_sequence_length)
-        if stats:
-            # heavy offenders first
-            worst = {t for t, c in stats.items() if c > min(stats.values())}
-            vocab = [t for t in vocab if t not in worst]
-            # purge any remaining offenders
-            stats2 = _mismatch_stats(vocab, encode, separator, max_sequence_length)
-            vocab  = [t for t in vocab if t not in stats2]
+    owner = getattr(encode, "__self__", None)
+    if pieces is None and hasattr(owner, "decode_single_token_bytes"):
+        pieces = token_pieces(owner)
+    if pieces is not None:
+        pieces = list(pieces)                  # scanned once per check
+
+    pool = _make_pool(encode, workers)
+    try:
+        with open(json_path) as f:
+            vocab = json.load(f)
+        vocab = [t for t, n in zip(vocab, _lengths(vocab, encode, pool)) if n == 1]
+
+        # 1. '|token|' rule
+        if single_surround:
+            sep_len = len(encode(separator))
+            lengths = _lengths([f"{separator}{t}{separator}" for t in vocab], encode, pool)
+            vocab = [t for t, n in zip(vocab, lengths) if n == 1 + 2 * sep_len]
+
+        # 2. sequence rule – only '|t|' survivors are tested
+        if max_sequence_length > 1:
+            check = lambda v: _mismatch_stats(v, encode, separator, max_sequence_length,
+                                              pieces=pieces, sample_checks=sample_checks,
+                                              pool=pool)
+            stats = check(vocab)
+            if stats:
+                # heavy offenders first
+                worst = {t for t, c in stats.items() if c > min(stats.values())}
+                vocab = [t for t in vocab if t not in worst]
+                # purge any remaining offenders
+                stats2 = check(vocab)
+                vocab  = [t for t in vocab if t not in stats2]
+    finally:
+        if pool is not None:
+            pool.shutdown()
 
     with open(save_as, "w") as f:
         json.dump(sorted(vocab), f)
@@ -0,0 +1,265 @@
+"""
+scripts/trial_bank.py
+─────────────────────
+Pre-built trials shared by every provider.
+
+A bank is one SQLite file holding, for each (N, K, trial) of a grid, the
+fact index matrix, the question order, the rendered prompt and the
+expected answer (zlib-compressed), plus prompt/answer token counts for
+every tokenizer it was built for.  The vocabulary is the intersection of
+the providers' verified single-token sets, so each prompt is valid for
+all of them and runs from the same bank are paired comparisons.
+
+    python -m scripts.trial_bank build banks/grid.sqlite \
+        --providers OpenAI DeepSeek --n 3,6,12 --k 2,4 --trials 5 --seed 1
+
+`run_experiments(..., bank="banks/grid.sqlite")` then streams prompts from
+the bank instead of generating and tokenizing them at run time.
+"""
+
+from __future__ import annotations
+import argparse, io, json, sqlite3, threading, zlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Iterator
+
+import numpy as np
+
+from llm_providers import make_provider
+from .build_prompt import get_template, LazyPrompt
+from .helpers.fact_gen import generate_grid, facts_from_indices, new_seed
+from .helpers.token_utils import load_verified_vocab
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS vocab (data BLOB);                 -- np.save, zlib
+CREATE TABLE IF NOT EXISTS trials (
+    num_facts INTEGER,
+    k         INTEGER,
+    trial     INTEGER,
+    facts     BLOB,        -- (2N, K) int32 vocab indices, zlib
+    keys      BLOB,        -- question order (N,) int32, zlib
+    prompt    BLOB,        -- zlib utf-8
+    expected  BLOB,        -- zlib utf-8
+    PRIMARY KEY (num_facts, k, trial)
+);
+CREATE TABLE IF NOT EXISTS token_counts (
+    tokenizer_id    TEXT,
+    num_facts       INTEGER,
+    k               INTEGER,
+    trial           INTEGER,
+    prompt_tokens   INTEGER,
+    expected_tokens INTEGER,
+    PRIMARY KEY (tokenizer_id, num_facts, k, trial)
+);
+"""
+
+
+def _pack(arr: np.ndarray) -> bytes:
+    return zlib.compress(arr.astype(np.int32).tobytes(), 6)
+
+
+def _unpack(blob: bytes, shape) -> np.ndarray:
+    return np.frombuffer(zlib.decompress(blob), dtype=np.int32).reshape(shape)
+
+
+def _text(blob: bytes) -> str:
+    return zlib.decompress(blob).decode("utf-8")
+
+
+@dataclass
+class BankTrial:
+    num_facts: int
+    k: int
+    trial: int
+    prompt: str
+    keys: list[str]
+    kv: dict[str, str]
+    expected: str
+    prompt_tokens: int | None = None     # for the tokenizer the bank was opened with
+
+
+# ───────────────────────────────────────────────────
+#  building
+# ───────────────────────────────────────────────────
+def build_bank(path: str | Path, providers: Iterable[str | tuple[str, str | None]],
+               facts_list_sizes, token_sizes, trials: int, *,
+               seed: int | None = None, template=None, verbose: bool = True) -> Path:
+    """
+    Materialise every (N, K, trial) once.  Adding providers or cells to an
+    existing bank only fills in what is missing (same seed and vocabulary);
+    a provider added later must verify every bank token as a single token
+    (ValueError otherwise) and is appended to the `providers` meta row.
+
+    providers : labels / dotted paths, or (label, model) pairs – the model
+                picks the tokenizer (e.g. OpenAI encodings differ per model).
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+    meta = dict(conn.execute("SELECT key, value FROM meta"))
+
+    llms = [make_provider(*p) if isinstance(p, tuple) else make_provider(p)
+            for p in providers]
+    name = lambda llm: f"{llm.provider_id}:{llm.model_name}"
+    if "seed" in meta:
+        seed  = int(meta["seed"])
+        vocab = TrialBank(path).vocab
+        known = json.loads(meta.get("providers", "[]"))
+        added = [llm for llm in llms if name(llm) not in known]
+        # the stored vocabulary is fixed – every token must stay a single
+        # token for a provider added later, or its prompts would not be valid
+        for llm in added:
+            bad = set(vocab.tolist()) - set(load_verified_vocab(llm).tolist())
+            if bad:
+                raise ValueError(f"{len(bad)} of the bank's {len(vocab)} tokens are not "
+                                 f"verified single tokens for {name(llm)} "
+                                 f"(e.g. {sorted(bad)[:5]}) – build a new bank for it")
+        if added:
+            with conn:
+                conn.execute("INSERT OR REPLACE INTO meta VALUES ('providers', ?)",
+                             (json.dumps(known + [name(llm) for llm in added]),))
+    else:
+        seed  = new_seed() if seed is None else seed
+        vocab = None
+        for llm in llms:
+            v = set(load_verified_vocab(llm).tolist())
+            vocab = v if vocab is None else vocab & v
+        vocab = np.asarray(sorted(vocab), dtype=str)
+        buf = io.BytesIO()
+        np.save(buf, vocab)
+        template = template or get_template()
+        with conn:
+            conn.execute("INSERT INTO vocab VALUES (?)", (zlib.compress(buf.getvalue()),))
+            conn.executemany("INSERT INTO meta VALUES (?, ?)", [
+                ("seed", str(seed)), ("template_id", template.template_id),
+                ("vocab_size", str(len(vocab))),
+                ("providers", json.dumps([name(llm) for llm in llms])),
+            ])
+    template = template or get_template()
+    if meta.get("template_id", template.template_id) != template.template_id:
+        raise ValueError(f"bank was built with {meta['template_id']}, "
+                         f"current template is {template.template_id}")
+
+    have  = {tuple(r) for r in conn.execute("SELECT num_facts, k, trial FROM trials")}
+    cells = [(n, k) for n in facts_list_sizes for k in token_sizes]
+    rows  = []
+    for n, k, t, idx, rng in generate_grid(vocab, cells, trials, seed):
+        if (n, k, t) in have:
+            continue
+        facts, kv = facts_from_indices(idx, vocab)
+        order     = rng.permutation(n)          # same draw as build_prompt_for_all_keys
+        keys      = [facts[i][1] for i in order]
+        prompt    = str(LazyPrompt(facts, keys, k, template))
+        expected  = "\n".join(kv[key] for key in keys)
+        rows.append((n, k, t, _pack(idx), _pack(order),
+                     zlib.compress(prompt.encode(), 6), zlib.compress(expected.encode(), 6)))
+    with conn:
+        conn.executemany("INSERT INTO trials VALUES (?,?,?,?,?,?,?)", rows)
+    if verbose:
+        print(f"🏦 {len(rows)} new trials ({len(have) + len(rows)} total) → {path}")
+
+    # token counts – one batched pass per tokenizer, only for missing rows
+    bank = TrialBank(path)
+    for llm in llms:
+        tid  = llm.tokenizer_id
+        todo = conn.execute("""
+            SELECT t.num_facts, t.k, t.trial FROM trials t
+            LEFT JOIN token_counts c ON c.tokenizer_id = ? AND c.num_facts = t.num_facts
+                 AND c.k = t.k AND c.trial = t.trial
+            WHERE c.tokenizer_id IS NULL""", (tid,)).fetchall()
+        for i in range(0, len(todo), 256):
+            chunk  = [bank.get(*key) for key in todo[i:i + 256]]
+            counts = llm.count_tokens_batch([bt.prompt for bt in chunk] +
+                                            [bt.expected for bt in chunk])
+            with conn:
+                conn.executemany("INSERT INTO token_counts VALUES (?,?,?,?,?,?)", [
+                    (tid, bt.num_facts, bt.k, bt.trial, p, e)
+                    for bt, p, e in zip(chunk, counts[:len(chunk)], counts[len(chunk):])])
+        if verbose and todo:
+            print(f"   counted {len(todo)} prompts for {tid}")
+    conn.close()
+    return path
+
+
+# ───────────────────────────────────────────────────
+#  reading
+# ───────────────────────────────────────────────────
+class TrialBank:
+    """Read side; safe to share between the runner's worker threads."""
+
+    def __init__(self, path: str | Path, tokenizer_id: str | None = None):
+        self.path = Path(path)
+        if not self.path.exists():
+            raise FileNotFoundError(self.path)
+        self._conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True,
+                                     check_same_thread=False)
+        self._lock = threading.Lock()
+        self.tokenizer_id = tokenizer_id
+        self.meta = dict(self._conn.execute("SELECT key, value FROM meta"))
+        self.seed = int(self.meta["seed"])
+        self.template_id = self.meta["template_id"]
+        blob, = self._conn.execute("SELECT data FROM vocab").fetchone()
+        self.vocab = np.load(io.BytesIO(zlib.decompress(blob)))
+
+    def cells(self) -> set[tuple[int, int]]:
+        with self._lock:
+            return {tuple(r) for r in self._conn.execute(
+                "SELECT DISTINCT num_facts, k FROM trials")}
+
+    def _row(self, r) -> BankTrial:
+        n, k, t, facts, order, prompt, expected, ptok = r
+        idx  = _unpack(facts, (2 * n, k))
+        _, kv = facts_from_indices(idx, self.vocab)
+        keys = list(kv)
+        keys = [keys[i] for i in _unpack(order, (n,))]
+        return BankTrial(n, k, t, _text(prompt), keys, kv, _text(expected), ptok)
+
+    _SELECT = """
+        SELECT t.num_facts, t.k, t.trial, t.facts, t.keys, t.prompt, t.expected,
+               c.prompt_tokens
+        FROM trials t LEFT JOIN token_counts c
+          ON c.tokenizer_id = ? AND c.num_facts = t.num_facts
+         AND c.k = t.k AND c.trial = t.trial"""
+
+    def get(self, n: int, k: int, t: int) -> BankTrial:
+        with self._lock:
+            r = self._conn.execute(
+                self._SELECT + " WHERE t.num_facts = ? AND t.k = ? AND t.trial = ?",
+                (self.tokenizer_id, n, k, t)).fetchone()
+        if r is None:
+            raise KeyError(f"(N={n}, K={k}, trial={t}) is not in {self.path}")
+        return self._row(r)
+
+    def iter_trials(self, cells=None) -> Iterator[BankTrial]:
+        """Stream trials in (N, K, trial) order, optionally only for `cells`."""
+        with self._lock:
+            rows = self._conn.execute(self._SELECT + " ORDER BY 1, 2, 3",
+                                      (self.tokenizer_id,))
+            batch = rows.fetchmany(64)
+        wanted = set(cells) if cells is not None else None
+        while batch:
+            for r in batch:
+                if wanted is None or (r[0], r[1]) in wanted:
+                    yield self._row(r)
+            with self._lock:
+                batch = rows.fetchmany(64)
+
+
+if __name__ == "__main__":
+    from llm_providers import PROVIDERS
+    ap = argparse.ArgumentParser(description="Build a shared trial bank.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("build")
+    b.add_argument("path")
+    b.add_argument("--providers", nargs="+", default=list(PROVIDERS),
+                   help="registry labels or dotted class paths, optionally LABEL:model")
+    b.add_argument("--n", required=True, help="comma-separated N values")
+    b.add_argument("--k", required=True, help="comma-separated K values")
+    b.add_argument("--trials", type=int, default=1)
+    b.add_argument("--seed", type=int, default=None)
+    a = ap.parse_args()
+    build_bank(a.path, [tuple(p.split(":", 1)) if ":" in p else p for p in a.providers],
+               [int(x) for x in a.n.split(",")], [int(x) for x in a.k.split(",")],
+               a.trials, seed=a.seed)